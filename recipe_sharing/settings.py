@@ -13,6 +13,12 @@ try:
 except ImportError:
     HAS_WHITENOISE = False
 
+try:
+    import redis
+    HAS_REDIS = True
+except ImportError:
+    HAS_REDIS = False
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -48,6 +54,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'recipes.instrumentation.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
 ]
 
@@ -102,6 +109,34 @@ else:
         }
     }
 
+# Cache
+# A Redis cache is shared by all gunicorn workers; without one each worker
+# keeps its own in-memory cache.
+if HAS_REDIS and os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Seconds the home page statistics and category/tag summaries are cached
+REFERENCE_DATA_CACHE_TTL = int(os.environ.get('REFERENCE_DATA_CACHE_TTL', '300'))
+
+# Recipe detail comments (recipes.comments): comments per "load more" page,
+# and seconds each recipe's first page is cached
+COMMENT_PAGE_SIZE = int(os.environ.get('COMMENT_PAGE_SIZE', '20'))
+COMMENT_CACHE_TTL = int(os.environ.get('COMMENT_CACHE_TTL', '300'))
+
+# Seconds facet counts (recipes.facets) are cached per filter set
+FACET_CACHE_TTL = int(os.environ.get('FACET_CACHE_TTL', '60'))
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -158,6 +193,84 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Django REST Framework
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'recipes.pagination.StandardResultsSetPagination',
+    'PAGE_SIZE': 20,
+}
+
+# Buffered engagement counters (recipes.counters): seconds between batched
+# writes, and how many distinct rows may be pending before an early flush.
+# 0 writes through on every increment.
+COUNTER_FLUSH_INTERVAL = int(os.environ.get('COUNTER_FLUSH_INTERVAL', '10'))
+COUNTER_MAX_PENDING = int(os.environ.get('COUNTER_MAX_PENDING', '1000'))
+
+# Neighbours precomputed per recipe by recipes.similarity (related recipes)
+RELATED_RECIPES_COUNT = int(os.environ.get('RELATED_RECIPES_COUNT', '6'))
+
+# Trending feed (recipes.trending): engagement weights per event and the
+# hours after which an event counts half as much
+TRENDING_HALF_LIFE_HOURS = float(os.environ.get('TRENDING_HALF_LIFE_HOURS', '24'))
+TRENDING_WEIGHTS = {'view': 1, 'like': 5, 'rating': 4, 'comment': 6}
+
+# Follow feed (recipes.feed): authors with more followers than this are read
+# at request time instead of being fanned out to every follower's inbox, and
+# a new follow copies this many of the author's latest recipes into the inbox
+FEED_FANOUT_MAX_FOLLOWERS = int(os.environ.get('FEED_FANOUT_MAX_FOLLOWERS', '10000'))
+FEED_FOLLOW_BACKFILL = int(os.environ.get('FEED_FOLLOW_BACKFILL', '20'))
+
+# Search suggestions (recipes.suggest): recipes indexed per process, most
+# popular first, and seconds between background rebuilds (0 disables them)
+SUGGEST_MAX_RECIPES = int(os.environ.get('SUGGEST_MAX_RECIPES', '50000'))
+SUGGEST_REBUILD_INTERVAL = int(os.environ.get('SUGGEST_REBUILD_INTERVAL', '600'))
+
+# Spelling correction (recipes.spelling): searches finding fewer recipes than
+# this offer a "did you mean", corrected to words at least this similar (0-1)
+SPELLING_MIN_RESULTS = int(os.environ.get('SPELLING_MIN_RESULTS', '3'))
+SPELLING_MIN_SIMILARITY = float(os.environ.get('SPELLING_MIN_SIMILARITY', '0.3'))
+
+# Per-request query instrumentation (recipes.instrumentation): Server-Timing
+# headers and a structured log line. Budgets are max queries per URL name
+# and are enforced by the tests in recipes/tests.py.
+QUERY_INSTRUMENTATION = os.environ.get('QUERY_INSTRUMENTATION', str(DEBUG)).lower() in ('true', '1', 'yes')
+QUERY_BUDGETS = {
+    'home': 8,
+    'recipe_detail': 12,
+    'recipe_comments': 2,
+    'category_list': 4,
+    'category_detail': 7,
+    'tag_detail': 4,
+    'profile': 6,
+    'recipe-api-list': 3,
+    'recipe-api-detail': 6,
+    'recipe-api-related': 4,
+    'recipe-api-comments': 4,
+    'recipe-api-ratings': 4,
+    'recipe-api-feed': 5,
+    'recipe-api-by-ingredients': 5,
+    'suggest-api': 0,
+    'user-api-list': 4,
+    'comment-api-list': 3,
+    'rating-api-list': 3,
+    'category-api-list': 4,
+    'category-api-recipes': 4,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'recipes.instrumentation': {
+            'handlers': ['console'],
+            'level': os.environ.get('QUERY_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 # Authentication redirects
 LOGIN_REDIRECT_URL = 'home'
 LOGOUT_REDIRECT_URL = 'home'
\ No newline at end of file
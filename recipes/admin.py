@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Category, Tag, Profile, Recipe, Comment, Rating
+from .models import Category, Tag, Profile, Recipe, Comment, Rating, RecipeLike, CommentLike, Follow, FeedItem, Ingredient
 
 
 # ============================================================
@@ -180,7 +180,7 @@ class RecipeAdmin(admin.ModelAdmin):
     
     search_fields = ['title', 'description', 'ingredients', 'instructions', 'author__username']
     
-    readonly_fields = ['created_at', 'updated_at', 'views_count', 'likes_count', 'rating_average']
+    readonly_fields = ['created_at', 'updated_at', 'views_count', 'likes_count', 'rating_average', 'rating_count']
     
     fieldsets = (
         ('Recipe Information', {
@@ -193,7 +193,7 @@ class RecipeAdmin(admin.ModelAdmin):
             'fields': ('difficulty', 'prep_time', 'cook_time', 'servings', 'tags')
         }),
         ('Engagement Metrics', {
-            'fields': ('views_count', 'likes_count', 'rating_average'),
+            'fields': ('views_count', 'likes_count', 'rating_average', 'rating_count'),
             'description': 'Read-only engagement statistics'
         }),
         ('Timestamps', {
@@ -349,4 +349,70 @@ class RatingAdmin(admin.ModelAdmin):
             stars,
             obj.score
         )
-    score_display.short_description = 'Rating'
\ No newline at end of file
+    score_display.short_description = 'Rating'
+
+
+# ============================================================
+# LIKE ADMINS
+# ============================================================
+@admin.register(RecipeLike)
+class RecipeLikeAdmin(admin.ModelAdmin):
+    """
+    Admin interface for RecipeLike model
+    """
+    list_display = ['user', 'recipe', 'created_at']
+    search_fields = ['user__username', 'recipe__title']
+    list_select_related = ['user', 'recipe']
+    raw_id_fields = ['user', 'recipe']
+    readonly_fields = ['created_at']
+
+
+@admin.register(CommentLike)
+class CommentLikeAdmin(admin.ModelAdmin):
+    """
+    Admin interface for CommentLike model
+    """
+    list_display = ['user', 'comment', 'created_at']
+    search_fields = ['user__username']
+    list_select_related = ['user', 'comment__user', 'comment__recipe']
+    raw_id_fields = ['user', 'comment']
+    readonly_fields = ['created_at']
+
+
+# ============================================================
+# FOLLOW AND FEED ADMINS
+# ============================================================
+@admin.register(Follow)
+class FollowAdmin(admin.ModelAdmin):
+    """
+    Admin interface for Follow model
+    """
+    list_display = ['follower', 'followee', 'created_at']
+    search_fields = ['follower__username', 'followee__username']
+    list_select_related = ['follower', 'followee']
+    raw_id_fields = ['follower', 'followee']
+    readonly_fields = ['created_at']
+
+
+@admin.register(FeedItem)
+class FeedItemAdmin(admin.ModelAdmin):
+    """
+    Admin interface for FeedItem model (maintained by recipes.feed)
+    """
+    list_display = ['user', 'recipe', 'author', 'created_at']
+    search_fields = ['user__username', 'recipe__title']
+    list_select_related = ['user', 'recipe', 'author']
+    raw_id_fields = ['user', 'recipe', 'author']
+
+
+# ============================================================
+# INGREDIENT ADMIN
+# ============================================================
+@admin.register(Ingredient)
+class IngredientAdmin(admin.ModelAdmin):
+    """
+    Admin interface for Ingredient model (maintained by recipes.ingredients)
+    """
+    list_display = ['name', 'recipe_count']
+    search_fields = ['name']
+    readonly_fields = ['recipe_count']
@@ -1,16 +1,154 @@
 from rest_framework import viewsets, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.views import APIView
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticatedOrReadOnly, IsAuthenticated, IsAdminUser
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from .models import Recipe, Category, Comment, Rating
+from .models import Profile, Recipe, Category, Comment, Rating, RecipeLike, CommentLike, Follow
+from .pagination import CreatedAtCursorPagination, StandardResultsSetPagination, encode_cursor, decode_cursor
+from .counters import recipe_views, recipe_likes, comment_likes
+from .search import RecipeSearchFilter
+from .similarity import get_related_recipes
+from .filters import RecipeFacetFilter, RecipeOrderingFilter
+from . import conditional, export, facets, ingredients, spelling, suggest, trending
+from .feed import feed_page
 from .serializers import (
     RecipeListSerializer, RecipeDetailSerializer, CategorySerializer,
-    CommentSerializer, RatingSerializer
+    CommentSerializer, RatingSerializer, UserSerializer
 )
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+def like_response(obj, counter, liked, created):
+    """Shared payload for like/unlike actions"""
+    # The change may already have been written through, so `obj` is stale
+    obj.refresh_from_db(fields=['likes_count'])
+    return Response(
+        {'id': obj.pk, 'liked': liked, 'likes_count': obj.likes_count + counter.pending(obj.pk)},
+        status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+    )
+
+
+class ConditionalGetMixin:
+    """
+    ETag on list and retrieve, Last-Modified on retrieve only (see
+    recipes.conditional). Requests whose validators still match get a 304
+    before serialization.
+    """
+    validator_fields = ()
+
+    def check_validators(self, request, rows, *extra, many=False):
+        """A 304 response if the client's copy of `rows` is current, else None"""
+        build = conditional.list_validators if many else conditional.validators
+        self.validators = build(rows, self.validator_fields, request.get_full_path(), *extra)
+        return conditional.not_modified(request, *self.validators)
+
+    def list_extras(self, request):
+        """Extra keys for a paginated list response, e.g. facet counts"""
+        return {}
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        rows = list(queryset) if page is None else page
+        extras = self.list_extras(request) if page is not None else {}
+        # Page-number pages also show the total, which rows elsewhere change
+        total = getattr(getattr(self.paginator, 'page', None), 'paginator', None)
+        response = self.check_validators(request, rows, total.count if total else None, extras or None, many=True)
+        if response:
+            return response
+        serializer = self.get_serializer(rows, many=True)
+        if page is None:
+            return Response(serializer.data)
+        response = self.get_paginated_response(serializer.data)
+        response.data.update(extras)
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        return self.check_validators(request, [instance]) or Response(self.get_serializer(instance).data)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        validators = getattr(self, 'validators', None)
+        if validators and response.status_code == status.HTTP_200_OK and 'ETag' not in response:
+            conditional.set_validators(response, *validators)
+        return response
+
+
+def follow_response(user, following, created):
+    """Shared payload for follow/unfollow actions"""
+    counts = Profile.objects.filter(user=user).values_list('followers_count', flat=True)
+    return Response(
+        {'id': user.pk, 'username': user.username, 'following': following,
+         'followers_count': next(iter(counts), 0)},
+        status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+    )
+
+
+def cursor_page(view, queryset, serializer_class):
+    """Cursor-paginated response for a sub-resource, newest first"""
+    paginator = CreatedAtCursorPagination()
+    # No view: the parent's ?ordering= does not apply to its sub-resources
+    page = paginator.paginate_queryset(queryset, view.request)
+    serializer = serializer_class(page, many=True, context=view.get_serializer_context())
+    return paginator.get_paginated_response(serializer.data)
+
+
+class UserViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    API ViewSet for users (read only).
+
+    Endpoints:
+    - GET /api/users/ - List users
+    - GET /api/users/{username}/ - Retrieve a user with follow counts
+    - POST /api/users/{username}/follow/ - Follow user (idempotent)
+    - POST /api/users/{username}/unfollow/ - Stop following (idempotent)
+    """
+    queryset = User.objects.filter(is_active=True).order_by('username')
+    serializer_class = UserSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    lookup_field = 'username'
+    lookup_value_regex = r'[\w.@+-]+'
+
+    def get_queryset(self):
+        return UserSerializer.setup_eager_loading(super().get_queryset(), self.get_serializer_context())
+
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    def follow(self, request, username=None):
+        """
+        Follow a user. Following twice is a no-op.
+        POST /api/users/{username}/follow/
+        """
+        user = self.get_object()
+        if user == request.user:
+            return Response(
+                {'detail': 'You cannot follow yourself.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        _, created = Follow.objects.get_or_create(follower=request.user, followee=user)
+        return follow_response(user, True, created)
+
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    def unfollow(self, request, username=None):
+        """
+        Stop following a user, if followed.
+        POST /api/users/{username}/unfollow/
+        """
+        user = self.get_object()
+        for follow in Follow.objects.filter(follower=request.user, followee=user):
+            # Deleted one by one so post_delete keeps the counters in sync
+            follow.delete()
+        return follow_response(user, False, False)
+
+
+class CategoryViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """
     API ViewSet for Category model.
     Supports: GET (list & detail), POST (create), PUT (update), DELETE (delete)
@@ -21,44 +159,66 @@ class CategoryViewSet(viewsets.ModelViewSet):
     - GET /api/categories/{id}/ - Retrieve specific category
     - PUT /api/categories/{id}/ - Update category
     - DELETE /api/categories/{id}/ - Delete category
+    - GET /api/categories/{id}/recipes/ - Recipes in category (cursor paginated)
     """
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    validator_fields = ('name', 'description')
+
+    def get_queryset(self):
+        return CategorySerializer.setup_eager_loading(super().get_queryset(), self.get_serializer_context())
 
     @action(detail=True, methods=['get'])
     def recipes(self, request, pk=None):
         """
-        Get all recipes in a specific category.
+        Published recipes in a specific category (cursor paginated, newest first).
         GET /api/categories/{id}/recipes/
         """
         category = self.get_object()
-        recipes = category.recipe_set.all()
-        serializer = RecipeListSerializer(recipes, many=True)
-        return Response(serializer.data)
+        recipes = RecipeListSerializer.setup_eager_loading(
+            category.recipes.filter(published=True), self.get_serializer_context(), ['created_at']
+        )
+        return cursor_page(self, recipes, RecipeListSerializer)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """
     API ViewSet for Recipe model.
     Supports: GET (list & detail), POST (create), PUT (update), DELETE (delete)
     
     Endpoints:
-    - GET /api/recipes/ - List all recipes (paginated)
+    - GET /api/recipes/ - List all recipes (cursor paginated, newest first)
     - POST /api/recipes/ - Create new recipe
     - GET /api/recipes/{id}/ - Retrieve specific recipe
+    - GET /api/recipes/?search=pasta - Full-text search, best match first (page paginated)
+      (adds "did_you_mean": "spaghetti" when ?search=spagetti finds few recipes)
+    - GET /api/recipes/?ordering=trending - Most engagement recently (time-decayed)
+      (the order moves while paging: a recipe rising past the cursor is not shown)
+    - GET /api/recipes/?max_time=30&ordering=total_time - Quickest first, within 30 minutes
+      (total_time is 0 when unknown; the time filters leave those recipes out)
+    - GET /api/recipes/?category=1&tags=2,3&tags_mode=any&difficulty=easy&max_time=30&min_rating=4
+      - Facet filters; add &facets=all for counts per facet value (see recipes.facets)
+    - GET /api/recipes/?fields=id,title&expand=author - Sparse fields, nested relations (any GET)
     - PUT /api/recipes/{id}/ - Update recipe
     - DELETE /api/recipes/{id}/ - Delete recipe
-    - GET /api/recipes/{id}/comments/ - Get recipe comments
-    - POST /api/recipes/{id}/comments/ - Add comment to recipe
-    - GET /api/recipes/{id}/ratings/ - Get recipe ratings
-    - POST /api/recipes/{id}/ratings/ - Add rating to recipe
+    - GET /api/recipes/{id}/comments/ - Recipe comments (cursor paginated)
+    - POST /api/recipes/{id}/add_comment/ - Add comment to recipe
+    - GET /api/recipes/{id}/ratings/ - Recipe ratings (cursor paginated)
+    - POST /api/recipes/{id}/add_rating/ - Add or update rating
+    - POST /api/recipes/{id}/like/ - Like recipe (idempotent)
+    - POST /api/recipes/{id}/unlike/ - Remove like (idempotent)
+    - GET /api/recipes/{id}/related/ - Most similar recipes
+    - GET /api/recipes/by_ingredients/?include=chicken,tomato&exclude=dairy - Cook with what I have
+    - GET /api/recipes/feed/ - New recipes from followed authors (cursor paginated)
     """
     queryset = Recipe.objects.filter(published=True).order_by('-created_at')
     permission_classes = [IsAuthenticatedOrReadOnly]
-    filterset_fields = ['category', 'difficulty', 'published']
-    search_fields = ['title', 'description', 'ingredients']
-    ordering_fields = ['created_at', 'views_count', 'likes_count']
+    pagination_class = CreatedAtCursorPagination
+    filter_backends = [RecipeSearchFilter, RecipeFacetFilter, RecipeOrderingFilter]
+    ordering_fields = ['created_at', 'views_count', 'likes_count', 'trending_score', 'total_time']
+    ordering = ['-created_at', '-id']
+    validator_fields = conditional.RECIPE_VALIDATOR_FIELDS
 
     def get_serializer_class(self):
         """Use different serializers for list vs detail views"""
@@ -66,9 +226,57 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return RecipeDetailSerializer
         return RecipeListSerializer
 
+    @property
+    def paginator(self):
+        """Search results keep their rank order, so they are page paginated"""
+        if not hasattr(self, '_paginator'):
+            if self.request.query_params.get(api_settings.SEARCH_PARAM, '').strip():
+                self._paginator = StandardResultsSetPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_queryset(self):
+        """Join and annotate what the active serializer reads"""
+        return self.get_serializer_class().setup_eager_loading(
+            super().get_queryset(), self.get_serializer_context(), ['updated_at', *self.ordering_fields]
+        )
+
+    def list_extras(self, request):
+        """
+        Facet counts over the search results when ?facets= asks for them, and
+        a spelling suggestion when a search found few recipes
+        """
+        try:
+            names = facets.requested_facets(request.query_params)
+            conditions = facets.parse_params(request.query_params)
+        except ValueError as error:
+            raise ValidationError({'detail': str(error)})
+        extras = {}
+        search = request.query_params.get(api_settings.SEARCH_PARAM, '').strip()
+        if search:
+            # Search results are page paginated, so their total is already counted
+            found = self.paginator.page.paginator.count
+            suggestion, _ = spelling.did_you_mean(facets.apply(super().get_queryset(), conditions), search, found)
+            if suggestion:
+                extras['did_you_mean'] = suggestion
+        if names:
+            base = RecipeSearchFilter().filter_queryset(request, super().get_queryset(), self)
+            extras['facets'] = facets.cached_facet_counts(base, conditions, names, request.query_params, search)
+        return extras
+
+    def retrieve(self, request, *args, **kwargs):
+        """Return a recipe and count the view (buffered, see recipes.counters)"""
+        recipe = self.get_object()
+        recipe_views.increment(recipe.pk)
+        trending.record(recipe.pk, 'view')
+        return self.check_validators(request, [recipe]) or Response(self.get_serializer(recipe).data)
+
     def perform_create(self, serializer):
         """Set the author to the current user when creating a recipe"""
-        serializer.save(author=self.request.user)
+        # Row and tags in one transaction, so post-commit refreshes see both
+        with transaction.atomic():
+            serializer.save(author=self.request.user)
 
     def perform_update(self, serializer):
         """Only allow recipe author to update"""
@@ -78,18 +286,19 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 {'detail': 'Only the recipe author can update this recipe.'},
                 status=status.HTTP_403_FORBIDDEN
             )
-        serializer.save()
+        with transaction.atomic():
+            serializer.save()
 
     @action(detail=True, methods=['get'])
     def comments(self, request, pk=None):
         """
-        Get all comments for a specific recipe.
+        Comments on a recipe (cursor paginated, newest first).
         GET /api/recipes/{id}/comments/
         """
         recipe = self.get_object()
-        comments = recipe.comment_set.all().order_by('-created_at')
-        serializer = CommentSerializer(comments, many=True)
-        return Response(serializer.data)
+        # The related manager hands every row this recipe instance, so only users are joined
+        comments = recipe.comments.select_related('user')
+        return cursor_page(self, comments, CommentSerializer)
 
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def add_comment(self, request, pk=None):
@@ -118,13 +327,12 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def ratings(self, request, pk=None):
         """
-        Get all ratings for a specific recipe.
+        Ratings of a recipe (cursor paginated, newest first).
         GET /api/recipes/{id}/ratings/
         """
         recipe = self.get_object()
-        ratings = recipe.rating_set.all().order_by('-created_at')
-        serializer = RatingSerializer(ratings, many=True)
-        return Response(serializer.data)
+        ratings = recipe.ratings.select_related('user')
+        return cursor_page(self, ratings, RatingSerializer)
 
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def add_rating(self, request, pk=None):
@@ -161,6 +369,26 @@ class RecipeViewSet(viewsets.ModelViewSet):
         status_code = status.HTTP_201_CREATED if created else status.HTTP_200_OK
         return Response(serializer.data, status=status_code)
 
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    def like(self, request, pk=None):
+        """
+        Like a recipe. Liking twice is a no-op.
+        POST /api/recipes/{id}/like/
+        """
+        recipe = self.get_object()
+        _, created = RecipeLike.objects.get_or_create(recipe=recipe, user=request.user)
+        return like_response(recipe, recipe_likes, True, created)
+
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    def unlike(self, request, pk=None):
+        """
+        Remove the current user's like from a recipe, if any.
+        POST /api/recipes/{id}/unlike/
+        """
+        recipe = self.get_object()
+        RecipeLike.objects.filter(recipe=recipe, user=request.user).delete()
+        return like_response(recipe, recipe_likes, False, False)
+
     @action(detail=True, methods=['get'])
     def average_rating(self, request, pk=None):
         """
@@ -173,25 +401,102 @@ class RecipeViewSet(viewsets.ModelViewSet):
             'id': recipe.id,
             'title': recipe.title,
             'average_rating': avg_rating,
-            'total_ratings': recipe.rating_set.count()
+            'total_ratings': recipe.rating_count,
+            'histogram': recipe.rating_histogram,
         })
 
+    @action(detail=True, methods=['get'])
+    def related(self, request, pk=None):
+        """
+        Most similar recipes by tags, category and ingredients (precomputed).
+        GET /api/recipes/{id}/related/
+        """
+        recipe = self.get_object()
+        queryset = RecipeListSerializer.setup_eager_loading(Recipe.objects.all(), self.get_serializer_context())
+        related = get_related_recipes(recipe, queryset)
+        data = RecipeListSerializer(related, many=True, context=self.get_serializer_context()).data
+        for item, related_recipe in zip(data, related):
+            item['similarity'] = round(getattr(related_recipe, 'similarity', 0.0) or 0.0, 4)
+        return Response(data)
+
+    @action(detail=False, methods=['get'])
+    def by_ingredients(self, request):
+        """
+        Recipes using the included ingredients and none of the excluded ones,
+        best coverage of the recipe's own ingredient list first.
+        GET /api/recipes/by_ingredients/?include=chicken,tomato&exclude=dairy&match=all|any
+        """
+        include = ingredients.parse_terms(request.query_params.get('include'))
+        exclude = ingredients.parse_terms(request.query_params.get('exclude'))
+        match = request.query_params.get('match', 'all')
+        if not include or match not in ('all', 'any'):
+            return Response(
+                {'detail': 'Pass ?include= (comma-separated) and optionally ?match=all or ?match=any.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        queryset = RecipeListSerializer.setup_eager_loading(
+            Recipe.objects.filter(published=True), self.get_serializer_context(), ['ingredient_count']
+        )
+        recipes = ingredients.match_recipes(queryset, include, exclude, match_all=match == 'all')
+        paginator = StandardResultsSetPagination()
+        page = paginator.paginate_queryset(recipes, request, view=self)
+        data = RecipeListSerializer(page, many=True, context=self.get_serializer_context()).data
+        for item, recipe in zip(data, page):
+            item['matched'] = recipe.matched
+            item['ingredient_count'] = recipe.ingredient_count
+            item['coverage'] = round(recipe.coverage or 0.0, 4)
+        return paginator.get_paginated_response(data)
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def feed(self, request):
+        """
+        Newest recipes from the authors the current user follows.
+        GET /api/recipes/feed/?cursor=...&page_size=20
+        """
+        paginator = CreatedAtCursorPagination()
+        cursor = request.query_params.get(paginator.cursor_query_param)
+        try:
+            position = decode_cursor(cursor) if cursor else None
+        except ValueError:
+            return Response({'detail': 'Invalid cursor.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = RecipeListSerializer.setup_eager_loading(
+            Recipe.objects.all(), self.get_serializer_context(), ['published']
+        )
+        recipes, next_position = feed_page(request.user, position, paginator.get_page_size(request), queryset)
+        next_url = None
+        if next_position:
+            next_url = replace_query_param(
+                request.build_absolute_uri(), paginator.cursor_query_param, encode_cursor(next_position)
+            )
+        serializer = RecipeListSerializer(recipes, many=True, context=self.get_serializer_context())
+        return Response({'next': next_url, 'previous': None, 'results': serializer.data})
 
-class CommentViewSet(viewsets.ModelViewSet):
+
+class CommentViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """
     API ViewSet for Comment model.
     Supports: GET (list & detail), POST (create), PUT (update), DELETE (delete)
     
     Endpoints:
-    - GET /api/comments/ - List all comments
+    - GET /api/comments/ - List all comments (cursor paginated, newest first)
     - POST /api/comments/ - Create new comment
     - GET /api/comments/{id}/ - Retrieve specific comment
     - PUT /api/comments/{id}/ - Update comment
     - DELETE /api/comments/{id}/ - Delete comment
+    - POST /api/comments/{id}/like/ - Like comment (idempotent)
+    - POST /api/comments/{id}/unlike/ - Remove like (idempotent)
     """
     queryset = Comment.objects.all().order_by('-created_at')
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = CreatedAtCursorPagination
+    validator_fields = ('likes_count',)
+
+    def get_queryset(self):
+        return CommentSerializer.setup_eager_loading(
+            super().get_queryset(), self.get_serializer_context(), ['created_at', 'updated_at']
+        )
 
     def perform_create(self, serializer):
         """Set the user to the current user when creating a comment"""
@@ -216,6 +521,26 @@ class CommentViewSet(viewsets.ModelViewSet):
             )
         instance.delete()
 
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    def like(self, request, pk=None):
+        """
+        Like a comment. Liking twice is a no-op.
+        POST /api/comments/{id}/like/
+        """
+        comment = self.get_object()
+        _, created = CommentLike.objects.get_or_create(comment=comment, user=request.user)
+        return like_response(comment, comment_likes, True, created)
+
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    def unlike(self, request, pk=None):
+        """
+        Remove the current user's like from a comment, if any.
+        POST /api/comments/{id}/unlike/
+        """
+        comment = self.get_object()
+        CommentLike.objects.filter(comment=comment, user=request.user).delete()
+        return like_response(comment, comment_likes, False, False)
+
 
 class RatingViewSet(viewsets.ModelViewSet):
     """
@@ -223,7 +548,7 @@ class RatingViewSet(viewsets.ModelViewSet):
     Supports: GET (list & detail), POST (create), PUT (update), DELETE (delete)
     
     Endpoints:
-    - GET /api/ratings/ - List all ratings
+    - GET /api/ratings/ - List all ratings (cursor paginated, newest first)
     - POST /api/ratings/ - Create new rating
     - GET /api/ratings/{id}/ - Retrieve specific rating
     - PUT /api/ratings/{id}/ - Update rating
@@ -232,6 +557,12 @@ class RatingViewSet(viewsets.ModelViewSet):
     queryset = Rating.objects.all().order_by('-created_at')
     serializer_class = RatingSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = CreatedAtCursorPagination
+
+    def get_queryset(self):
+        return RatingSerializer.setup_eager_loading(
+            super().get_queryset(), self.get_serializer_context(), ['created_at']
+        )
 
     def perform_create(self, serializer):
         """Set the user to the current user when creating a rating"""
@@ -255,3 +586,68 @@ class RatingViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         instance.delete()
+
+
+class NDJSONRenderer(JSONRenderer):
+    """Negotiates ?format=ndjson; error bodies are rendered as plain JSON"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+class CSVRenderer(JSONRenderer):
+    """Negotiates ?format=csv; error bodies are rendered as plain JSON"""
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class ExportView(APIView):
+    """
+    Streaming bulk export for staff (see recipes.export).
+
+    Endpoints:
+    - GET /api/export/{recipes|comments|ratings}/?format=ndjson - One JSON object per line
+    - GET /api/export/{dataset}/?format=csv - CSV with a header row
+    Filters: ?updated_since=2024-01-01, ?category={id}, ?author={username}
+    """
+    permission_classes = [IsAdminUser]
+    # Pick the format from ?format= or Accept; rows are streamed, not rendered
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+
+    def get(self, request, dataset):
+        if dataset not in export.DATASETS:
+            return Response({'detail': f'Unknown dataset {dataset!r}.'}, status=status.HTTP_404_NOT_FOUND)
+        params = request.query_params
+        try:
+            queryset = export.build_queryset(
+                dataset, params.get('updated_since'), params.get('category'), params.get('author')
+            )
+        except ValueError as error:
+            return Response({'detail': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        fmt = request.accepted_renderer.format
+        response = StreamingHttpResponse(
+            export.stream(queryset, export.field_names(dataset), fmt),
+            content_type=request.accepted_renderer.media_type + '; charset=utf-8',
+        )
+        response['Content-Disposition'] = f'attachment; filename="{dataset}.{fmt}"'
+        return response
+
+
+class SuggestView(APIView):
+    """
+    Search-box autocomplete over recipe titles, tag, category and ingredient
+    names, served from this process's prefix index (see recipes.suggest).
+
+    Endpoints:
+    - GET /api/suggest/?q=chi&limit=8 - Best weighted matches of any word prefix
+    """
+    # No session or user lookup: the response must not touch the database
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        try:
+            limit = int(request.query_params.get('limit', suggest.DEFAULT_LIMIT))
+        except ValueError:
+            limit = suggest.DEFAULT_LIMIT
+        return Response({'query': query, 'suggestions': suggest.suggest(query, limit)})
@@ -1,6 +1,22 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def install_search_triggers(sender, using, **kwargs):
+    """Restore search index triggers that a table rebuild may have dropped"""
+    from django.db import connections
+    from .search import get_search_backend
+
+    db_connection = connections[using]
+    backend = get_search_backend(db_connection)
+    if backend.is_installed(db_connection):
+        backend.install_triggers(db_connection)
 
 
 class RecipesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'recipes'
\ No newline at end of file
+    name = 'recipes'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        post_migrate.connect(install_search_triggers, sender=self)
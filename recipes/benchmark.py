@@ -0,0 +1,307 @@
+"""
+Load test and latency benchmark for the web pages and API.
+
+A run drives a weighted mix of requests (home search, recipe detail, API
+list/detail, add_rating, add_comment) from several threads, either
+in-process through the WSGI handler (django.test.Client) or against a
+running server over HTTP. Recipes are chosen with a Zipf skew towards the
+most viewed ones, which is how real traffic hits the cache and the database.
+
+The result is a JSON-serializable dict with p50/p95/p99 latency,
+requests/sec and queries/request per endpoint. compare() diffs two results
+so runs can be checked against a stored baseline. Use the `benchmark`
+management command to run it.
+"""
+import base64
+import itertools
+import json
+import platform
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, connections
+from django.test import Client, override_settings
+
+from .instrumentation import profile
+from .models import Recipe
+
+
+SEARCH_TERMS = [
+    'pasta', 'chicken', 'curry', 'soup', 'salad', 'tacos', 'cake', 'garlic', 'lemon', 'rice',
+    'spicy', 'vegan', 'chocolate', 'beef', 'tofu', 'ramen', 'risotto', 'cookies', 'pancakes', 'chili',
+]
+
+# endpoint name: relative weight in the mixed workload
+DEFAULT_WORKLOAD = {
+    'home_search': 15,
+    'recipe_detail': 30,
+    'api_recipe_list': 20,
+    'api_recipe_detail': 20,
+    'add_rating': 8,
+    'add_comment': 7,
+}
+WRITE_ENDPOINTS = {'add_rating', 'add_comment'}
+
+# Metrics compared against a baseline, and whether a higher value is better
+COMPARED_METRICS = {'p50_ms': False, 'p95_ms': False, 'p99_ms': False, 'rps': True, 'queries': False}
+
+SERVER_TIMING_QUERIES_RE = re.compile(r'(\d+) queries')
+
+
+def build_request(endpoint, rng, recipe_id):
+    """(method, path, data) for one request to `endpoint`"""
+    if endpoint == 'home_search':
+        return 'GET', f'/?q={rng.choice(SEARCH_TERMS)}', None
+    if endpoint == 'recipe_detail':
+        return 'GET', f'/recipe/{recipe_id}/', None
+    if endpoint == 'api_recipe_list':
+        return 'GET', '/api/recipes/', None
+    if endpoint == 'api_recipe_detail':
+        return 'GET', f'/api/recipes/{recipe_id}/', None
+    if endpoint == 'add_rating':
+        return 'POST', f'/api/recipes/{recipe_id}/add_rating/', {'score': rng.randint(1, 5)}
+    if endpoint == 'add_comment':
+        return 'POST', f'/api/recipes/{recipe_id}/add_comment/', {'text': 'Benchmark comment, tasty!'}
+    raise ValueError(f'Unknown endpoint {endpoint!r}')
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+# ============================================================
+# TRANSPORTS
+# ============================================================
+class InProcessTransport:
+    """Requests through Django's WSGI handler, counting queries directly"""
+
+    def __init__(self, user=None):
+        self.client = Client(SERVER_NAME='localhost', raise_request_exception=False)
+        if user is not None:
+            self.client.force_login(user)
+
+    def request(self, method, path, data):
+        with profile() as stats:
+            if method == 'GET':
+                response = self.client.get(path)
+            else:
+                response = self.client.post(path, data=json.dumps(data), content_type='application/json')
+        return response.status_code, stats.query_count
+
+    def close(self):
+        # Worker threads own their database connections
+        if threading.current_thread() is not threading.main_thread():
+            connections.close_all()
+
+
+class HTTPTransport:
+    """
+    Requests over HTTP with urllib. Queries per request are read from the
+    Server-Timing header, so the server needs QUERY_INSTRUMENTATION enabled.
+    """
+
+    def __init__(self, base_url, credentials=None):
+        self.base_url = base_url.rstrip('/')
+        self.headers = {'Accept': 'text/html,application/json'}
+        if credentials:
+            token = base64.b64encode(':'.join(credentials).encode()).decode()
+            self.headers['Authorization'] = f'Basic {token}'
+
+    def request(self, method, path, data):
+        body = json.dumps(data).encode() if data is not None else None
+        headers = dict(self.headers, **({'Content-Type': 'application/json'} if body else {}))
+        request = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                response.read()
+                return response.status, self.parse_queries(response.headers)
+        except urllib.error.HTTPError as error:
+            return error.code, self.parse_queries(error.headers)
+        except (urllib.error.URLError, OSError):
+            return 0, None
+
+    @staticmethod
+    def parse_queries(headers):
+        match = SERVER_TIMING_QUERIES_RE.search(headers.get('Server-Timing', '') if headers else '')
+        return int(match.group(1)) if match else None
+
+    def close(self):
+        pass
+
+
+# ============================================================
+# RUNNER
+# ============================================================
+def recipe_sampler(limit=10000, skew=1.1):
+    """Zipf-weighted picker over the most viewed published recipes"""
+    recipe_ids = list(
+        Recipe.objects.filter(published=True).order_by('-views_count', '-pk').values_list('pk', flat=True)[:limit]
+    )
+    if not recipe_ids:
+        raise ValueError('No published recipes; generate a dataset first (manage.py generate_dataset).')
+    cum_weights = list(itertools.accumulate(rank ** -skew for rank in range(1, len(recipe_ids) + 1)))
+    return lambda rng: recipe_ids[bisect_left(cum_weights, rng.random() * cum_weights[-1])]
+
+
+def run_benchmark(transport_factory, workload=None, requests=1000, duration=None, concurrency=4,
+                  warmup=0, seed=42, writes=True):
+    """
+    Run the mixed workload. `transport_factory(thread_index)` returns a
+    transport per thread. Stops after `requests` total requests, or after
+    `duration` seconds when given. Returns raw samples and wall time.
+    """
+    workload = dict(workload or DEFAULT_WORKLOAD)
+    if not writes:
+        workload = {name: weight for name, weight in workload.items() if name not in WRITE_ENDPOINTS}
+    endpoints, weights = list(workload), list(workload.values())
+    pick_recipe = recipe_sampler()
+
+    issued = itertools.count()
+    samples = []
+    lock = threading.Lock()
+    # Threads line up after warmup so the measured window starts together
+    start_barrier = threading.Barrier(concurrency)
+    clock = {}
+
+    def worker(index):
+        rng = random.Random(f'{seed}:{index}')
+        transport = transport_factory(index)
+        try:
+            for _ in range(warmup):
+                endpoint = rng.choices(endpoints, weights)[0]
+                transport.request(*build_request(endpoint, rng, pick_recipe(rng)))
+            if start_barrier.wait() == 0:
+                clock['started'] = time.perf_counter()
+                clock['deadline'] = clock['started'] + (duration or 0)
+            start_barrier.wait()
+            local = []
+            while True:
+                if duration is None and next(issued) >= requests:
+                    break
+                if duration is not None and time.perf_counter() >= clock['deadline']:
+                    break
+                endpoint = rng.choices(endpoints, weights)[0]
+                method, path, data = build_request(endpoint, rng, pick_recipe(rng))
+                started = time.perf_counter()
+                status, queries = transport.request(method, path, data)
+                local.append((endpoint, time.perf_counter() - started, status, queries))
+            with lock:
+                samples.extend(local)
+        finally:
+            transport.close()
+
+    if concurrency == 1:
+        # Single-threaded runs stay on the caller's thread and database connection
+        worker(0)
+    else:
+        threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return samples, time.perf_counter() - clock['started']
+
+
+def summarize(samples, wall_seconds):
+    """Per-endpoint and overall latency, throughput, error and query stats"""
+    groups = defaultdict(list)
+    for sample in samples:
+        groups[sample[0]].append(sample)
+        groups['ALL'].append(sample)
+
+    summary = {}
+    for endpoint, rows in sorted(groups.items()):
+        latencies = sorted(row[1] * 1000 for row in rows)
+        queries = [row[3] for row in rows if row[3] is not None]
+        summary[endpoint] = {
+            'requests': len(rows),
+            'errors': sum(1 for row in rows if not 200 <= row[2] < 400),
+            'rps': round(len(rows) / wall_seconds, 2) if wall_seconds else None,
+            'mean_ms': round(sum(latencies) / len(latencies), 2),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'max_ms': round(latencies[-1], 2),
+            'queries': round(sum(queries) / len(queries), 2) if queries else None,
+        }
+    return summary
+
+
+def run_in_process(concurrency=4, **options):
+    """Benchmark through the WSGI handler, with a logged-in user per thread for writes"""
+    users = list(User.objects.order_by('pk')[:concurrency])
+    if not users:
+        raise ValueError('No users; generate a dataset first (manage.py generate_dataset).')
+    # The benchmark measures queries itself; per-request log lines would only add noise
+    with override_settings(QUERY_INSTRUMENTATION=False):
+        samples, wall = run_benchmark(
+            lambda index: InProcessTransport(users[index % len(users)]), concurrency=concurrency, **options
+        )
+    return build_result('in-process', concurrency, samples, wall, options)
+
+
+def run_http(base_url, credentials=None, concurrency=4, **options):
+    if not credentials:
+        options['writes'] = False
+    samples, wall = run_benchmark(
+        lambda index: HTTPTransport(base_url, credentials), concurrency=concurrency, **options
+    )
+    return build_result(base_url, concurrency, samples, wall, options)
+
+
+def build_result(target, concurrency, samples, wall, options):
+    return {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'target': target,
+            'concurrency': concurrency,
+            'seed': options.get('seed', 42),
+            'wall_seconds': round(wall, 3),
+            'database': connection.vendor,
+            'debug': settings.DEBUG,
+            'python': platform.python_version(),
+            'recipes': Recipe.objects.count(),
+        },
+        'endpoints': summarize(samples, wall),
+    }
+
+
+# ============================================================
+# BASELINE COMPARISON
+# ============================================================
+def compare(current, baseline):
+    """
+    Per-endpoint metric changes against a baseline result. A positive
+    `change_pct` is always a regression (slower, fewer rps, more queries).
+    """
+    rows = []
+    for endpoint, metrics in current['endpoints'].items():
+        base = baseline.get('endpoints', {}).get(endpoint)
+        if not base:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = base.get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            rows.append({
+                'endpoint': endpoint,
+                'metric': metric,
+                'baseline': old,
+                'current': new,
+                'change_pct': round(-change if higher_is_better else change, 1),
+            })
+    return rows
@@ -0,0 +1,67 @@
+"""
+Comment section of the recipe detail page.
+
+Comments are shown newest first, COMMENT_PAGE_SIZE at a time, with a
+"load more" link that fetches the next keyset page as an HTML fragment.
+Rows are plain dicts with the author's username joined in, so a page is
+one query however many comments it shows.
+
+The first page and the comment total are cached per recipe for
+COMMENT_CACHE_TTL seconds and dropped by recipes.signals whenever a
+comment on the recipe is added, edited or deleted. Like counts on a
+cached page may lag by up to the TTL.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from .models import Comment
+from .pagination import before, encode_cursor
+
+FIRST_PAGE_KEY = 'recipes:comments:{}'
+
+DEFAULT_PAGE_SIZE = 20
+DEFAULT_TTL = 300
+
+
+def get_page_size():
+    return getattr(settings, 'COMMENT_PAGE_SIZE', DEFAULT_PAGE_SIZE)
+
+
+def get_ttl():
+    return getattr(settings, 'COMMENT_CACHE_TTL', DEFAULT_TTL)
+
+
+def comment_page(recipe_id, position=None, size=None):
+    """
+    One page of a recipe's comments after `position`, as
+    {'comments': [...], 'next_cursor': str or None}
+    """
+    size = size or get_page_size()
+    rows = list(
+        Comment.objects.filter(before(position, 'created_at', 'id'), recipe_id=recipe_id)
+        .order_by('-created_at', '-id')
+        .values('id', 'text', 'created_at', 'updated_at', 'likes_count', username=F('user__username'))[:size + 1]
+    )
+    comments = rows[:size]
+    next_cursor = None
+    if len(rows) > size:
+        last = comments[-1]
+        next_cursor = encode_cursor((last['created_at'], last['id']))
+    return {'comments': comments, 'next_cursor': next_cursor}
+
+
+def first_page(recipe_id):
+    """Cached first page plus the recipe's comment total"""
+    def compute():
+        page = comment_page(recipe_id)
+        if page['next_cursor'] is None:
+            page['total'] = len(page['comments'])
+        else:
+            page['total'] = Comment.objects.filter(recipe_id=recipe_id).count()
+        return page
+    return cache.get_or_set(FIRST_PAGE_KEY.format(recipe_id), compute, get_ttl())
+
+
+def invalidate(recipe_id):
+    cache.delete(FIRST_PAGE_KEY.format(recipe_id))
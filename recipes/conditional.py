@@ -0,0 +1,68 @@
+"""
+Conditional GET: ETag and Last-Modified validators.
+
+Validators are built from what a response renders, before it is
+serialized: each row's id and updated_at plus the counters that change
+without touching updated_at (likes, rating aggregates, comment totals).
+Renaming a recipe's category, tags or author, or changing its tags,
+bumps the recipe's updated_at (see recipes.signals).
+A matching If-None-Match or If-Modified-Since returns 304 Not Modified
+without running a serializer or template.
+
+ETags are weak: view counts are left out so a busy recipe keeps its
+validator between polls. Last-Modified only follows updated_at, so
+clients that care about live counters should revalidate with the ETag,
+which takes precedence when both are sent. Lists and pages that embed
+one get no Last-Modified at all: deleting a row leaves the newest
+updated_at where it was, so If-Modified-Since would keep answering 304.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+# Counters a recipe response shows that are updated in place
+RECIPE_VALIDATOR_FIELDS = ('likes_count', 'rating_count', 'rating_sum', 'comments_total')
+
+
+def value(row, name):
+    """A loaded value only: columns left out by ?fields= are not rendered either"""
+    return row.get(name) if isinstance(row, dict) else vars(row).get(name)
+
+
+def validators(rows, fields=(), *extra):
+    """(weak ETag, Last-Modified or None) for the rows of one response"""
+    parts = [extra]
+    modified = None
+    for row in rows:
+        updated_at = value(row, 'updated_at')
+        parts.append((value(row, 'id'), updated_at, *(value(row, field) for field in fields)))
+        if updated_at and (modified is None or updated_at > modified):
+            modified = updated_at
+    digest = hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+    return f'W/"{digest}"', modified
+
+
+def list_validators(rows, fields=(), *extra):
+    """(weak ETag, None) for a response listing `rows`: its ETag only"""
+    etag, _ = validators(rows, fields, *extra)
+    return etag, None
+
+
+def set_validators(response, etag, modified):
+    response['ETag'] = etag
+    if modified:
+        response['Last-Modified'] = http_date(modified.timestamp())
+    return response
+
+
+def not_modified(request, etag, modified):
+    """A 304 (or 412) response if the request's preconditions say so, else None"""
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(modified.timestamp()) if modified else None
+    )
+    if response is not None:
+        set_validators(response, etag, modified)
+    return response
@@ -0,0 +1,144 @@
+"""
+Write-coalescing counters for hot engagement columns.
+
+Incrementing views_count/likes_count on every request would take a row
+lock for each one. Instead, increments accumulate in a per-process buffer
+and are written periodically as one `UPDATE ... SET col = col + n` per
+distinct delta. A crash loses at most COUNTER_FLUSH_INTERVAL seconds
+(or COUNTER_MAX_PENDING rows) of increments; a failed write puts its
+increments back in the buffer for the next flush.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+
+from .models import Recipe, Comment
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_INTERVAL = 10
+DEFAULT_MAX_PENDING = 1000
+
+# Every BufferedCounter registers itself here so flush_all() covers it
+COUNTERS = []
+
+
+class BufferedCounter:
+    """
+    Buffers increments of one integer column of one model.
+    A COUNTER_FLUSH_INTERVAL of 0 writes through immediately.
+    """
+
+    def __init__(self, model, field):
+        self.model = model
+        self.field = field
+        self._pending = defaultdict(int)
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._flusher = None
+        self._pid = None
+        COUNTERS.append(self)
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'COUNTER_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+
+    @property
+    def max_pending(self):
+        return getattr(settings, 'COUNTER_MAX_PENDING', DEFAULT_MAX_PENDING)
+
+    def increment(self, pk, amount=1):
+        """Record `amount` more for row `pk`; may trigger a flush"""
+        with self._lock:
+            self._pending[pk] += amount
+            pending = len(self._pending)
+        if self.flush_interval <= 0 or pending >= self.max_pending:
+            self.flush()
+        else:
+            self._ensure_flusher()
+
+    def pending(self, pk):
+        """Increments recorded for `pk` but not yet written"""
+        with self._lock:
+            return self._pending.get(pk, 0)
+
+    def flush(self):
+        """Write all buffered increments, grouping rows with the same delta"""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(int)
+            self._last_flush = time.monotonic()
+        by_amount = defaultdict(list)
+        for pk, amount in pending.items():
+            if amount:
+                by_amount[amount].append(pk)
+        written = 0
+        try:
+            for amount, pks in by_amount.items():
+                self.apply(pks, amount)
+                written += 1
+        except Exception:
+            # Each apply() is one UPDATE: keep the deltas that were not written
+            self.restore(list(by_amount.items())[written:])
+            raise
+        return sum(len(pks) for pks in by_amount.values())
+
+    def restore(self, groups):
+        """Merge unwritten (amount, pks) groups back into the buffer"""
+        with self._lock:
+            for amount, pks in groups:
+                for pk in pks:
+                    self._pending[pk] += amount
+
+    def apply(self, pks, amount):
+        """Write one delta to many rows"""
+        self.model.objects.filter(pk__in=pks).update(**{self.field: F(self.field) + amount})
+
+    def _ensure_flusher(self):
+        # Threads do not survive a fork, so (re)start the flusher per worker
+        if self._flusher is not None and self._pid == os.getpid() and self._flusher.is_alive():
+            return
+        with self._lock:
+            if self._flusher is not None and self._pid == os.getpid() and self._flusher.is_alive():
+                return
+            self._pid = os.getpid()
+            self._flusher = threading.Thread(
+                target=self._run_flusher, name=f'{self.field}-flusher', daemon=True
+            )
+            self._flusher.start()
+
+    def _run_flusher(self):
+        while True:
+            time.sleep(max(self.flush_interval, 1))
+            try:
+                self.flush()
+            except Exception:
+                # The increments are back in the buffer; try again next round
+                logger.exception('Could not flush %s increments', self.field)
+            finally:
+                close_old_connections()
+
+
+recipe_views = BufferedCounter(Recipe, 'views_count')
+recipe_likes = BufferedCounter(Recipe, 'likes_count')
+comment_likes = BufferedCounter(Comment, 'likes_count')
+
+
+def flush_all():
+    """Flush every buffered counter in this process"""
+    return sum(counter.flush() for counter in COUNTERS)
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        flush_all()
+    except Exception:
+        # The database may already be unavailable during interpreter shutdown
+        pass
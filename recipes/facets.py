@@ -0,0 +1,155 @@
+"""
+Faceted filtering of recipe lists.
+
+Filters: ?category=1,2 ?tags=3,4&tags_mode=all|any ?difficulty=easy,medium
+?min_time= / ?max_time= (Recipe.total_time; recipes without times never
+match) ?min_rating=4. Values within one
+facet are OR-ed (except tags with tags_mode=all), facets are AND-ed.
+
+?facets=all (or a comma-separated list of FACETS) adds counts to the
+response. Each facet is counted over the results filtered by every other
+facet, so a client can offer the alternatives of a selected value. All
+counts come from one UNION ALL of grouped aggregates, one query however
+many facets and values there are. total_time and rating are cumulative:
+the count under "30" is what ?max_time=30 would return, the count under
+"4" what ?min_rating=4 would return. Counts are cached per filter set
+for FACET_CACHE_TTL seconds.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, CharField, Count, Exists, F, OuterRef, Q, Value, When
+from django.db.models.functions import Cast
+
+from .models import Recipe
+
+FACETS = ('category', 'tags', 'difficulty', 'total_time', 'rating')
+# Query parameters that change the counts
+FACET_PARAMS = ('category', 'tags', 'tags_mode', 'difficulty', 'min_time', 'max_time', 'min_rating', 'facets')
+DEFAULT_CACHE_TTL = 60
+TIME_LIMITS = (15, 30, 60, 120)
+RATING_THRESHOLDS = (4, 3, 2, 1)
+
+# Stored minutes of prep plus cook, 0 when neither is known
+KNOWN_TIME = Q(total_time__gt=0)
+
+
+def get_cache_ttl():
+    return getattr(settings, 'FACET_CACHE_TTL', DEFAULT_CACHE_TTL)
+
+
+def id_list(value, name):
+    try:
+        return [int(part) for part in value.split(',') if part.strip()]
+    except ValueError:
+        raise ValueError(f'{name} must be a comma-separated list of ids.')
+
+
+def number(value, name, cast=int):
+    try:
+        return cast(value)
+    except ValueError:
+        raise ValueError(f'{name} must be a number.')
+
+
+def parse_params(params):
+    """{facet: Q} for the facet filters present in `params`; ValueError if malformed"""
+    conditions = {}
+    if params.get('category'):
+        conditions['category'] = Q(category_id__in=id_list(params['category'], 'category'))
+    if params.get('tags'):
+        tag_ids = id_list(params['tags'], 'tags')
+        mode = params.get('tags_mode', 'all')
+        if mode not in ('all', 'any'):
+            raise ValueError('tags_mode must be all or any.')
+        through = Recipe.tags.through.objects.filter(recipe_id=OuterRef('pk'))
+        if mode == 'any':
+            conditions['tags'] = Q(Exists(through.filter(tag_id__in=tag_ids)))
+        else:
+            conditions['tags'] = Q(*[Exists(through.filter(tag_id=tag_id)) for tag_id in tag_ids])
+    if params.get('difficulty'):
+        levels = [level.strip() for level in params['difficulty'].split(',') if level.strip()]
+        known = {value for value, _ in Recipe.DIFFICULTY_CHOICES}
+        if not set(levels) <= known:
+            raise ValueError(f'difficulty must be one of {", ".join(sorted(known))}.')
+        conditions['difficulty'] = Q(difficulty__in=levels)
+    if params.get('min_time') or params.get('max_time'):
+        time_range = KNOWN_TIME
+        if params.get('min_time'):
+            time_range &= Q(total_time__gte=number(params['min_time'], 'min_time'))
+        if params.get('max_time'):
+            time_range &= Q(total_time__lte=number(params['max_time'], 'max_time'))
+        conditions['total_time'] = time_range
+    if params.get('min_rating'):
+        minimum = number(params['min_rating'], 'min_rating', float)
+        conditions['rating'] = Q(rating_count__gt=0, rating_sum__gte=F('rating_count') * minimum)
+    return conditions
+
+
+def requested_facets(params):
+    names = [name.strip() for name in params.get('facets', '').split(',') if name.strip()]
+    if names in (['all'], ['true'], ['1']):
+        return list(FACETS)
+    unknown = set(names) - set(FACETS)
+    if unknown:
+        raise ValueError(f'Unknown facets: {", ".join(sorted(unknown))}.')
+    return names
+
+
+def apply(queryset, conditions, skip=None):
+    for facet, condition in conditions.items():
+        if facet != skip:
+            queryset = queryset.filter(condition)
+    return queryset
+
+
+def bucket(thresholds, condition):
+    """Label of the first threshold whose condition holds, as text"""
+    return Case(*[When(condition(threshold), then=Value(str(threshold))) for threshold in thresholds],
+                output_field=CharField())
+
+
+FACET_VALUES = {
+    'category': lambda: Cast('category_id', CharField()),
+    'tags': lambda: Cast('tags__id', CharField()),
+    'difficulty': lambda: F('difficulty'),
+    'total_time': lambda: bucket(TIME_LIMITS, lambda limit: KNOWN_TIME & Q(total_time__lte=limit)),
+    'rating': lambda: bucket(
+        RATING_THRESHOLDS, lambda minimum: Q(rating_count__gt=0, rating_sum__gte=F('rating_count') * minimum)
+    ),
+}
+
+
+def facet_counts(queryset, conditions, names):
+    """
+    {facet: {value: count}} for `queryset` (not yet filtered by facets)
+    in a single query
+    """
+    if not names:
+        return {}
+    parts = [
+        apply(queryset, conditions, skip=name).order_by()
+        .values(facet=Value(name, output_field=CharField()), value=FACET_VALUES[name]())
+        .annotate(count=Count('pk'))
+        for name in names
+    ]
+    counts = {name: {} for name in names}
+    for row in parts[0].union(*parts[1:], all=True):
+        if row['value'] is not None:
+            counts[row['facet']][row['value']] = row['count']
+    # Buckets hold the first threshold met; the filters take everything up to it
+    for name, thresholds in (('total_time', TIME_LIMITS), ('rating', RATING_THRESHOLDS)):
+        if name in counts:
+            buckets, total, counts[name] = counts[name], 0, {}
+            for threshold in thresholds:
+                total += buckets.get(str(threshold), 0)
+                counts[name][str(threshold)] = total
+    return counts
+
+
+def cached_facet_counts(queryset, conditions, names, params, search=''):
+    """facet_counts() cached under the filter parameters and search query"""
+    raw = repr((search, [params.get(name, '') for name in FACET_PARAMS]))
+    key = 'recipes:facets:' + hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+    return cache.get_or_set(key, lambda: facet_counts(queryset, conditions, names), get_cache_ttl())
@@ -0,0 +1,119 @@
+"""
+"My feed": new recipes from the authors a user follows.
+
+Most authors are fanned out on write: publishing a recipe inserts one
+FeedItem per follower, so reading a feed is a single range scan of the
+(user, -created_at, -recipe) index. Authors with more than
+FEED_FANOUT_MAX_FOLLOWERS followers are skipped at write time, because one
+recipe would mean that many inserts. Their recipes are read from the
+(author, -created_at) index instead and merged into the page.
+
+Pages are keyset paginated on (created_at, recipe id).
+"""
+import heapq
+from itertools import islice
+
+from django.conf import settings
+
+from .models import Profile, Recipe, Follow, FeedItem
+from .pagination import before
+
+DEFAULT_FANOUT_MAX_FOLLOWERS = 10000
+DEFAULT_FOLLOW_BACKFILL = 20
+
+
+def get_fanout_max_followers():
+    return getattr(settings, 'FEED_FANOUT_MAX_FOLLOWERS', DEFAULT_FANOUT_MAX_FOLLOWERS)
+
+
+def get_follow_backfill():
+    return getattr(settings, 'FEED_FOLLOW_BACKFILL', DEFAULT_FOLLOW_BACKFILL)
+
+
+def is_fanned_out(follower_count):
+    return follower_count <= get_fanout_max_followers()
+
+
+def follower_count(user_id):
+    """Denormalized follower count; the read side splits authors on the same value"""
+    counts = Profile.objects.filter(user_id=user_id).values_list('followers_count', flat=True)
+    return next(iter(counts), 0)
+
+
+# ============================================================
+# WRITE SIDE
+# ============================================================
+def fan_out_recipe(recipe, batch_size=1000):
+    """Insert the recipe into its author's followers' inboxes; returns rows written"""
+    if not recipe.published or not is_fanned_out(follower_count(recipe.author_id)):
+        return 0
+    followers = Follow.objects.filter(followee_id=recipe.author_id).values_list('follower_id', flat=True)
+    written = 0
+    batch = []
+    for follower_id in followers.iterator(chunk_size=batch_size):
+        batch.append(FeedItem(user_id=follower_id, recipe=recipe, author_id=recipe.author_id,
+                              created_at=recipe.created_at))
+        if len(batch) >= batch_size:
+            written += len(FeedItem.objects.bulk_create(batch, ignore_conflicts=True))
+            batch = []
+    if batch:
+        written += len(FeedItem.objects.bulk_create(batch, ignore_conflicts=True))
+    return written
+
+
+def backfill_follow(follow):
+    """Give a new follower the author's latest recipes (fanned-out authors only)"""
+    if not is_fanned_out(follower_count(follow.followee_id)):
+        return
+    recipes = (
+        Recipe.objects.filter(author_id=follow.followee_id, published=True)
+        .order_by('-created_at', '-id').values_list('pk', 'created_at')[:get_follow_backfill()]
+    )
+    FeedItem.objects.bulk_create(
+        [FeedItem(user_id=follow.follower_id, recipe_id=pk, author_id=follow.followee_id, created_at=created_at)
+         for pk, created_at in recipes],
+        ignore_conflicts=True,
+    )
+
+
+def remove_follow(follow):
+    FeedItem.objects.filter(user_id=follow.follower_id, author_id=follow.followee_id).delete()
+
+
+# ============================================================
+# READ SIDE
+# ============================================================
+def feed_page(user, position=None, size=20, queryset=None):
+    """
+    One page of the user's feed, newest first, starting after `position`.
+    Returns (recipes, next position or None). `queryset` lets callers add
+    select_related/prefetch_related for the recipes they render.
+    """
+    inbox = (
+        FeedItem.objects.filter(before(position, 'created_at', 'recipe_id'), user=user)
+        .order_by('-created_at', '-recipe_id').values_list('created_at', 'recipe_id')[:size + 1]
+    )
+    streams = [list(inbox)]
+
+    fanout_limit = get_fanout_max_followers()
+    pulled_authors = list(
+        Follow.objects.filter(follower=user, followee__profile__followers_count__gt=fanout_limit)
+        .values_list('followee_id', flat=True)
+    )
+    if pulled_authors:
+        streams.append(list(
+            Recipe.objects.filter(before(position, 'created_at', 'id'), author_id__in=pulled_authors, published=True)
+            .order_by('-created_at', '-id').values_list('created_at', 'id')[:size + 1]
+        ))
+
+    merged, seen = [], set()
+    for created_at, pk in heapq.merge(*streams, reverse=True):
+        if pk not in seen:
+            seen.add(pk)
+            merged.append((created_at, pk))
+    page = list(islice(merged, size))
+    next_position = page[-1] if len(merged) > size else None
+
+    queryset = Recipe.objects.all() if queryset is None else queryset
+    recipes = queryset.in_bulk([pk for _, pk in page])
+    return [recipes[pk] for _, pk in page if pk in recipes and recipes[pk].published], next_position
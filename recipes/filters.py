@@ -0,0 +1,43 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+from rest_framework.settings import api_settings
+
+from . import facets
+
+
+class RecipeOrderingFilter(OrderingFilter):
+    """
+    ?ordering= over the view's ordering_fields plus named feeds such as
+    ?ordering=trending. Orderings end with the primary key so cursor
+    pagination stays stable. Search results without an explicit ordering
+    keep their relevance order.
+    """
+    aliases = {
+        'latest': ['-created_at', '-id'],
+        'trending': ['-trending_score', '-id'],
+    }
+
+    def get_ordering(self, request, queryset, view):
+        param = request.query_params.get(self.ordering_param, '').strip()
+        if param in self.aliases:
+            return list(self.aliases[param])
+        if not param and request.query_params.get(api_settings.SEARCH_PARAM, '').strip():
+            return None
+        ordering = super().get_ordering(request, queryset, view)
+        if ordering and not {'id', '-id', 'pk', '-pk'} & set(ordering):
+            ordering = [*ordering, '-id' if ordering[-1].startswith('-') else 'id']
+        return ordering
+
+
+class RecipeFacetFilter(BaseFilterBackend):
+    """
+    ?category=, ?tags= (&tags_mode=all|any), ?difficulty=, ?min_time=,
+    ?max_time= and ?min_rating= (see recipes.facets)
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        try:
+            conditions = facets.parse_params(request.query_params)
+        except ValueError as error:
+            raise ValidationError({'detail': str(error)})
+        return facets.apply(queryset, conditions)
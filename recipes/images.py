@@ -0,0 +1,164 @@
+"""
+Responsive image variants for recipe images and profile avatars.
+
+Fixed-width WebP and JPEG copies of each upload are written next to it
+under `<upload_to>/variants/`. The copies are re-encoded without EXIF and
+rotated upright first. The upload itself stays reachable at its media
+URL, so one carrying EXIF or XMP metadata (GPS position, camera serials)
+is replaced by an upright re-encode without it. Variant paths and
+dimensions are recorded on the model, e.g. Recipe.image_variants:
+
+    {"source": "recipes/soup.jpg", "width": 4032, "height": 3024,
+     "variants": [{"width": 320, "height": 240, "format": "webp",
+                   "path": "recipes/variants/soup-320w.webp"}, ...]}
+"""
+import io
+import logging
+import posixpath
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+VARIANT_WIDTHS = (320, 640, 1280)
+VARIANT_FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+CONTENT_TYPES = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+# Image.info keys of embedded metadata that must not be served
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp')
+# Re-encoding quality for stripped JPEG originals
+ORIGINAL_JPEG_QUALITY = 95
+
+
+def variant_path(source_name, width, extension):
+    directory, filename = posixpath.split(source_name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, 'variants', f'{stem}-{width}w.{extension}')
+
+
+def target_widths(original_width):
+    """Configured widths that don't upscale; tiny images keep their own width"""
+    widths = [width for width in VARIANT_WIDTHS if width <= original_width]
+    return widths or [original_width]
+
+
+def encode(image, extension):
+    options = dict(VARIANT_FORMATS[extension])
+    if extension == 'jpeg' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    # No exif= argument, so the metadata of the upload is not carried over
+    image.save(buffer, **options)
+    return buffer.getvalue()
+
+
+def has_metadata(image):
+    return bool(image.getexif()) or any(key in image.info for key in METADATA_KEYS)
+
+
+def strip_original(field_file, image, image_format):
+    """Replace an upload with `image` (already upright) saved without metadata; returns the new name"""
+    storage = field_file.storage
+    if image_format in ('JPEG', 'MPO'):
+        options = {'format': 'JPEG', 'quality': ORIGINAL_JPEG_QUALITY}
+    else:
+        options = {'format': image_format}
+    if image.info.get('icc_profile'):
+        options['icc_profile'] = image.info['icc_profile']
+    buffer = io.BytesIO()
+    image.save(buffer, **options)
+    storage.delete(field_file.name)
+    return storage.save(field_file.name, ContentFile(buffer.getvalue()))
+
+
+def generate_variants(field_file):
+    """Write all variants for an ImageField file and return their metadata"""
+    storage = field_file.storage
+    with field_file.open('rb') as source:
+        original = Image.open(source)
+        image_format, strip = original.format, has_metadata(original)
+        image = ImageOps.exif_transpose(original)
+        image.load()
+    source_name = strip_original(field_file, image, image_format) if strip else field_file.name
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+    original_width, original_height = image.size
+    variants = []
+    for width in target_widths(original_width):
+        height = max(1, round(original_height * width / original_width))
+        resized = image if width == original_width else image.resize((width, height), Image.LANCZOS)
+        for extension in VARIANT_FORMATS:
+            path = variant_path(source_name, width, extension)
+            if storage.exists(path):
+                storage.delete(path)
+            saved = storage.save(path, ContentFile(encode(resized, extension)))
+            variants.append({'width': width, 'height': height, 'format': extension, 'path': saved})
+    return {
+        'source': source_name,
+        'width': original_width,
+        'height': original_height,
+        'variants': variants,
+    }
+
+
+def delete_variants(storage, data):
+    for variant in (data or {}).get('variants', []):
+        storage.delete(variant['path'])
+
+
+def refresh_variants(instance, field_name, variants_field, force=False):
+    """
+    Regenerate variants when the image changed (or `force`), drop them when
+    the image was cleared, and store the metadata (and the stripped
+    upload's name) without touching other columns. Returns True when the
+    stored metadata changed.
+    """
+    field_file = getattr(instance, field_name)
+    current = getattr(instance, variants_field) or {}
+    if field_file and current.get('source') == field_file.name and not force:
+        return False
+    if not field_file and not current:
+        return False
+
+    delete_variants(field_file.storage, current)
+    data = {}
+    if field_file:
+        try:
+            data = generate_variants(field_file)
+        except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+            logger.exception('Could not generate variants for %s', field_file.name)
+    changes = {variants_field: data}
+    if data and data['source'] != field_file.name:
+        # The storage saved the stripped upload under another name
+        field_file.name = changes[field_name] = data['source']
+    setattr(instance, variants_field, data)
+    type(instance).objects.filter(pk=instance.pk).update(**changes)
+    return True
+
+
+# ============================================================
+# PRESENTATION HELPERS
+# ============================================================
+def variants_of(data, extension):
+    return sorted(
+        (v for v in (data or {}).get('variants', []) if v['format'] == extension),
+        key=lambda v: v['width'],
+    )
+
+
+def build_srcset(data, extension, url):
+    """`url 320w, url 640w, ...` for one format; `url` maps a storage path to a URL"""
+    return ', '.join(f"{url(v['path'])} {v['width']}w" for v in variants_of(data, extension))
+
+
+def pick_variant(data, extension, min_width):
+    """Smallest variant at least `min_width` wide (or the largest one)"""
+    candidates = variants_of(data, extension)
+    for variant in candidates:
+        if variant['width'] >= min_width:
+            return variant
+    return candidates[-1] if candidates else None
@@ -0,0 +1,281 @@
+"""
+Structured ingredients and the ingredient -> recipe posting table.
+
+Each line of Recipe.ingredients is parsed into a quantity, a unit and a
+canonical ingredient name ("2 1/2 cups chopped Tomatoes" -> 2.5, cup,
+tomato) and stored as a RecipeIngredient row. Rows are indexed on
+(ingredient, recipe), so they double as posting lists for "cook with what
+I have" queries.
+
+match_recipes() intersects the posting lists of the included terms,
+starting from the rarest (Ingredient.recipe_count), and drops recipes
+that have any excluded one. Cost grows with the rarest posting list, not
+with the catalogue. A term matches every ingredient name containing it
+as a word ("chicken" -> chicken, chicken breast) and may name a group
+from INGREDIENT_GROUPS ("dairy").
+"""
+import re
+from collections import Counter, namedtuple
+from fractions import Fraction
+
+from django.db import transaction
+from django.db.models import Case, Count, Exists, F, FloatField, OuterRef, Q, Value, When
+from django.db.models.functions import Cast
+
+from .models import Ingredient, Recipe, RecipeIngredient
+from .similarity import INGREDIENT_STOPWORDS
+
+ParsedIngredient = namedtuple('ParsedIngredient', 'quantity unit name')
+
+MAX_NAME_LENGTH = 80
+UNITS = {
+    'g': 'g', 'gr': 'g', 'gram': 'g', 'grams': 'g',
+    'kg': 'kg', 'kilogram': 'kg', 'kilograms': 'kg',
+    'ml': 'ml', 'l': 'l', 'liter': 'l', 'liters': 'l', 'litre': 'l', 'litres': 'l',
+    'tsp': 'tsp', 'teaspoon': 'tsp', 'teaspoons': 'tsp',
+    'tbsp': 'tbsp', 'tablespoon': 'tbsp', 'tablespoons': 'tbsp',
+    'cup': 'cup', 'cups': 'cup',
+    'oz': 'oz', 'ounce': 'oz', 'ounces': 'oz',
+    'lb': 'lb', 'lbs': 'lb', 'pound': 'lb', 'pounds': 'lb',
+    'pinch': 'pinch', 'pinches': 'pinch',
+    'clove': 'clove', 'cloves': 'clove',
+    'can': 'can', 'cans': 'can',
+    'slice': 'slice', 'slices': 'slice',
+    'piece': 'piece', 'pieces': 'piece',
+    'bunch': 'bunch', 'bunches': 'bunch',
+    'handful': 'handful', 'handfuls': 'handful',
+}
+VULGAR_FRACTIONS = {'½': '1/2', '⅓': '1/3', '⅔': '2/3', '¼': '1/4', '¾': '3/4', '⅛': '1/8'}
+# Words that describe an ingredient rather than name it
+DESCRIPTORS = INGREDIENT_STOPWORDS | {
+    'boneless', 'skinless', 'unsalted', 'salted', 'whole', 'dried', 'frozen', 'ripe', 'finely',
+    'roughly', 'freshly', 'grated', 'peeled', 'crushed', 'melted', 'softened', 'cooked', 'raw',
+    'extra', 'virgin', 'some', 'few', 'needed', 'into', 'cut', 'thinly', 'halved', 'beaten',
+}
+# Query terms that stand for a family of ingredients
+INGREDIENT_GROUPS = {
+    'dairy': ('milk', 'cheese', 'butter', 'cream', 'yogurt', 'ghee', 'kefir', 'parmesan', 'mozzarella',
+              'cheddar', 'ricotta', 'feta'),
+    'meat': ('beef', 'pork', 'lamb', 'veal', 'chicken', 'turkey', 'duck', 'bacon', 'ham', 'sausage'),
+    'seafood': ('fish', 'salmon', 'tuna', 'cod', 'shrimp', 'prawn', 'crab', 'lobster', 'mussel', 'squid'),
+    'nut': ('almond', 'walnut', 'peanut', 'cashew', 'pecan', 'hazelnut', 'pistachio'),
+}
+
+QUANTITY_RE = re.compile(
+    r'^(?P<quantity>\d+\s+\d+/\d+|\d+/\d+|\d+(?:[.,]\d+)?)(?:\s*(?:-|–|to)\s*[\d./]+)?\s*'
+)
+WORD_RE = re.compile(r'[^\W\d_]+')
+
+
+def singular(word):
+    if len(word) <= 3 or not word.isascii() or word.endswith(('ss', 'us', 'is')):
+        return word
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith('oes'):
+        return word[:-2]
+    if word.endswith('s'):
+        return word[:-1]
+    return word
+
+
+def canonical_name(text):
+    """Lowercase singular ingredient words, without units or prep words"""
+    words = (singular(word) for word in WORD_RE.findall(text.lower()) if word not in DESCRIPTORS)
+    return ' '.join(word for word in words if len(word) > 1 and word not in DESCRIPTORS)[:MAX_NAME_LENGTH]
+
+
+def parse_line(line):
+    """ParsedIngredient for one ingredient line, or None if it names nothing"""
+    text = line.strip().lstrip('-*•').strip().lower()
+    for symbol, fraction in VULGAR_FRACTIONS.items():
+        text = text.replace(symbol, f' {fraction}')
+    text = re.split(r',(?!\d)', re.sub(r'\([^)]*\)', ' ', text))[0].strip()
+    quantity = None
+    match = QUANTITY_RE.match(text)
+    if match:
+        try:
+            quantity = float(sum(Fraction(part.replace(',', '.')) for part in match['quantity'].split()))
+        except ZeroDivisionError:
+            pass  # "1/0 cup": keep the unit and name, drop the quantity
+        text = text[match.end():]
+    unit = ''
+    head, _, rest = text.partition(' ')
+    if head.rstrip('.') in UNITS:
+        unit = UNITS[head.rstrip('.')]
+        text = rest
+    name = canonical_name(text)
+    return ParsedIngredient(quantity, unit, name) if name else None
+
+
+def parse_ingredients(text):
+    """Parsed lines of a recipe, first occurrence of each ingredient only"""
+    parsed = {}
+    for line in (text or '').splitlines():
+        ingredient = parse_line(line)
+        if ingredient and ingredient.name not in parsed:
+            parsed[ingredient.name] = ingredient
+    return list(parsed.values())
+
+
+def ingredient_ids(names, known=None):
+    """{name: Ingredient id}, creating the names not seen before"""
+    known = known if known is not None else {}
+    missing = [name for name in names if name not in known]
+    if missing:
+        Ingredient.objects.bulk_create([Ingredient(name=name) for name in missing], ignore_conflicts=True)
+        known.update(Ingredient.objects.filter(name__in=missing).values_list('name', 'pk'))
+    return known
+
+
+# ============================================================
+# MAINTENANCE
+# ============================================================
+def sync_recipe(recipe):
+    """Re-parse one recipe's ingredient lines; no writes when nothing changed"""
+    parsed = parse_ingredients(recipe.ingredients)
+    ids = dict(Ingredient.objects.filter(name__in=[p.name for p in parsed]).values_list('name', 'pk'))
+    current = list(
+        RecipeIngredient.objects.filter(recipe_id=recipe.pk).order_by('position')
+        .values_list('ingredient_id', 'quantity', 'unit')
+    )
+    if all(p.name in ids for p in parsed) and current == [(ids[p.name], p.quantity, p.unit) for p in parsed]:
+        return
+    old = {row[0] for row in current}
+    with transaction.atomic():
+        ids = ingredient_ids([p.name for p in parsed], ids)
+        rows = [
+            RecipeIngredient(recipe_id=recipe.pk, ingredient_id=ids[p.name], quantity=p.quantity, unit=p.unit,
+                             position=position)
+            for position, p in enumerate(parsed)
+        ]
+        new = {row.ingredient_id for row in rows}
+        RecipeIngredient.objects.filter(recipe_id=recipe.pk).delete()
+        RecipeIngredient.objects.bulk_create(rows)
+        if new - old:
+            Ingredient.objects.filter(pk__in=new - old).update(recipe_count=F('recipe_count') + 1)
+        if old - new:
+            Ingredient.objects.filter(pk__in=old - new).update(recipe_count=F('recipe_count') - 1)
+        Recipe.objects.filter(pk=recipe.pk).update(ingredient_count=len(rows))
+    recipe.ingredient_count = len(rows)
+
+
+def remove_recipe(recipe):
+    """Take a recipe about to be deleted out of its ingredients' posting counts"""
+    used = RecipeIngredient.objects.filter(recipe_id=recipe.pk).values('ingredient_id')
+    Ingredient.objects.filter(pk__in=used).update(recipe_count=F('recipe_count') - 1)
+
+
+def rebuild_all(batch_size=2000, progress=None):
+    """Re-parse every recipe and recount the posting lists; returns the recipe count"""
+    total = Recipe.objects.count()
+    known = dict(Ingredient.objects.values_list('name', 'pk'))
+    recipe_counts = Counter()
+    done = 0
+    rows = Recipe.objects.values_list('pk', 'ingredients').order_by('pk')
+    with transaction.atomic():
+        RecipeIngredient.objects.all().delete()
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(row)
+            if len(batch) == batch_size:
+                done += store_batch(batch, known, recipe_counts)
+                batch = []
+                if progress:
+                    progress(done, total)
+        if batch:
+            done += store_batch(batch, known, recipe_counts)
+            if progress:
+                progress(done, total)
+        Ingredient.objects.update(recipe_count=0)
+        Ingredient.objects.bulk_update(
+            [Ingredient(pk=pk, recipe_count=count) for pk, count in recipe_counts.items()],
+            ['recipe_count'], batch_size=batch_size,
+        )
+    return done
+
+
+def store_batch(batch, known, recipe_counts):
+    parsed = {pk: parse_ingredients(ingredients) for pk, ingredients in batch}
+    ingredient_ids({p.name for lines in parsed.values() for p in lines}, known)
+    RecipeIngredient.objects.bulk_create([
+        RecipeIngredient(recipe_id=pk, ingredient_id=known[p.name], quantity=p.quantity, unit=p.unit,
+                         position=position)
+        for pk, lines in parsed.items() for position, p in enumerate(lines)
+    ])
+    recipe_counts.update(known[p.name] for lines in parsed.values() for p in lines)
+    # One UPDATE per distinct line count rather than one per recipe
+    by_count = {}
+    for pk, lines in parsed.items():
+        by_count.setdefault(len(lines), []).append(pk)
+    for count, pks in by_count.items():
+        Recipe.objects.filter(pk__in=pks).update(ingredient_count=count)
+    return len(batch)
+
+
+# ============================================================
+# QUERIES
+# ============================================================
+def parse_terms(value):
+    """Canonical query terms from a comma-separated parameter"""
+    terms = (canonical_name(term) for term in (value or '').split(','))
+    return list(dict.fromkeys(term for term in terms if term))
+
+
+def has_word(name, word):
+    return f' {word} ' in f' {name} '
+
+
+def resolve_terms(terms):
+    """{term: [(ingredient id, recipe_count)]} in one query over the ingredient names"""
+    matches = {term: [] for term in terms}
+    if not terms:
+        return matches
+    words = {term: INGREDIENT_GROUPS.get(term, (term,)) for term in terms}
+    condition = Q()
+    for word in {word for group in words.values() for word in group}:
+        condition |= Q(name__contains=word)
+    for pk, name, count in Ingredient.objects.filter(condition, recipe_count__gt=0).values_list(
+            'pk', 'name', 'recipe_count'):
+        for term, group in words.items():
+            if any(has_word(name, word) for word in group):
+                matches[term].append((pk, count))
+    return matches
+
+
+def postings(ingredients):
+    return RecipeIngredient.objects.filter(ingredient_id__in=[pk for pk, _ in ingredients])
+
+
+def match_recipes(queryset, include, exclude=(), match_all=True):
+    """
+    Recipes of `queryset` having the `include` terms (all of them, or at
+    least one when not match_all) and none of the `exclude` ones,
+    annotated with `matched` (included terms present) and `coverage`
+    (matched / the recipe's ingredient count) and ranked by coverage
+    """
+    resolved = resolve_terms([*include, *exclude])
+    excluded = [ingredient for term in exclude for ingredient in resolved[term]]
+    if excluded:
+        queryset = queryset.filter(~Exists(postings(excluded).filter(recipe_id=OuterRef('pk'))))
+    included = [resolved[term] for term in include if resolved[term]]
+    if not included or (match_all and len(included) < len(include)):
+        return queryset.none()
+
+    if match_all:
+        # Drive the intersection from the shortest posting list
+        included.sort(key=lambda ingredients: sum(count for _, count in ingredients))
+        queryset = queryset.filter(pk__in=postings(included[0]).values('recipe_id'))
+        for ingredients in included[1:]:
+            queryset = queryset.filter(Exists(postings(ingredients).filter(recipe_id=OuterRef('pk'))))
+        queryset = queryset.annotate(matched=Value(len(included)))
+    else:
+        term_of = Case(
+            *[When(ingredient_lines__ingredient_id__in=[pk for pk, _ in ingredients], then=Value(index))
+              for index, ingredients in enumerate(included)]
+        )
+        queryset = queryset.filter(
+            ingredient_lines__ingredient_id__in=[pk for ingredients in included for pk, _ in ingredients]
+        ).annotate(matched=Count(term_of, distinct=True))
+    coverage = Cast(F('matched'), FloatField()) / F('ingredient_count')
+    return queryset.annotate(coverage=coverage).order_by('-coverage', '-matched', '-id')
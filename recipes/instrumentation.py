@@ -0,0 +1,235 @@
+"""
+Per-request query instrumentation.
+
+QueryInstrumentationMiddleware records, for every request, the number of
+SQL queries, total DB time, repeated query fingerprints and template render
+time. It reports them as a `Server-Timing` header and one structured log
+line, and compares the query count against settings.QUERY_BUDGETS (keyed by
+URL name). QueryBudgetTestMixin turns those budgets into test assertions.
+"""
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.template import base as template_base
+
+logger = logging.getLogger(__name__)
+
+_state = threading.local()
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+IN_LIST_RE = re.compile(r'\bIN \((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+SPACE_RE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """Normalize SQL so queries differing only in literals compare equal"""
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    sql = IN_LIST_RE.sub('IN (...)', sql)
+    return SPACE_RE.sub(' ', sql).strip()
+
+
+# ============================================================
+# RECORDER
+# ============================================================
+class QueryProfile:
+    """Statistics collected while a profile() block is active"""
+
+    def __init__(self):
+        self.queries = []  # (fingerprint, duration in seconds)
+        self.template_seconds = 0.0
+        self.template_depth = 0
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((fingerprint(sql), time.perf_counter() - start))
+
+    @property
+    def query_count(self):
+        return len(self.queries)
+
+    @property
+    def db_ms(self):
+        return sum(duration for _, duration in self.queries) * 1000
+
+    @property
+    def template_ms(self):
+        return self.template_seconds * 1000
+
+    @property
+    def total_ms(self):
+        return ((self.finished or time.perf_counter()) - self.started) * 1000
+
+    @property
+    def duplicates(self):
+        """Fingerprints executed more than once, with their counts"""
+        counts = Counter(sql for sql, _ in self.queries)
+        return {sql: count for sql, count in counts.most_common() if count > 1}
+
+    @property
+    def duplicate_count(self):
+        """Queries that repeated an earlier fingerprint"""
+        return sum(count - 1 for count in self.duplicates.values())
+
+    def server_timing(self):
+        return ', '.join([
+            f'db;dur={self.db_ms:.1f};desc="{self.query_count} queries"',
+            f'dup;desc="{self.duplicate_count} duplicate queries"',
+            f'tpl;dur={self.template_ms:.1f}',
+            f'total;dur={self.total_ms:.1f}',
+        ])
+
+
+# ============================================================
+# TEMPLATE TIMING
+# ============================================================
+# Template.render is wrapped only while at least one profile() is active
+# in the process; threads without an active profile pass straight through.
+_render_hook_lock = threading.Lock()
+_render_hook_users = 0
+_original_render = None
+
+
+def _instrumented_render(self, context):
+    profile = getattr(_state, 'profile', None)
+    if profile is None or profile.template_depth:
+        return _original_render(self, context)
+    # Only time the outermost template; includes/extends render inside it
+    profile.template_depth += 1
+    start = time.perf_counter()
+    try:
+        return _original_render(self, context)
+    finally:
+        profile.template_seconds += time.perf_counter() - start
+        profile.template_depth -= 1
+
+
+def _install_render_hook():
+    global _render_hook_users, _original_render
+    with _render_hook_lock:
+        if not _render_hook_users:
+            _original_render = template_base.Template.render
+            template_base.Template.render = _instrumented_render
+        _render_hook_users += 1
+
+
+def _remove_render_hook():
+    global _render_hook_users
+    with _render_hook_lock:
+        _render_hook_users -= 1
+        if not _render_hook_users:
+            template_base.Template.render = _original_render
+
+
+@contextmanager
+def profile():
+    """Record queries on every database connection and template render time"""
+    current = QueryProfile()
+    previous = getattr(_state, 'profile', None)
+    _state.profile = current
+    _install_render_hook()
+    try:
+        with ExitStack() as stack:
+            for db_connection in connections.all():
+                stack.enter_context(db_connection.execute_wrapper(current))
+            yield current
+    finally:
+        current.finished = time.perf_counter()
+        _remove_render_hook()
+        _state.profile = previous
+
+
+def get_query_budget(url_name):
+    """Configured query budget for a URL name, or None"""
+    return getattr(settings, 'QUERY_BUDGETS', {}).get(url_name)
+
+
+# ============================================================
+# MIDDLEWARE
+# ============================================================
+class QueryInstrumentationMiddleware:
+    """
+    Adds Server-Timing headers and a structured log line per request.
+    Enabled with settings.QUERY_INSTRUMENTATION; the profile is also
+    attached to the response as `response.query_profile`.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'QUERY_INSTRUMENTATION', False):
+            return self.get_response(request)
+
+        with profile() as stats:
+            response = self.get_response(request)
+
+        match = getattr(request, 'resolver_match', None)
+        url_name = match.url_name if match else None
+        budget = get_query_budget(url_name)
+        response['Server-Timing'] = stats.server_timing()
+        response.query_profile = stats
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'url_name': url_name,
+            'status': response.status_code,
+            'queries': stats.query_count,
+            'db_ms': round(stats.db_ms, 2),
+            'duplicates': stats.duplicate_count,
+            'duplicate_fingerprints': list(stats.duplicates)[:5],
+            'template_ms': round(stats.template_ms, 2),
+            'total_ms': round(stats.total_ms, 2),
+            'budget': budget,
+        }
+        over_budget = budget is not None and stats.query_count > budget
+        logger.log(logging.WARNING if over_budget else logging.INFO, json.dumps(record))
+        return response
+
+
+# ============================================================
+# TEST HELPER
+# ============================================================
+class QueryBudgetTestMixin:
+    """
+    TestCase mixin asserting responses stay within settings.QUERY_BUDGETS.
+    Requests are made with instrumentation enabled, so failures report the
+    repeated fingerprints that usually point at an N+1.
+    """
+
+    def assertWithinQueryBudget(self, response, budget=None):
+        stats = getattr(response, 'query_profile', None)
+        self.assertIsNotNone(stats, 'Response was not instrumented; enable QUERY_INSTRUMENTATION')
+        url_name = response.resolver_match.url_name
+        if budget is None:
+            budget = get_query_budget(url_name)
+        self.assertIsNotNone(budget, f'No query budget configured for {url_name!r}')
+        if stats.query_count > budget:
+            details = '\n'.join(f'  {count}x {sql}' for sql, count in stats.duplicates.items())
+            self.fail(
+                f'{url_name!r} ran {stats.query_count} queries (budget {budget}).'
+                + (f'\nRepeated queries:\n{details}' if details else '')
+            )
+        return stats
+
+    def get_within_budget(self, path, budget=None, **kwargs):
+        with self.settings(QUERY_INSTRUMENTATION=True), self.assertLogs(logger.name, logging.INFO):
+            response = self.client.get(path, **kwargs)
+        self.assertLess(response.status_code, 400, f'GET {path} returned {response.status_code}')
+        self.assertWithinQueryBudget(response, budget)
+        return response
@@ -0,0 +1,83 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes import benchmark
+
+
+class Command(BaseCommand):
+    help = 'Run a mixed-workload latency/throughput benchmark and optionally diff it against a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Benchmark a running server (e.g. http://localhost:8000) '
+                                          'instead of the in-process WSGI app')
+        parser.add_argument('--username', help='Basic auth user for write endpoints when using --url')
+        parser.add_argument('--password', default='')
+        parser.add_argument('--requests', type=int, default=1000, help='Total measured requests')
+        parser.add_argument('--duration', type=float, help='Run for this many seconds instead of --requests')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--warmup', type=int, default=10, help='Unmeasured requests per thread')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--read-only', action='store_true', help='Skip add_rating/add_comment')
+        parser.add_argument('--output', help='Write the result JSON to this file')
+        parser.add_argument('--baseline', help='Result JSON to compare against')
+        parser.add_argument('--fail-threshold', type=float,
+                            help='Exit with an error if any metric regresses by more than this percent')
+
+    def handle(self, *args, **options):
+        run_options = {
+            'requests': options['requests'],
+            'duration': options['duration'],
+            'warmup': options['warmup'],
+            'seed': options['seed'],
+            'writes': not options['read_only'],
+            'concurrency': options['concurrency'],
+        }
+        try:
+            if options['url']:
+                credentials = (options['username'], options['password']) if options['username'] else None
+                if not credentials and run_options['writes']:
+                    self.stderr.write('No --username given; skipping write endpoints.')
+                result = benchmark.run_http(options['url'], credentials, **run_options)
+            else:
+                result = benchmark.run_in_process(**run_options)
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        self.print_summary(result)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(result, f, indent=2)
+            self.stdout.write(f"Saved results to {options['output']}")
+
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            rows = benchmark.compare(result, baseline)
+            self.print_comparison(rows)
+            threshold = options['fail_threshold']
+            regressions = [row for row in rows if threshold is not None and row['change_pct'] > threshold]
+            if regressions:
+                raise CommandError(f'{len(regressions)} metric(s) regressed by more than {threshold}%.')
+
+    def print_summary(self, result):
+        meta = result['meta']
+        self.stdout.write(
+            f"{meta['target']}: {meta['concurrency']} threads, {meta['wall_seconds']}s, "
+            f"{meta['recipes']} recipes on {meta['database']}"
+        )
+        self.stdout.write(f"{'endpoint':<20}{'reqs':>7}{'err':>5}{'rps':>9}{'p50':>9}"
+                          f"{'p95':>9}{'p99':>9}{'queries':>9}")
+        for endpoint, m in result['endpoints'].items():
+            queries = '-' if m['queries'] is None else f"{m['queries']:.1f}"
+            self.stdout.write(
+                f"{endpoint:<20}{m['requests']:>7}{m['errors']:>5}{m['rps']:>9.1f}{m['p50_ms']:>9.1f}"
+                f"{m['p95_ms']:>9.1f}{m['p99_ms']:>9.1f}{queries:>9}"
+            )
+
+    def print_comparison(self, rows):
+        self.stdout.write('\nChange vs baseline (positive = regression):')
+        for row in rows:
+            line = (f"{row['endpoint']:<20}{row['metric']:<9}{row['baseline']:>10}"
+                    f" -> {row['current']:<10}{row['change_pct']:>+8.1f}%")
+            self.stdout.write(self.style.ERROR(line) if row['change_pct'] > 0 else line)
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from recipes import export
+
+
+class Command(BaseCommand):
+    help = 'Stream recipes, comments or ratings as NDJSON or CSV with constant memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(export.DATASETS))
+        parser.add_argument('--format', choices=export.FORMATS, default='ndjson')
+        parser.add_argument('--output', help='File to write (default: stdout)')
+        parser.add_argument('--updated-since', help='Only rows updated on or after this ISO date/datetime')
+        parser.add_argument('--category', type=int, help='Category id (for comments/ratings: of their recipe)')
+        parser.add_argument('--author', help='Username of the row author')
+        parser.add_argument('--chunk-size', type=int, default=export.DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        dataset = options['dataset']
+        try:
+            queryset = export.build_queryset(
+                dataset, options['updated_since'], options['category'], options['author']
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        chunks = export.stream(queryset, export.field_names(dataset), options['format'], options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                output.writelines(chunks)
+            self.stderr.write(self.style.SUCCESS(f'Exported {dataset} to {options["output"]}.'))
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
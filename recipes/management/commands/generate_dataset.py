@@ -0,0 +1,368 @@
+"""
+Deterministic synthetic dataset for benchmarking at production scale.
+
+Popularity follows a Zipf distribution: a few recipes collect most of the
+comments, ratings and views, and a few authors write most recipes. Text
+lengths are log-normal. Output depends only on --seed and the size options,
+not on --workers: every chunk of recipes has its own seeded RNG and explicit
+primary keys. Timestamps are spread backwards from the time of the run.
+
+Worker processes only generate rows; the parent process does all the
+writes with bulk_create. SQLite allows a single writer anyway, and this keeps
+the load order reproducible. Denormalized columns (rating aggregates,
+trending scores) are computed while generating, since bulk_create skips the
+signals that maintain them.
+"""
+import itertools
+import math
+import random
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import timedelta
+from multiprocessing import get_context
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from recipes.models import Category, Tag, Profile, Recipe, Comment, Rating
+from recipes import trending
+from recipes.stats import invalidate_reference_data
+
+
+ADJECTIVES = [
+    'Classic', 'Spicy', 'Creamy', 'Crispy', 'Smoky', 'Zesty', 'Rustic', 'Quick', 'Hearty',
+    'Roasted', 'Grilled', 'Braised', 'Garlic', 'Lemon', 'Honey', 'Herbed', 'Golden', 'Sticky',
+]
+DISHES = [
+    'Carbonara', 'Tacos', 'Curry', 'Risotto', 'Ramen', 'Lasagna', 'Paella', 'Pancakes', 'Chili',
+    'Gnocchi', 'Stir Fry', 'Shakshuka', 'Falafel', 'Biryani', 'Pho', 'Goulash', 'Tagine', 'Salad',
+    'Soup', 'Burger', 'Cookies', 'Brownies', 'Cheesecake', 'Dumplings', 'Quiche', 'Frittata',
+]
+INGREDIENTS = [
+    'chicken breast', 'ground beef', 'pork shoulder', 'salmon fillet', 'shrimp', 'tofu', 'eggs',
+    'spaghetti', 'rice', 'flour', 'butter', 'olive oil', 'garlic', 'onion', 'tomato', 'potato',
+    'carrot', 'bell pepper', 'spinach', 'mushrooms', 'parmesan', 'mozzarella', 'milk', 'cream',
+    'sugar', 'honey', 'lemon', 'lime', 'cilantro', 'basil', 'cumin', 'paprika', 'chili flakes',
+    'soy sauce', 'ginger', 'coconut milk', 'chickpeas', 'black beans', 'avocado', 'chocolate',
+]
+UNITS = ['g', 'kg', 'ml', 'cups', 'tbsp', 'tsp', 'pieces', 'cloves', 'pinch']
+WORDS = (
+    'stir add mix heat simmer season taste serve bake roast chop slice whisk fold pour drain rest '
+    'until golden tender fragrant smooth crisp gently slowly pan pot oven bowl sauce minutes low '
+    'medium high then while and with over the a of to in for on'
+).split()
+CATEGORY_NAMES = [
+    'Breakfast', 'Lunch', 'Dinner', 'Dessert', 'Snacks', 'Soups', 'Salads', 'Baking', 'Drinks',
+    'Vegetarian', 'Seafood', 'Grilling', 'Pasta', 'Asian', 'Mexican', 'Italian', 'Indian', 'French',
+]
+TAG_NAMES = [
+    'Vegan', 'Gluten-Free', 'Quick', 'Spicy', 'Kid-Friendly', 'Healthy', 'Comfort Food', 'Budget',
+    'One-Pot', 'Meal Prep', 'High-Protein', 'Low-Carb', 'Dairy-Free', 'Party', 'Holiday', 'Summer',
+]
+DIFFICULTIES = ['easy', 'medium', 'hard']
+COPRIME_CANDIDATES = [2654435761, 2246822519, 3266489917, 668265263, 374761393]
+
+
+# ============================================================
+# DISTRIBUTIONS
+# ============================================================
+def harmonic(n, s):
+    """Generalized harmonic number H(n, s), the Zipf normalizing constant"""
+    return math.fsum(k ** -s for k in range(1, n + 1))
+
+
+def zipf_cum_weights(n, s):
+    return list(itertools.accumulate(k ** -s for k in range(1, n + 1)))
+
+
+def popularity_rank(index, n):
+    """Deterministic bijection 0..n-1 -> 1..n so popular recipes are spread over time"""
+    for multiplier in COPRIME_CANDIDATES:
+        if math.gcd(multiplier, n) == 1:
+            return (index * multiplier) % n + 1
+    return index + 1
+
+
+def zipf_count(rng, mean, n, rank, s, norm, cap):
+    """How many events the item at `rank` gets when `mean * n` are spread by Zipf(s)"""
+    expected = mean * n * rank ** -s / norm
+    count = int(expected) + (1 if rng.random() < expected - int(expected) else 0)
+    return min(count, cap)
+
+
+def lognormal_int(rng, median, sigma, low, high):
+    return max(low, min(high, int(rng.lognormvariate(math.log(median), sigma))))
+
+
+def sentence(rng, words):
+    text = ' '.join(rng.choice(WORDS) for _ in range(words))
+    return text[:1].upper() + text[1:] + '.'
+
+
+def trending_score(recipe, rows, first_comment, first_rating, weights):
+    """What recipes.trending would have accumulated from this recipe's events"""
+    score = 0.0
+    events = [(recipe['views_count'] * weights.get('view', 0), recipe['created_at'])]
+    events += [(weights.get('comment', 0), row['created_at']) for row in rows['comments'][first_comment:]]
+    events += [(weights.get('rating', 0), row['created_at']) for row in rows['ratings'][first_rating:]]
+    for weight, when in events:
+        if weight:
+            score = trending.log_add(score, trending.log_weight(weight, when))
+    return score
+
+
+# ============================================================
+# CHUNK GENERATION (runs in worker processes)
+# ============================================================
+_author_weights = {}
+
+
+def build_chunk(task):
+    """Generate recipes [start, stop) with their tags, comments and ratings as plain rows"""
+    (seed, start, stop, config) = task
+    rng = random.Random(f'{seed}:recipes:{start}')
+    users, recipes = config['users'], config['recipes']
+    key = (users, config['zipf'])
+    if key not in _author_weights:
+        _author_weights[key] = zipf_cum_weights(users, config['zipf'])
+    author_weights = _author_weights[key]
+    total_weight = author_weights[-1]
+
+    now, span = config['now'], config['days'] * 86400
+    rows = {'recipes': [], 'tags': [], 'comments': [], 'ratings': []}
+    for index in range(start, stop):
+        recipe_id = config['recipe_offset'] + index
+        # Newer recipes are more common: skew the age towards zero
+        created_at = now - timedelta(seconds=span * (1 - math.sqrt(1 - rng.random())))
+        author_index = bisect_left(author_weights, rng.random() * total_weight)
+        rank = popularity_rank(index, recipes)
+        prep_time = rng.choice([None, 5, 10, 15, 20, 30, 45])
+        cook_time = rng.choice([None, 10, 15, 20, 30, 45, 60, 90, 120])
+
+        ingredient_lines = [
+            f'{rng.randint(1, 500)}{rng.choice(UNITS)} {rng.choice(INGREDIENTS)}'
+            for _ in range(lognormal_int(rng, 7, 0.4, 2, 30))
+        ]
+        steps = [
+            f'{step}. {sentence(rng, lognormal_int(rng, 12, 0.5, 3, 60))}'
+            for step in range(1, lognormal_int(rng, 5, 0.5, 1, 25) + 1)
+        ]
+
+        recipe = {
+            'id': recipe_id,
+            'author_id': config['user_offset'] + author_index,
+            'title': f'{rng.choice(ADJECTIVES)} {rng.choice(DISHES)} #{recipe_id}',
+            'description': sentence(rng, lognormal_int(rng, 25, 0.6, 4, 160)),
+            'ingredients': '\n'.join(ingredient_lines),
+            'instructions': '\n'.join(steps),
+            'category_id': rng.choice(config['category_ids']),
+            'prep_time': prep_time,
+            'cook_time': cook_time,
+            'servings': rng.randint(1, 8),
+            'difficulty': rng.choice(DIFFICULTIES),
+            'views_count': zipf_count(rng, config['views'], recipes, rank, config['zipf'],
+                                      config['recipe_norm'], 10 ** 9),
+            'created_at': created_at,
+            'updated_at': created_at,
+            'published': rng.random() > 0.02,
+        }
+        rows['recipes'].append(recipe)
+
+        for tag_id in set(rng.choices(config['tag_ids'], cum_weights=config['tag_weights'],
+                                      k=rng.randint(0, 4))):
+            rows['tags'].append((recipe_id, tag_id))
+
+        age = (now - created_at).total_seconds()
+        comment_count = zipf_count(rng, config['comments'], recipes, rank, config['zipf'],
+                                   config['recipe_norm'], 10 ** 6)
+        for _ in range(comment_count):
+            at = created_at + timedelta(seconds=age * rng.random())
+            rows['comments'].append({
+                'recipe_id': recipe_id,
+                'user_id': config['user_offset'] + rng.randrange(users),
+                'text': sentence(rng, lognormal_int(rng, 15, 0.8, 1, 300)),
+                'created_at': at,
+                'updated_at': at,
+            })
+
+        rating_count = zipf_count(rng, config['ratings'], recipes, rank, config['zipf'],
+                                  config['recipe_norm'], users)
+        histogram = [0] * 6
+        for user_index in rng.sample(range(users), rating_count):
+            score = min(5, max(1, round(rng.gauss(3.8, 1.0))))
+            histogram[score] += 1
+            at = created_at + timedelta(seconds=age * rng.random())
+            rows['ratings'].append({
+                'recipe_id': recipe_id,
+                'user_id': config['user_offset'] + user_index,
+                'score': score,
+                'created_at': at,
+                'updated_at': at,
+            })
+        recipe['rating_count'] = rating_count
+        recipe['rating_sum'] = sum(score * histogram[score] for score in range(1, 6))
+        for score in range(1, 6):
+            recipe[f'rating_count_{score}'] = histogram[score]
+        recipe['trending_score'] = trending_score(recipe, rows, len(rows['comments']) - comment_count,
+                                                  len(rows['ratings']) - rating_count, config['trending_weights'])
+    return stop - start, rows
+
+
+# ============================================================
+# COMMAND
+# ============================================================
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create store generated created_at/updated_at values"""
+    saved = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                saved.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def next_id(model):
+    return (model.objects.aggregate(max_id=Max('pk'))['max_id'] or 0) + 1
+
+
+class Command(BaseCommand):
+    help = 'Generate a large, seeded synthetic dataset with Zipf-skewed engagement'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--categories', type=int, default=len(CATEGORY_NAMES))
+        parser.add_argument('--tags', type=int, default=60)
+        parser.add_argument('--comments-per-recipe', type=float, default=4.0,
+                            help='Mean comments per recipe (Zipf distributed)')
+        parser.add_argument('--ratings-per-recipe', type=float, default=6.0,
+                            help='Mean ratings per recipe (Zipf distributed, capped by --users)')
+        parser.add_argument('--views-per-recipe', type=float, default=250.0)
+        parser.add_argument('--zipf', type=float, default=1.1, help='Zipf exponent for popularity skew')
+        parser.add_argument('--days', type=int, default=730, help='Spread created_at over this many days')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=2000, help='Recipes per generated chunk')
+        parser.add_argument('--workers', type=int, default=1, help='Processes generating rows')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['recipes'] < 1:
+            raise CommandError('--users and --recipes must be positive.')
+        self.started = time.monotonic()
+        seed = options['seed']
+
+        with explicit_timestamps(User, Profile, Category, Tag, Recipe, Comment, Rating):
+            user_offset = self.create_users(options['users'], seed, options['batch_size'])
+            category_ids = self.create_named(Category, CATEGORY_NAMES, options['categories'], seed)
+            tag_ids = self.create_named(Tag, TAG_NAMES, options['tags'], seed)
+            self.create_recipes(options, seed, user_offset, category_ids, tag_ids)
+
+        self.reset_sequences()
+        invalidate_reference_data()
+        self.stdout.write(self.style.SUCCESS(
+            f'Dataset generated in {time.monotonic() - self.started:.1f}s (seed {seed}).'
+        ))
+        # bulk_create skips the signals that keep related recipes and ingredients current
+        self.stdout.write('Run `manage.py rebuild_related_recipes` to precompute related recipes.')
+        self.stdout.write('Run `manage.py rebuild_ingredient_index` to parse ingredients for by_ingredients queries.')
+        self.stdout.write('Run `manage.py rebuild_spelling_dictionary` to correct misspelt searches.')
+
+    def progress(self, label, done, total):
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        self.stdout.write(f'{label}: {done}/{total} ({100 * done / total:.1f}%) [{elapsed:.0f}s]')
+
+    def create_users(self, count, seed, batch_size):
+        offset = next_id(User)
+        now = timezone.now()
+        for start in range(0, count, batch_size):
+            stop = min(start + batch_size, count)
+            users = [
+                User(id=offset + i, username=f'synth{seed}_{offset + i}', email=f'user{offset + i}@example.com',
+                     password='!synthetic', date_joined=now)
+                for i in range(start, stop)
+            ]
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+                Profile.objects.bulk_create(
+                    [Profile(user_id=user.id, created_at=now, updated_at=now) for user in users]
+                )
+            self.progress('users', stop, count)
+        return offset
+
+    def create_named(self, model, names, count, seed):
+        """Categories/tags: real names first, then numbered variants"""
+        existing = set(model.objects.values_list('name', flat=True))
+        now = timezone.now()
+        wanted = [names[i % len(names)] + (f' {i // len(names) + 1}' if i >= len(names) else '')
+                  for i in range(count)]
+        model.objects.bulk_create(
+            [model(name=name, created_at=now) for name in wanted if name not in existing]
+        )
+        ids = dict(model.objects.filter(name__in=wanted).values_list('name', 'id'))
+        return [ids[name] for name in wanted]
+
+    def create_recipes(self, options, seed, user_offset, category_ids, tag_ids):
+        total, batch_size = options['recipes'], options['batch_size']
+        config = {
+            'users': options['users'],
+            'recipes': total,
+            'zipf': options['zipf'],
+            'recipe_norm': harmonic(total, options['zipf']),
+            'comments': options['comments_per_recipe'],
+            'ratings': options['ratings_per_recipe'],
+            'views': options['views_per_recipe'],
+            'days': options['days'],
+            'now': timezone.now(),
+            'user_offset': user_offset,
+            'recipe_offset': next_id(Recipe),
+            'category_ids': category_ids,
+            'tag_ids': tag_ids,
+            'tag_weights': zipf_cum_weights(len(tag_ids), 1.0),
+            'trending_weights': trending.get_weights(),
+        }
+        tasks = [(seed, start, min(start + batch_size, total), config) for start in range(0, total, batch_size)]
+
+        done = 0
+        if options['workers'] > 1:
+            # Children must not share the parent's database connection
+            connections.close_all()
+            with get_context('fork').Pool(options['workers']) as pool:
+                for count, rows in pool.imap(build_chunk, tasks):
+                    done += count
+                    self.write_chunk(rows)
+                    self.progress('recipes', done, total)
+        else:
+            for task in tasks:
+                count, rows = build_chunk(task)
+                done += count
+                self.write_chunk(rows)
+                self.progress('recipes', done, total)
+
+    def write_chunk(self, rows):
+        with transaction.atomic():
+            Recipe.objects.bulk_create([Recipe(**row) for row in rows['recipes']], batch_size=500)
+            Recipe.tags.through.objects.bulk_create(
+                [Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id) for recipe_id, tag_id in rows['tags']],
+                batch_size=2000,
+            )
+            Comment.objects.bulk_create([Comment(**row) for row in rows['comments']], batch_size=1000)
+            Rating.objects.bulk_create([Rating(**row) for row in rows['ratings']], batch_size=1000)
+
+    def reset_sequences(self):
+        """Explicit primary keys leave PostgreSQL sequences behind; catch them up"""
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [User, Profile, Category, Tag, Recipe, Comment, Rating]
+        )
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from recipes.images import refresh_variants
+from recipes.models import Recipe, Profile
+
+
+class Command(BaseCommand):
+    help = 'Generate responsive WebP/JPEG variants for existing recipe images and avatars'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate variants that already exist')
+
+    def handle(self, *args, **options):
+        targets = [
+            (Recipe.objects.exclude(image='').exclude(image__isnull=True), 'image', 'image_variants'),
+            (Profile.objects.exclude(avatar='').exclude(avatar__isnull=True), 'avatar', 'avatar_variants'),
+        ]
+        for queryset, field_name, variants_field in targets:
+            updated = 0
+            rows = queryset.only('pk', field_name, variants_field).iterator(chunk_size=200)
+            for instance in rows:
+                if refresh_variants(instance, field_name, variants_field, force=options['force']):
+                    updated += 1
+            self.stdout.write(f'{queryset.model.__name__}.{field_name}: {updated} updated')
+        self.stdout.write(self.style.SUCCESS('Image variants are up to date.'))
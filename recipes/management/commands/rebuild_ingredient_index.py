@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from recipes.ingredients import rebuild_all
+
+
+class Command(BaseCommand):
+    help = 'Parse every recipe\'s ingredient lines into structured rows and recount the posting lists'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        total = rebuild_all(
+            batch_size=options['batch_size'],
+            progress=lambda done, total: self.stdout.write(f'{done}/{total} recipes'),
+        )
+        self.stdout.write(self.style.SUCCESS(f'Ingredient index rebuilt for {total} recipes.'))
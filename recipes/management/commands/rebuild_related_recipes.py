@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from recipes.similarity import get_related_count, rebuild_all
+
+
+class Command(BaseCommand):
+    help = 'Recompute similarity vectors and the precomputed related-recipe lists'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=None,
+                            help='Neighbours stored per recipe (default: RELATED_RECIPES_COUNT)')
+
+    def handle(self, *args, **options):
+        count = options['count'] or get_related_count()
+        total = rebuild_all(
+            k=count,
+            progress=lambda done, total: self.stdout.write(f'{done}/{total} recipes'),
+        )
+        self.stdout.write(self.style.SUCCESS(f'Related recipes rebuilt for {total} recipes (top {count}).'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from recipes.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the recipe full-text search index from the recipes table'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        if not backend.is_installed(connection):
+            backend.install(connection)
+        else:
+            backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Search index rebuilt ({connection.vendor}).'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from recipes.spelling import rebuild_all
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the spelling dictionary of search corrections from published recipe titles and ingredients'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        total = rebuild_all(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Spelling dictionary rebuilt with {total} words.'))
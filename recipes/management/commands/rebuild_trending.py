@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from recipes.trending import rebuild_scores
+
+
+class Command(BaseCommand):
+    help = 'Recompute trending scores from stored comments, ratings, likes and view counts'
+
+    def handle(self, *args, **options):
+        total = rebuild_scores()
+        self.stdout.write(self.style.SUCCESS(f'Trending scores rebuilt for {total} recipes.'))
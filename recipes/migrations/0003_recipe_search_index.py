@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from recipes.search import get_search_backend
+
+
+def install_search_index(apps, schema_editor):
+    get_search_backend(schema_editor.connection).install(schema_editor.connection)
+
+
+def uninstall_search_index(apps, schema_editor):
+    get_search_backend(schema_editor.connection).uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_alter_category_options_alter_comment_options_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
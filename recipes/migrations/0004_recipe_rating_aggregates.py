@@ -0,0 +1,62 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:10
+
+from django.db import migrations, models
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Rating = apps.get_model('recipes', 'Rating')
+    aggregates = {}
+    for row in Rating.objects.values('recipe_id', 'score').annotate(n=models.Count('id')).order_by():
+        fields = aggregates.setdefault(row['recipe_id'], {'rating_sum': 0, 'rating_count': 0})
+        fields['rating_sum'] += row['score'] * row['n']
+        fields['rating_count'] += row['n']
+        fields[f"rating_count_{row['score']}"] = row['n']
+    for recipe_id, fields in aggregates.items():
+        Recipe.objects.filter(pk=recipe_id).update(**fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_recipe_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_count_1',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_count_2',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_count_3',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_count_4',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_count_5',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
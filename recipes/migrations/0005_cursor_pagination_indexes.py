@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['-created_at', '-id'], name='recipes_com_created_94f6ba_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['-created_at', '-id'], name='recipes_rat_created_87fb55_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['published', '-created_at', '-id'], name='recipes_rec_publish_d662c7_idx'),
+        ),
+    ]
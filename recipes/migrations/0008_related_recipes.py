@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedRecipe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_links', to='recipes.recipe')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_by_links', to='recipes.recipe')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['recipe', '-score'], name='recipes_rel_recipe__adeb68_idx')],
+                'unique_together': {('recipe', 'related')},
+            },
+        ),
+        migrations.CreateModel(
+            name='RecipeFeature',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('feature', models.CharField(max_length=80)),
+                ('weight', models.FloatField()),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarity_features', to='recipes.recipe')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['feature', 'recipe'], name='recipes_rec_feature_f37222_idx')],
+                'unique_together': {('recipe', 'feature')},
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:42
+
+from django.db import migrations, models
+
+
+def backfill_trending_scores(apps, schema_editor):
+    from recipes.trending import compute_scores
+
+    Recipe = apps.get_model('recipes', 'Recipe')
+    scores = compute_scores(Recipe, [
+        (event, apps.get_model('recipes', model_name).objects.values_list('recipe_id', 'created_at'))
+        for event, model_name in [('comment', 'Comment'), ('rating', 'Rating'), ('like', 'RecipeLike')]
+    ])
+    Recipe.objects.bulk_update(
+        [Recipe(pk=pk, trending_score=score) for pk, score in scores.items()],
+        ['trending_score'], batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_related_recipes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='trending_score',
+            field=models.FloatField(default=0.0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-trending_score', '-id'], name='recipes_rec_trendin_60b2c9_idx'),
+        ),
+        migrations.RunPython(backfill_trending_scores, migrations.RunPython.noop),
+    ]
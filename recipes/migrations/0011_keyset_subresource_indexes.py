@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_follow_feeditem'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='recipes_com_recipe__d91579_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='rating',
+            name='recipes_rat_recipe__f5b1c5_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='recipe',
+            name='recipes_rec_categor_70ec1a_idx',
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['recipe', '-created_at', '-id'], name='recipes_com_recipe__3179e6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['recipe', '-created_at', '-id'], name='recipes_rat_recipe__3a3b7b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['category', '-created_at', '-id'], name='recipes_rec_categor_72786f_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-17 20:18
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_total_time(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    minutes = models.IntegerField()
+    Recipe.objects.update(total_time=models.ExpressionWrapper(
+        Coalesce('prep_time', 0, output_field=minutes) + Coalesce('cook_time', 0, output_field=minutes),
+        output_field=minutes,
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_structured_ingredients'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='total_time',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_total_time, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['published', 'total_time', '-created_at'], name='recipes_rec_publish_d87aac_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-17 20:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from recipes.spelling import get_spelling_backend
+
+
+def install_trigram_index(apps, schema_editor):
+    get_spelling_backend(schema_editor.connection).install(schema_editor.connection)
+
+
+def uninstall_trigram_index(apps, schema_editor):
+    get_spelling_backend(schema_editor.connection).uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_recipe_total_time'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=40, unique=True)),
+                ('frequency', models.IntegerField(default=1)),
+            ],
+            options={
+                'ordering': ['term'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchTermTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('term', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='recipes.searchterm')),
+            ],
+            options={
+                'unique_together': {('trigram', 'term')},
+            },
+        ),
+        migrations.RunPython(install_trigram_index, uninstall_trigram_index),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 # ============================================================
@@ -50,6 +51,7 @@ class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     bio = models.TextField(blank=True, max_length=500)
     avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
+    avatar_variants = models.JSONField(default=dict, blank=True, editable=False)
     location = models.CharField(max_length=100, blank=True)
     website = models.URLField(blank=True, null=True)
     followers_count = models.IntegerField(default=0)
@@ -67,6 +69,40 @@ class Profile(models.Model):
 # ============================================================
 # RECIPE MODEL (Core Model)
 # ============================================================
+def total_time_expression(prep_time='prep_time', cook_time='cook_time'):
+    """SQL for Recipe.total_time from prep/cook columns or values"""
+    minutes = models.IntegerField()
+    return models.ExpressionWrapper(
+        Coalesce(prep_time, 0, output_field=minutes) + Coalesce(cook_time, 0, output_field=minutes),
+        output_field=minutes,
+    )
+
+
+class RecipeQuerySet(models.QuerySet):
+    """Keeps the stored total_time in step on writes that bypass save()"""
+
+    def update(self, **kwargs):
+        if ('prep_time' in kwargs or 'cook_time' in kwargs) and 'total_time' not in kwargs:
+            kwargs['total_time'] = total_time_expression(
+                kwargs.get('prep_time', models.F('prep_time')), kwargs.get('cook_time', models.F('cook_time'))
+            )
+        return super().update(**kwargs)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.total_time = obj.get_total_time()
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        if {'prep_time', 'cook_time'} & set(fields):
+            objs = list(objs)
+            for obj in objs:
+                obj.total_time = obj.get_total_time()
+            fields = [*fields, 'total_time']
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+
 class Recipe(models.Model):
     """
     Main Recipe model with comprehensive details
@@ -91,13 +127,31 @@ class Recipe(models.Model):
     # Additional Recipe Details
     prep_time = models.IntegerField(help_text="Preparation time in minutes", null=True, blank=True)
     cook_time = models.IntegerField(help_text="Cooking time in minutes", null=True, blank=True)
+    # prep_time + cook_time, 0 when neither is known (maintained on save and by RecipeQuerySet)
+    total_time = models.IntegerField(default=0, editable=False)
     servings = models.IntegerField(default=1, validators=[MinValueValidator(1)])
     difficulty = models.CharField(max_length=10, choices=DIFFICULTY_CHOICES, default='medium')
     image = models.ImageField(upload_to='recipes/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     
     # Engagement Metrics
     views_count = models.IntegerField(default=0)
     likes_count = models.IntegerField(default=0)
+
+    # Denormalized rating aggregates (maintained by recipes.signals)
+    rating_sum = models.IntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
+    rating_count_1 = models.IntegerField(default=0)
+    rating_count_2 = models.IntegerField(default=0)
+    rating_count_3 = models.IntegerField(default=0)
+    rating_count_4 = models.IntegerField(default=0)
+    rating_count_5 = models.IntegerField(default=0)
+
+    # log2 of time-decayed engagement (maintained by recipes.trending)
+    trending_score = models.FloatField(default=0.0, editable=False)
+
+    # Parsed ingredient lines (maintained by recipes.ingredients)
+    ingredient_count = models.IntegerField(default=0, editable=False)
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True, null=True)
@@ -108,25 +162,73 @@ class Recipe(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['author', '-created_at']),
-            models.Index(fields=['category', '-created_at']),
+            models.Index(fields=['category', '-created_at', '-id']),
+            models.Index(fields=['published', '-created_at', '-id']),
+            models.Index(fields=['-trending_score', '-id']),
+            models.Index(fields=['published', 'total_time', '-created_at']),
         ]
 
+    objects = RecipeQuerySet.as_manager()
+
+    # Maintained with F() / queryset updates elsewhere; an ordinary save of
+    # an instance loaded earlier would write back stale values
+    COUNTER_FIELDS = frozenset({
+        'views_count', 'likes_count', 'rating_sum', 'rating_count',
+        'rating_count_1', 'rating_count_2', 'rating_count_3', 'rating_count_4', 'rating_count_5',
+        'trending_score', 'ingredient_count',
+    })
+
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored state so saves can tell when a recipe gets published
+        instance._loaded_published = instance.__dict__.get('published')
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.total_time = self.get_total_time()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and not self._state.adding and not kwargs.get('force_insert'):
+            skipped = self.COUNTER_FIELDS | self.get_deferred_fields()
+            update_fields = kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in skipped
+            ]
+        if update_fields is not None and {'prep_time', 'cook_time'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'total_time'}
+        super().save(*args, **kwargs)
+
     def get_total_time(self):
         """Calculate total cooking time"""
-        if self.prep_time and self.cook_time:
-            return self.prep_time + self.cook_time
-        return self.prep_time or self.cook_time or 0
+        return (self.prep_time or 0) + (self.cook_time or 0)
 
     def get_average_rating(self):
-        """Calculate average rating for the recipe"""
-        ratings = self.ratings.all()
-        if ratings.exists():
-            return sum(r.score for r in ratings) / ratings.count()
+        """Average rating from the stored aggregates (no queries)"""
+        if self.rating_count:
+            return self.rating_sum / self.rating_count
         return 0
 
+    @property
+    def rating_histogram(self):
+        """Number of ratings per score, keyed 1-5"""
+        return {score: getattr(self, f'rating_count_{score}') for score in range(1, 6)}
+
+    def recalculate_rating_aggregates(self):
+        """Recompute the stored rating aggregates from the Rating rows"""
+        histogram = dict(self.ratings.values_list('score').annotate(models.Count('id')))
+        for score in range(1, 6):
+            setattr(self, f'rating_count_{score}', histogram.get(score, 0))
+        self.rating_count = sum(histogram.values())
+        self.rating_sum = sum(score * count for score, count in histogram.items())
+        Recipe.objects.filter(pk=self.pk).update(
+            rating_sum=self.rating_sum,
+            rating_count=self.rating_count,
+            **{f'rating_count_{score}': histogram.get(score, 0) for score in range(1, 6)}
+        )
+
 
 # ============================================================
 # COMMENT MODEL
@@ -147,7 +249,8 @@ class Comment(models.Model):
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['recipe', '-created_at']),
+            models.Index(fields=['recipe', '-created_at', '-id']),
+            models.Index(fields=['-created_at', '-id']),
         ]
 
     def __str__(self):
@@ -173,8 +276,213 @@ class Rating(models.Model):
     class Meta:
         unique_together = ('recipe', 'user')
         indexes = [
-            models.Index(fields=['recipe', '-created_at']),
+            models.Index(fields=['recipe', '-created_at', '-id']),
+            models.Index(fields=['-created_at', '-id']),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} rated {self.recipe.title}: {self.score}/5"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored values so saves can apply aggregate deltas
+        instance._loaded_recipe_id = instance.__dict__.get('recipe_id')
+        instance._loaded_score = instance.__dict__.get('score')
+        return instance
+
+
+# ============================================================
+# LIKE MODELS
+# ============================================================
+class RecipeLike(models.Model):
+    """
+    A user liking a recipe
+    - Unique constraint: One like per user per recipe
+    - Recipe.likes_count is maintained from these rows by recipes.signals
+    """
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='likes')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recipe_likes')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('recipe', 'user')
+
+    def __str__(self):
+        return f"{self.user.username} likes {self.recipe.title}"
+
+
+class CommentLike(models.Model):
+    """
+    A user liking a comment
+    - Unique constraint: One like per user per comment
+    - Comment.likes_count is maintained from these rows by recipes.signals
+    """
+    comment = models.ForeignKey(Comment, on_delete=models.CASCADE, related_name='likes')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='comment_likes')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('comment', 'user')
+
+    def __str__(self):
+        return f"{self.user.username} likes comment {self.comment_id}"
+
+# ============================================================
+# RELATED RECIPES
+# ============================================================
+class RecipeFeature(models.Model):
+    """
+    One entry of a recipe's similarity vector (tag, category or ingredient
+    token) with its TF-IDF weight, normalized per recipe.
+    - Maintained by recipes.similarity; doubles as an inverted index on `feature`
+    """
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='similarity_features')
+    feature = models.CharField(max_length=80)
+    weight = models.FloatField()
+
+    class Meta:
+        unique_together = ('recipe', 'feature')
+        indexes = [
+            models.Index(fields=['feature', 'recipe']),
+        ]
+
+    def __str__(self):
+        return f"{self.recipe_id}: {self.feature} ({self.weight:.3f})"
+
+
+class RelatedRecipe(models.Model):
+    """
+    Precomputed nearest neighbour of a recipe by cosine similarity
+    - Top RELATED_RECIPES_COUNT rows per recipe, maintained by recipes.similarity
+    """
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='related_links')
+    related = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='related_by_links')
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ('recipe', 'related')
+        indexes = [
+            models.Index(fields=['recipe', '-score']),
+        ]
+
+    def __str__(self):
+        return f"{self.recipe_id} -> {self.related_id} ({self.score:.3f})"
+
+
+# ============================================================
+# FOLLOW GRAPH AND FEED
+# ============================================================
+class Follow(models.Model):
+    """
+    A user following an author
+    - Unique constraint: One follow per follower per author
+    - Profile.followers_count/following_count are maintained by recipes.signals
+    """
+    follower = models.ForeignKey(User, on_delete=models.CASCADE, related_name='following_links')
+    followee = models.ForeignKey(User, on_delete=models.CASCADE, related_name='follower_links')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('follower', 'followee')
+        constraints = [
+            models.CheckConstraint(check=~models.Q(follower=models.F('followee')), name='follow_not_self'),
+        ]
+
+    def __str__(self):
+        return f"{self.follower.username} follows {self.followee.username}"
+
+
+class FeedItem(models.Model):
+    """
+    Inbox row: a followed author's recipe, written at publish time (fan-out on write)
+    - created_at copies the recipe's, so a feed page is one range scan of the index
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='feed_items')
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='feed_items')
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'recipe')
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-recipe']),
+            models.Index(fields=['user', 'author']),
         ]
 
     def __str__(self):
-        return f"{self.user.username} rated {self.recipe.title}: {self.score}/5"
\ No newline at end of file
+        return f"{self.user_id} <- recipe {self.recipe_id}"
+
+
+# ============================================================
+# STRUCTURED INGREDIENTS
+# ============================================================
+class Ingredient(models.Model):
+    """
+    Canonical ingredient name ("chicken breast") shared by recipes
+    - recipe_count is the length of its posting list (maintained by recipes.ingredients)
+    """
+    name = models.CharField(max_length=80, unique=True)
+    recipe_count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+class RecipeIngredient(models.Model):
+    """
+    One parsed line of Recipe.ingredients (maintained by recipes.ingredients)
+    - Indexed on (ingredient, recipe), so it doubles as the ingredient -> recipe posting table
+    """
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='ingredient_lines')
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, related_name='recipe_lines')
+    quantity = models.FloatField(null=True, blank=True)
+    unit = models.CharField(max_length=16, blank=True)
+    position = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        ordering = ['position']
+        unique_together = ('recipe', 'ingredient')
+        indexes = [
+            models.Index(fields=['ingredient', 'recipe']),
+        ]
+
+    def __str__(self):
+        return f"{self.recipe_id}: {self.quantity or ''} {self.unit} {self.ingredient_id}".strip()
+
+
+# ============================================================
+# SPELLING DICTIONARY
+# ============================================================
+class SearchTerm(models.Model):
+    """
+    A word of published recipe titles and ingredient names, the vocabulary
+    that misspelt searches are corrected against (see recipes.spelling)
+    - frequency counts the recipes using it as of the last rebuild
+    """
+    term = models.CharField(max_length=40, unique=True)
+    frequency = models.IntegerField(default=1)
+
+    class Meta:
+        ordering = ['term']
+
+    def __str__(self):
+        return self.term
+
+
+class SearchTermTrigram(models.Model):
+    """
+    Trigram -> term posting table for databases without pg_trgm
+    - Indexed on (trigram, term) so candidates are found by index range scans
+    """
+    trigram = models.CharField(max_length=3)
+    term = models.ForeignKey(SearchTerm, on_delete=models.CASCADE, related_name='trigrams')
+
+    class Meta:
+        unique_together = ('trigram', 'term')
+
+    def __str__(self):
+        return f"{self.trigram}: {self.term_id}"
@@ -0,0 +1,62 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class StandardResultsSetPagination(PageNumberPagination):
+    """
+    Default page-number pagination for small tables and ranked results.
+    Clients may ask for ?page_size= up to max_page_size.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """
+    Keyset pagination over (-created_at, -id), or over the view's
+    ?ordering= when it has an ordering filter. Each page is an index range
+    scan from the cursor position, so deep pages cost the same as the
+    first one and no COUNT(*) is issued.
+
+    A cursor holds the last row's ordering value, not a snapshot of the
+    ordering. Over a column that moves while a client pages, such as
+    trending_score or likes_count, a row overtaking the cursor is skipped
+    and one falling behind it is shown again. Between rebuild_trending
+    runs trending_score only rises, so ?ordering=trending can skip rows
+    but does not repeat them.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+# ============================================================
+# KEYSET HELPERS
+# ============================================================
+# For pages assembled outside a DRF paginator (the follow feed, comment
+# "load more" fragments): a position is the (created_at, id) of the last
+# row shown, newest first.
+def encode_cursor(position):
+    created_at, pk = position
+    return base64.urlsafe_b64encode(f'{created_at.isoformat()}|{pk}'.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """(created_at, id) from a cursor string; ValueError if malformed"""
+    try:
+        created_at, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except ValueError:
+        raise ValueError('Invalid cursor') from None
+
+
+def before(position, created_at_field, id_field):
+    if position is None:
+        return Q()
+    created_at, pk = position
+    return Q(**{f'{created_at_field}__lt': created_at}) | Q(**{created_at_field: created_at, f'{id_field}__lt': pk})
@@ -0,0 +1,283 @@
+"""
+Full-text search backends for recipes.
+
+SQLite uses an FTS5 external-content table and PostgreSQL uses a weighted
+tsvector column with a GIN index. Both indexes are maintained by database
+triggers, so bulk writes stay indexed as well.
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.settings import api_settings
+
+
+# Indexed columns, most important first: title > ingredients > description > instructions
+SEARCH_FIELDS = ['title', 'ingredients', 'description', 'instructions']
+SEARCH_WEIGHTS = {'title': 10.0, 'ingredients': 5.0, 'description': 2.0, 'instructions': 1.0}
+POSTGRES_WEIGHT_LABELS = {'title': 'A', 'ingredients': 'B', 'description': 'C', 'instructions': 'D'}
+
+SQLITE_FTS_TABLE = 'recipes_recipe_fts'
+POSTGRES_SEARCH_CONFIG = 'english'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(query):
+    """Split a raw user query into lowercase word tokens"""
+    return [token.lower() for token in TOKEN_RE.findall(query or '')]
+
+
+# ============================================================
+# BACKENDS
+# ============================================================
+class BaseSearchBackend:
+    """
+    Interface shared by all search backends.
+    search() filters a Recipe queryset and annotates it with `search_rank`
+    (higher is better) ordered best match first.
+    """
+    vendor = None
+
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+    def is_installed(self, connection):
+        """Whether the index structures exist in the database"""
+        return False
+
+    def install(self, connection):
+        """Create the index structures and fill them from existing rows"""
+
+    def install_triggers(self, connection):
+        """(Re)create the triggers that keep the index in sync"""
+
+    def uninstall(self, connection):
+        """Drop the index structures"""
+
+    def rebuild(self):
+        """Rebuild the whole index from the recipes table"""
+
+
+class BasicSearchBackend(BaseSearchBackend):
+    """
+    Fallback for databases without a native full-text index.
+    Matches every token with icontains across the indexed fields.
+    """
+
+    def search(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return queryset.none()
+        for token in tokens:
+            condition = Q()
+            for field in SEARCH_FIELDS:
+                condition |= Q(**{f'{field}__icontains': token})
+            queryset = queryset.filter(condition)
+        return queryset.annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        ).order_by('-created_at')
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """
+    FTS5 backend. Ranking uses bm25() with per-column weights; bm25 returns
+    lower-is-better scores, so they are negated into `search_rank`.
+    """
+    vendor = 'sqlite'
+
+    @staticmethod
+    def build_match(tokens):
+        # Quote each token so user input can never form FTS5 operators,
+        # and prefix-match the last one for search-as-you-type.
+        terms = ['"%s"' % token.replace('"', '""') for token in tokens]
+        terms[-1] += '*'
+        return ' '.join(terms)
+
+    def search(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return queryset.none()
+        match = self.build_match(tokens)
+        table = queryset.model._meta.db_table
+        weights = ', '.join(str(SEARCH_WEIGHTS[field]) for field in SEARCH_FIELDS)
+        matches = RawSQL(
+            f'"{table}"."id" IN (SELECT rowid FROM {SQLITE_FTS_TABLE} '
+            f'WHERE {SQLITE_FTS_TABLE} MATCH %s)',
+            [match], output_field=BooleanField(),
+        )
+        rank = RawSQL(
+            f'(SELECT -bm25({SQLITE_FTS_TABLE}, {weights}) FROM {SQLITE_FTS_TABLE} '
+            f'WHERE {SQLITE_FTS_TABLE} MATCH %s AND rowid = "{table}"."id")',
+            [match], output_field=FloatField(),
+        )
+        return queryset.filter(matches).annotate(search_rank=rank).order_by('-search_rank', '-created_at')
+
+    def is_installed(self, connection):
+        return SQLITE_FTS_TABLE in connection.introspection.table_names()
+
+    def install(self, connection):
+        columns = ', '.join(SEARCH_FIELDS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_FTS_TABLE} USING fts5("
+                f"{columns}, content='recipes_recipe', content_rowid='id', "
+                f"tokenize='porter unicode61')"
+            )
+            cursor.execute(f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}) VALUES('rebuild')")
+        self.install_triggers(connection)
+
+    def install_triggers(self, connection):
+        # SQLite drops triggers whenever Django rebuilds recipes_recipe during
+        # a migration, so this runs again after every migrate (see apps.py).
+        columns = ', '.join(SEARCH_FIELDS)
+        new_values = ', '.join(f'new.{field}' for field in SEARCH_FIELDS)
+        old_values = ', '.join(f'old.{field}' for field in SEARCH_FIELDS)
+        delete_old = (
+            f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, {columns}) "
+            f"VALUES('delete', old.id, {old_values});"
+        )
+        insert_new = f"INSERT INTO {SQLITE_FTS_TABLE}(rowid, {columns}) VALUES(new.id, {new_values});"
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_ai AFTER INSERT ON recipes_recipe "
+                f"BEGIN {insert_new} END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_ad AFTER DELETE ON recipes_recipe "
+                f"BEGIN {delete_old} END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_au "
+                f"AFTER UPDATE OF {columns} ON recipes_recipe "
+                f"BEGIN {delete_old} {insert_new} END"
+            )
+
+    def uninstall(self, connection):
+        with connection.cursor() as cursor:
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {SQLITE_FTS_TABLE}_{suffix}')
+            cursor.execute(f'DROP TABLE IF EXISTS {SQLITE_FTS_TABLE}')
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}) VALUES('rebuild')")
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    tsvector backend. `recipes_recipe.search_vector` holds a setweight()-ed
+    document (A-D by field importance) and is covered by a GIN index.
+    """
+    vendor = 'postgresql'
+
+    @staticmethod
+    def build_tsquery(tokens):
+        terms = [f'{token}:*' if i == len(tokens) - 1 else token for i, token in enumerate(tokens)]
+        return ' & '.join(terms)
+
+    def search(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return queryset.none()
+        tsquery = self.build_tsquery(tokens)
+        table = queryset.model._meta.db_table
+        matches = RawSQL(
+            f'"{table}"."search_vector" @@ to_tsquery(%s, %s)',
+            [POSTGRES_SEARCH_CONFIG, tsquery], output_field=BooleanField(),
+        )
+        rank = RawSQL(
+            f'ts_rank_cd("{table}"."search_vector", to_tsquery(%s, %s))',
+            [POSTGRES_SEARCH_CONFIG, tsquery], output_field=FloatField(),
+        )
+        return queryset.filter(matches).annotate(search_rank=rank).order_by('-search_rank', '-created_at')
+
+    def is_installed(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM information_schema.columns "
+                "WHERE table_name = 'recipes_recipe' AND column_name = 'search_vector'"
+            )
+            return cursor.fetchone() is not None
+
+    def install(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute('ALTER TABLE recipes_recipe ADD COLUMN IF NOT EXISTS search_vector tsvector')
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector_gin '
+                'ON recipes_recipe USING GIN (search_vector)'
+            )
+            cursor.execute(f'UPDATE recipes_recipe SET search_vector = {postgres_document_sql()}')
+        self.install_triggers(connection)
+
+    def install_triggers(self, connection):
+        columns = ', '.join(SEARCH_FIELDS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE OR REPLACE FUNCTION recipes_recipe_search_vector_update() RETURNS trigger AS $$ '
+                f'BEGIN NEW.search_vector := {postgres_document_sql("NEW.")}; RETURN NEW; END '
+                '$$ LANGUAGE plpgsql'
+            )
+            cursor.execute('DROP TRIGGER IF EXISTS recipes_recipe_search_vector_trigger ON recipes_recipe')
+            cursor.execute(
+                'CREATE TRIGGER recipes_recipe_search_vector_trigger '
+                f'BEFORE INSERT OR UPDATE OF {columns} ON recipes_recipe '
+                'FOR EACH ROW EXECUTE FUNCTION recipes_recipe_search_vector_update()'
+            )
+
+    def uninstall(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER IF EXISTS recipes_recipe_search_vector_trigger ON recipes_recipe')
+            cursor.execute('DROP FUNCTION IF EXISTS recipes_recipe_search_vector_update()')
+            cursor.execute('DROP INDEX IF EXISTS recipes_recipe_search_vector_gin')
+            cursor.execute('ALTER TABLE recipes_recipe DROP COLUMN IF EXISTS search_vector')
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'UPDATE recipes_recipe SET search_vector = {postgres_document_sql()}')
+
+
+def postgres_document_sql(prefix=''):
+    """SQL expression building the weighted tsvector for a recipe row"""
+    parts = [
+        f"setweight(to_tsvector('{POSTGRES_SEARCH_CONFIG}', coalesce({prefix}{field}, '')), "
+        f"'{POSTGRES_WEIGHT_LABELS[field]}')"
+        for field in SEARCH_FIELDS
+    ]
+    return ' || '.join(parts)
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_search_backend(db_connection=None):
+    """Return the search backend matching the given (or default) database"""
+    vendor = (db_connection or connection).vendor
+    return BACKENDS.get(vendor, BasicSearchBackend)()
+
+
+def search_recipes(queryset, query):
+    """Filter and rank a Recipe queryset by a free-text query"""
+    return get_search_backend().search(queryset, query)
+
+
+# ============================================================
+# DRF FILTER BACKEND
+# ============================================================
+class RecipeSearchFilter(BaseFilterBackend):
+    """
+    DRF filter backend that routes `?search=` through the full-text index
+    instead of SearchFilter's per-field icontains scans.
+    """
+    search_param = api_settings.SEARCH_PARAM
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        return search_recipes(queryset, query)
@@ -1,8 +1,149 @@
+from django.contrib.auth.models import User
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Count
 from rest_framework import serializers
 from .models import Recipe, Category, Tag, Comment, Rating
+from .images import build_srcset
 
 
-class CategorySerializer(serializers.ModelSerializer):
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def requested_names(context, param):
+    """Names in ?fields= / ?expand= for read requests, None when absent"""
+    request = (context or {}).get('request')
+    if request is None or request.method not in SAFE_METHODS or param not in request.query_params:
+        return None
+    return {name.strip() for name in request.query_params[param].split(',') if name.strip()}
+
+
+class SparseFieldsMixin:
+    """
+    ?fields=a,b limits a read response to those fields, and ?expand=x
+    replaces the id in `x` with the nested object for the names listed in
+    `expandable_fields` ({name: (serializer class, kwargs)}). Writes always
+    see every field.
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        expand = (requested_names(self.context, 'expand') or set()) & set(self.expandable_fields)
+        for name in expand:
+            serializer_class, options = self.expandable_fields[name]
+            self.fields[name] = serializer_class(read_only=True, **options)
+        only = requested_names(self.context, 'fields')
+        if only is not None:
+            for name in set(self.fields) - only - expand:
+                self.fields.pop(name)
+
+
+class EagerLoadingMixin(SparseFieldsMixin):
+    """
+    Builds an optimized queryset from the fields the serializer will
+    render. Forward relations read by a field are joined with
+    select_related, to-many relations are prefetched, and `annotations`
+    ({field name: {annotation: expression}}) are applied for the fields
+    that read them instead of running a query per row.
+
+    Read querysets also load only the columns those fields read, so list
+    pages skip the large text columns they never show. Method fields and
+    model properties declare their columns in `field_sources`; an
+    undeclared one keeps every column.
+    """
+    annotations = {}
+    field_sources = {}
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, context=None, required=()):
+        """`required` columns are loaded even when ?fields= leaves them out"""
+        request = (context or {}).get('request')
+        # Writes save the instance back, so they keep every column
+        project = request is None or request.method in SAFE_METHODS
+        return eager_load(queryset, cls(context=context or {}), required, project)
+
+
+def eager_load(queryset, serializer, required=(), project=True):
+    """`queryset` with the joins, annotations and columns `serializer` reads"""
+    select_related, prefetch_related, columns = set(), set(), set(required)
+    complete = plan_fields(serializer, queryset.model, [], select_related, prefetch_related, columns)
+    if select_related:
+        queryset = queryset.select_related(*sorted(select_related))
+    if prefetch_related:
+        queryset = queryset.prefetch_related(*sorted(prefetch_related))
+    annotations = {
+        name: expression
+        for field_name, field_annotations in getattr(serializer, 'annotations', {}).items()
+        if field_name in serializer.fields
+        for name, expression in field_annotations.items()
+    }
+    if annotations:
+        queryset = queryset.annotate(**annotations)
+    if project and complete:
+        queryset = queryset.only(*sorted(columns | {queryset.model._meta.pk.name}))
+    return queryset
+
+
+def projected(queryset, serializer_class, fields=None, extra=()):
+    """
+    Column projection for pages that show what a serializer shows:
+    `queryset` narrowed to the columns `serializer_class` reads for
+    `fields` (default: its Meta.fields) plus `extra` columns, with the
+    joins those need
+    """
+    serializer = serializer_class()
+    if fields is not None:
+        for name in set(serializer.fields) - set(fields):
+            serializer.fields.pop(name)
+    return eager_load(queryset, serializer, extra)
+
+
+def plan_fields(serializer, model, prefix, select_related, prefetch_related, columns):
+    """
+    Collect the joins, prefetches and columns `serializer` reads from
+    `model` rows reached through `prefix`. False if some column is unknown.
+    """
+    complete = True
+    sources = getattr(serializer, 'field_sources', {})
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if name in sources:
+            columns.update('__'.join(prefix + [column]) for column in sources[name])
+            continue
+        if field.source == '*':
+            complete = False
+            continue
+        path, current, many = list(prefix), model, False
+        for attr in field.source_attrs:
+            try:
+                model_field = current._meta.get_field(attr)
+            except FieldDoesNotExist:
+                complete = False
+                break
+            path.append(attr)
+            if not model_field.is_relation:
+                if not many:
+                    columns.add('__'.join(path))
+                break
+            many = many or model_field.many_to_many or model_field.one_to_many
+            current = model_field.related_model
+            if many:
+                prefetch_related.add('__'.join(path))
+            elif model_field.concrete and attr == field.source_attrs[-1]:
+                # A foreign key rendered as its id
+                columns.add('__'.join(path))
+            else:
+                select_related.add('__'.join(path))
+        else:
+            if isinstance(field, serializers.BaseSerializer) and not many:
+                child = getattr(field, 'child', field)
+                complete &= plan_fields(child, current, path, select_related, prefetch_related, columns)
+                select_related.add('__'.join(path))
+    return complete
+
+
+class CategorySerializer(EagerLoadingMixin, serializers.ModelSerializer):
     """
     Serializer for Category model.
     Converts Category instances to/from JSON.
@@ -13,7 +154,7 @@ class CategorySerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     """
     Serializer for Tag model.
     Converts Tag instances to/from JSON.
@@ -24,7 +165,21 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class UserSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    """
+    Serializer for User model.
+    Public fields and follow counts only.
+    """
+    followers_count = serializers.IntegerField(source='profile.followers_count', read_only=True, default=0)
+    following_count = serializers.IntegerField(source='profile.following_count', read_only=True, default=0)
+
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'followers_count', 'following_count']
+        read_only_fields = ['id', 'username']
+
+
+class CommentSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     """
     Serializer for Comment model.
     Includes user information and recipe reference.
@@ -32,13 +187,15 @@ class CommentSerializer(serializers.ModelSerializer):
     user_username = serializers.CharField(source='user.username', read_only=True)
     recipe_title = serializers.CharField(source='recipe.title', read_only=True)
 
+    expandable_fields = {'user': (UserSerializer, {})}
+
     class Meta:
         model = Comment
         fields = ['id', 'user', 'user_username', 'recipe', 'recipe_title', 'text', 'created_at', 'updated_at', 'likes_count']
         read_only_fields = ['id', 'created_at', 'updated_at', 'likes_count']
 
 
-class RatingSerializer(serializers.ModelSerializer):
+class RatingSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     """
     Serializer for Rating model.
     Includes user and recipe information.
@@ -46,6 +203,8 @@ class RatingSerializer(serializers.ModelSerializer):
     user_username = serializers.CharField(source='user.username', read_only=True)
     recipe_title = serializers.CharField(source='recipe.title', read_only=True)
 
+    expandable_fields = {'user': (UserSerializer, {})}
+
     class Meta:
         model = Rating
         fields = ['id', 'user', 'user_username', 'recipe', 'recipe_title', 'score', 'created_at']
@@ -58,7 +217,26 @@ class RatingSerializer(serializers.ModelSerializer):
         return value
 
 
-class RecipeDetailSerializer(serializers.ModelSerializer):
+class ImageSrcsetMixin:
+    """Adds `image_srcset`: srcset strings per format for the recipe image"""
+
+    def get_image_srcset(self, obj):
+        if not obj.image or not obj.image_variants:
+            return None
+        storage = obj.image.storage
+        request = self.context.get('request')
+
+        def url(path):
+            url = storage.url(path)
+            return request.build_absolute_uri(url) if request else url
+
+        return {
+            extension: build_srcset(obj.image_variants, extension, url)
+            for extension in ('webp', 'jpeg')
+        }
+
+
+class RecipeDetailSerializer(ImageSrcsetMixin, EagerLoadingMixin, serializers.ModelSerializer):
     """
     Detailed serializer for Recipe model.
     Includes category, tags, and average rating.
@@ -81,29 +259,45 @@ class RecipeDetailSerializer(serializers.ModelSerializer):
     )
     author_username = serializers.CharField(source='author.username', read_only=True)
     average_rating = serializers.SerializerMethodField()
+    rating_histogram = serializers.DictField(child=serializers.IntegerField(), read_only=True)
     comments_count = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
+
+    annotations = {'comments_count': {'comments_total': Count('comments')}}
+    field_sources = {
+        'average_rating': ('rating_sum', 'rating_count'),
+        'rating_histogram': tuple(f'rating_count_{score}' for score in range(1, 6)),
+        'comments_count': (),
+        'image_srcset': ('image', 'image_variants'),
+    }
+    expandable_fields = {'author': (UserSerializer, {})}
 
     class Meta:
         model = Recipe
         fields = [
             'id', 'title', 'description', 'ingredients', 'instructions',
             'author', 'author_username', 'category', 'category_id', 'tags', 'tag_ids',
-            'prep_time', 'cook_time', 'servings', 'difficulty', 'published',
+            'prep_time', 'cook_time', 'total_time', 'servings', 'difficulty', 'published',
             'created_at', 'updated_at', 'views_count', 'likes_count',
-            'average_rating', 'comments_count', 'image'
+            'average_rating', 'rating_count', 'rating_histogram', 'comments_count', 'image', 'image_srcset'
+        ]
+        read_only_fields = [
+            'id', 'author', 'author_username', 'created_at', 'updated_at', 'views_count', 'likes_count',
+            'rating_count'
         ]
-        read_only_fields = ['id', 'author', 'author_username', 'created_at', 'updated_at', 'views_count', 'likes_count']
 
     def get_average_rating(self, obj):
-        """Calculate average rating for the recipe"""
+        """Average rating from the recipe's stored aggregates"""
         return obj.get_average_rating()
 
     def get_comments_count(self, obj):
-        """Get count of comments for the recipe"""
-        return obj.comment_set.count()
+        """Comment count from the queryset annotation, falling back to a query"""
+        if hasattr(obj, 'comments_total'):
+            return obj.comments_total
+        return obj.comments.count()
 
 
-class RecipeListSerializer(serializers.ModelSerializer):
+class RecipeListSerializer(ImageSrcsetMixin, EagerLoadingMixin, serializers.ModelSerializer):
     """
     Simplified serializer for Recipe model.
     Used for list views with reduced data.
@@ -111,16 +305,27 @@ class RecipeListSerializer(serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     author_username = serializers.CharField(source='author.username', read_only=True)
     average_rating = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
+
+    field_sources = {
+        'average_rating': ('rating_sum', 'rating_count'),
+        'image_srcset': ('image', 'image_variants'),
+    }
+    expandable_fields = {
+        'author': (UserSerializer, {}),
+        'category': (CategorySerializer, {}),
+        'tags': (TagSerializer, {'many': True}),
+    }
 
     class Meta:
         model = Recipe
         fields = [
             'id', 'title', 'author', 'author_username', 'category', 'category_name',
-            'prep_time', 'cook_time', 'servings', 'difficulty', 'published',
-            'views_count', 'likes_count', 'average_rating', 'image', 'created_at'
+            'prep_time', 'cook_time', 'total_time', 'servings', 'difficulty', 'published',
+            'views_count', 'likes_count', 'average_rating', 'image', 'image_srcset', 'created_at'
         ]
         read_only_fields = ['id', 'author', 'created_at', 'views_count', 'likes_count']
 
     def get_average_rating(self, obj):
-        """Calculate average rating for the recipe"""
+        """Average rating from the recipe's stored aggregates"""
         return obj.get_average_rating()
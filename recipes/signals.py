@@ -0,0 +1,310 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import Category, Tag, Profile, Recipe, Comment, Rating, RecipeLike, CommentLike, Follow
+from .counters import recipe_likes, comment_likes
+from .stats import invalidate_reference_data
+from .images import refresh_variants, delete_variants
+from .similarity import schedule_refresh
+from .ingredients import remove_recipe, sync_recipe
+from . import trending
+from .feed import fan_out_recipe, backfill_follow, remove_follow
+from . import comments as comment_section
+from . import spelling, suggest
+
+
+# ============================================================
+# RATING AGGREGATES
+# ============================================================
+def apply_rating_delta(recipe_id, score, sign):
+    """Add (sign=1) or remove (sign=-1) one score from a recipe's aggregates"""
+    Recipe.objects.filter(pk=recipe_id).update(
+        rating_sum=F('rating_sum') + sign * score,
+        rating_count=F('rating_count') + sign,
+        **{f'rating_count_{score}': F(f'rating_count_{score}') + sign}
+    )
+
+
+@receiver(post_save, sender=Rating)
+def rating_saved(sender, instance, created, raw=False, **kwargs):
+    """Keep Recipe rating aggregates in sync when a rating is added or changed"""
+    if raw:
+        return
+    old_recipe_id = getattr(instance, '_loaded_recipe_id', None)
+    old_score = getattr(instance, '_loaded_score', None)
+    if not created and (old_recipe_id is None or old_score is None):
+        # Saved without being loaded first, so the previous score is unknown
+        Recipe(pk=instance.recipe_id).recalculate_rating_aggregates()
+    else:
+        with transaction.atomic():
+            if not created:
+                if old_recipe_id == instance.recipe_id and old_score == instance.score:
+                    return
+                apply_rating_delta(old_recipe_id, old_score, -1)
+            apply_rating_delta(instance.recipe_id, instance.score, 1)
+    instance._loaded_recipe_id = instance.recipe_id
+    instance._loaded_score = instance.score
+
+
+@receiver(post_delete, sender=Rating)
+def rating_deleted(sender, instance, **kwargs):
+    """Remove a deleted rating from its recipe's aggregates"""
+    apply_rating_delta(instance.recipe_id, instance.score, -1)
+
+
+# ============================================================
+# LIKE COUNTERS
+# ============================================================
+@receiver(post_save, sender=RecipeLike)
+def recipe_like_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        recipe_likes.increment(instance.recipe_id)
+        trending.record(instance.recipe_id, 'like')
+
+
+@receiver(post_delete, sender=RecipeLike)
+def recipe_like_deleted(sender, instance, **kwargs):
+    recipe_likes.increment(instance.recipe_id, -1)
+
+
+@receiver(post_save, sender=CommentLike)
+def comment_like_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        comment_likes.increment(instance.comment_id)
+
+
+@receiver(post_delete, sender=CommentLike)
+def comment_like_deleted(sender, instance, **kwargs):
+    comment_likes.increment(instance.comment_id, -1)
+
+
+# ============================================================
+# CACHED REFERENCE DATA
+# ============================================================
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=User)
+def reference_data_changed(sender, **kwargs):
+    """Drop cached site stats and category/tag summaries"""
+    invalidate_reference_data()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, created, **kwargs):
+    # Logins save last_login, so only new users change the stats
+    if created:
+        invalidate_reference_data()
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_reference_data()
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, raw=False, **kwargs):
+    """Drop the recipe's cached first page of comments"""
+    if not raw:
+        comment_section.invalidate(instance.recipe_id)
+
+
+# ============================================================
+# CONDITIONAL GET VERSIONS
+# ============================================================
+# Recipe responses show the category name, tag names and author username,
+# and their ETag/Last-Modified follow Recipe.updated_at (recipes.conditional).
+# Changes to those related rows bump it on the recipes that show them.
+def touch_recipes(recipes):
+    recipes.update(updated_at=timezone.now())
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_touched(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action == 'post_clear' or (action in ('post_add', 'post_remove') and pk_set):
+            touch_recipes(Recipe.objects.filter(pk=instance.pk))
+    elif action in ('post_add', 'post_remove') and pk_set:
+        touch_recipes(Recipe.objects.filter(pk__in=pk_set))
+    elif action == 'pre_clear':
+        # post_clear no longer knows which recipes had the tag
+        touch_recipes(Recipe.objects.filter(tags=instance))
+
+
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+def category_touched(sender, instance, created=False, raw=False, **kwargs):
+    if not created and not raw:
+        touch_recipes(Recipe.objects.filter(category=instance))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def tag_touched(sender, instance, created=False, raw=False, **kwargs):
+    if not created and not raw:
+        touch_recipes(Recipe.objects.filter(tags=instance))
+
+
+@receiver(post_save, sender=User)
+def author_touched(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # Logins only save last_login, which no recipe response shows
+    if created or raw or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    touch_recipes(Recipe.objects.filter(author=instance))
+
+
+# ============================================================
+# IMAGE VARIANTS
+# ============================================================
+@receiver(post_save, sender=Recipe)
+def recipe_image_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_variants(instance, 'image', 'image_variants')
+
+
+@receiver(post_save, sender=Profile)
+def profile_avatar_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_variants(instance, 'avatar', 'avatar_variants')
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_image_deleted(sender, instance, **kwargs):
+    delete_variants(instance.image.storage, instance.image_variants)
+
+
+@receiver(post_delete, sender=Profile)
+def profile_avatar_deleted(sender, instance, **kwargs):
+    delete_variants(instance.avatar.storage, instance.avatar_variants)
+
+
+# ============================================================
+# RELATED RECIPES
+# ============================================================
+@receiver(post_save, sender=Recipe)
+def recipe_similarity_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_refresh(instance)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_similarity_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        schedule_refresh(instance)
+    elif pk_set:
+        for recipe in Recipe.objects.filter(pk__in=pk_set):
+            schedule_refresh(recipe)
+
+
+# ============================================================
+# STRUCTURED INGREDIENTS
+# ============================================================
+@receiver(post_save, sender=Recipe)
+def recipe_ingredients_saved(sender, instance, raw=False, **kwargs):
+    """Re-parse the ingredient lines into the posting table"""
+    if not raw:
+        sync_recipe(instance)
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_ingredients_deleted(sender, instance, **kwargs):
+    """Decrement the posting counts while the RecipeIngredient rows still exist"""
+    remove_recipe(instance)
+
+
+# ============================================================
+# SEARCH SUGGESTIONS
+# ============================================================
+@receiver(post_save, sender=Recipe)
+def recipe_suggestions_saved(sender, instance, raw=False, **kwargs):
+    # Registered after recipe_ingredients_saved, so new ingredient names are stored
+    if not raw:
+        suggest.recipe_changed(instance)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Tag)
+def name_suggestions_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        suggest.index.add(sender._meta.model_name, instance.pk, instance.name)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Tag)
+def suggestions_deleted(sender, instance, **kwargs):
+    suggest.index.remove(sender._meta.model_name, instance.pk)
+
+
+# ============================================================
+# SPELLING DICTIONARY
+# ============================================================
+@receiver(post_save, sender=Recipe)
+def recipe_spelling_saved(sender, instance, raw=False, **kwargs):
+    """Add new words of published recipes to the spelling dictionary"""
+    if not raw:
+        spelling.recipe_changed(instance)
+
+
+# ============================================================
+# TRENDING
+# ============================================================
+@receiver(post_save, sender=Rating)
+@receiver(post_save, sender=Comment)
+def engagement_created(sender, instance, created, raw=False, **kwargs):
+    """New ratings and comments count towards the recipe's trending score"""
+    if created and not raw:
+        trending.record(instance.recipe_id, 'rating' if sender is Rating else 'comment')
+
+
+# ============================================================
+# FOLLOWS AND FEED
+# ============================================================
+def apply_follow_delta(follow, sign):
+    """Adjust both users' follow counters in place"""
+    for user_id, field in ((follow.follower_id, 'following_count'), (follow.followee_id, 'followers_count')):
+        if not Profile.objects.filter(user_id=user_id).update(**{field: F(field) + sign}):
+            # Users created outside registration have no profile yet: start one from the Follow rows
+            Profile.objects.get_or_create(user_id=user_id, defaults={
+                'followers_count': Follow.objects.filter(followee_id=user_id).count(),
+                'following_count': Follow.objects.filter(follower_id=user_id).count(),
+            })
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        with transaction.atomic():
+            apply_follow_delta(instance, 1)
+            backfill_follow(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    with transaction.atomic():
+        apply_follow_delta(instance, -1)
+        remove_follow(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_feed_saved(sender, instance, created, raw=False, **kwargs):
+    """Fan a recipe out to followers when it gets published"""
+    if raw:
+        return
+    was_published = getattr(instance, '_loaded_published', None)
+    instance._loaded_published = instance.published
+    if not instance.published or was_published:
+        return
+    # Instances not loaded from the database can't tell, so check for earlier fan-out
+    if created or was_published is False or not instance.feed_items.exists():
+        fan_out_recipe(instance)
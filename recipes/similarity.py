@@ -0,0 +1,310 @@
+"""
+Related recipes by cosine similarity.
+
+Every recipe becomes a sparse TF-IDF vector over its tags, its category and
+the tokens of its ingredient lines ("200g chicken breast" -> chicken,
+breast). Vectors are stored normalized in RecipeFeature, and the top
+RELATED_RECIPES_COUNT neighbours of each recipe are stored in RelatedRecipe,
+so the detail page and API only read precomputed rows.
+
+rebuild_all() recomputes everything in memory with an inverted index;
+refresh_recipe() re-scores one recipe when its features change and slots
+it into its neighbours' lists. IDF weights of other recipes are those of
+their last refresh, so a periodic rebuild keeps them exact.
+"""
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Min, Sum, Value, When
+
+from .models import Recipe, RecipeFeature, RelatedRecipe
+
+DEFAULT_RELATED_COUNT = 6
+# Posting entries read per recipe when looking for candidates. Features
+# shared by too many recipes (e.g. a big category) are not scanned; they
+# still count towards the scores of the best candidates found
+MAX_SCANNED_POSTINGS = 1000
+RESCORED_CANDIDATES = 100
+MIN_COMMON_SLICE = 200
+REFRESH_CANDIDATES = 30
+RECIPE_TOTAL_KEY = 'recipes:similarity:recipe_total'
+RECIPE_TOTAL_TTL = 300
+
+FEATURE_WEIGHTS = {'t': 1.0, 'c': 0.6, 'i': 1.0}
+TOKEN_RE = re.compile(r'[a-z]+')
+INGREDIENT_STOPWORDS = {
+    'and', 'or', 'of', 'the', 'for', 'with', 'to', 'taste', 'fresh', 'large', 'small', 'medium',
+    'chopped', 'diced', 'sliced', 'minced', 'ground', 'optional', 'about', 'plus', 'more',
+    'cup', 'cups', 'tbsp', 'tsp', 'tablespoon', 'tablespoons', 'teaspoon', 'teaspoons', 'pinch',
+    'kg', 'ml', 'oz', 'lb', 'lbs', 'pieces', 'piece', 'cloves', 'clove', 'can', 'cans', 'slices',
+}
+
+
+def get_related_count():
+    return getattr(settings, 'RELATED_RECIPES_COUNT', DEFAULT_RELATED_COUNT)
+
+
+def ingredient_tokens(text):
+    """Distinct ingredient words, without quantities, units or prep words"""
+    tokens = set()
+    for word in TOKEN_RE.findall((text or '').lower()):
+        if len(word) < 3 or word in INGREDIENT_STOPWORDS:
+            continue
+        if word.endswith('s') and not word.endswith('ss') and len(word) > 3:
+            word = word[:-1]
+        tokens.add(word)
+    return tokens
+
+
+def extract_features(category_id, tag_ids, ingredients):
+    features = {f't:{tag_id}' for tag_id in tag_ids}
+    if category_id:
+        features.add(f'c:{category_id}')
+    features.update(f'i:{token}' for token in ingredient_tokens(ingredients))
+    return features
+
+
+def weigh(features, document_frequency, total):
+    """Normalized TF-IDF vector {feature: weight} for one recipe"""
+    vector = {
+        feature: FEATURE_WEIGHTS[feature[0]] * (math.log((1 + total) / (1 + document_frequency[feature])) + 1)
+        for feature in features
+    }
+    norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+    return {feature: weight / norm for feature, weight in vector.items()}
+
+
+# ============================================================
+# FULL REBUILD
+# ============================================================
+def load_features():
+    tag_ids = defaultdict(list)
+    through = Recipe.tags.through.objects.values_list('recipe_id', 'tag_id')
+    for recipe_id, tag_id in through.iterator(chunk_size=5000):
+        tag_ids[recipe_id].append(tag_id)
+    rows = Recipe.objects.values_list('pk', 'category_id', 'ingredients').order_by('pk')
+    return {
+        pk: extract_features(category_id, tag_ids.get(pk, ()), ingredients)
+        for pk, category_id, ingredients in rows.iterator(chunk_size=2000)
+    }
+
+
+def nearest_neighbours(vectors, postings, recipe_id, k):
+    """
+    Top-k (score, id) for one recipe. Postings are scanned rarest first
+    until MAX_SCANNED_POSTINGS entries have been read; the features left
+    over are sampled and then scored exactly for the best
+    RESCORED_CANDIDATES found.
+    """
+    vector = vectors[recipe_id]
+    scores = defaultdict(float)
+    budget = MAX_SCANNED_POSTINGS
+    remaining = []
+    for feature in sorted(vector, key=lambda f: len(postings[f])):
+        posting = postings[feature]
+        if len(posting) > budget:
+            remaining.append(feature)
+            continue
+        budget -= len(posting)
+        weight = vector[feature]
+        for other_id, other_weight in posting:
+            scores[other_id] += weight * other_weight
+    if remaining:
+        # Spend what is left of the budget on the newest entries of each
+        # common feature; recipes sharing several of them rank first
+        share = max(budget // len(remaining), MIN_COMMON_SLICE)
+        partial = defaultdict(float, scores)
+        for feature in remaining:
+            weight = vector[feature]
+            for other_id, other_weight in postings[feature][-share:]:
+                partial[other_id] += weight * other_weight
+        shortlist = heapq.nlargest(RESCORED_CANDIDATES, partial, key=partial.__getitem__)
+        scores = {
+            other_id: scores.get(other_id, 0.0) + sum(vector[f] * vectors[other_id].get(f, 0.0) for f in remaining)
+            for other_id in shortlist
+        }
+    scores.pop(recipe_id, None)
+    return heapq.nlargest(k, ((score, other_id) for other_id, score in scores.items() if score > 0))
+
+
+def rebuild_all(k=None, batch_size=5000, progress=None):
+    """Recompute every recipe's vector and neighbour list; returns the recipe count"""
+    k = k or get_related_count()
+    features = load_features()
+    total = len(features)
+    document_frequency = Counter(feature for recipe_features in features.values() for feature in recipe_features)
+    vectors = {pk: weigh(recipe_features, document_frequency, total) for pk, recipe_features in features.items()}
+    postings = defaultdict(list)
+    for pk, vector in vectors.items():
+        for feature, weight in vector.items():
+            postings[feature].append((pk, weight))
+
+    with transaction.atomic():
+        RelatedRecipe.objects.all().delete()
+        RecipeFeature.objects.all().delete()
+        feature_rows, related_rows = [], []
+        for done, (pk, vector) in enumerate(vectors.items(), 1):
+            feature_rows.extend(RecipeFeature(recipe_id=pk, feature=f, weight=w) for f, w in vector.items())
+            related_rows.extend(
+                RelatedRecipe(recipe_id=pk, related_id=other_id, score=score)
+                for score, other_id in nearest_neighbours(vectors, postings, pk, k)
+            )
+            if len(feature_rows) >= batch_size or done == total:
+                RecipeFeature.objects.bulk_create(feature_rows, batch_size=batch_size)
+                RelatedRecipe.objects.bulk_create(related_rows, batch_size=batch_size)
+                feature_rows, related_rows = [], []
+                if progress:
+                    progress(done, total)
+    return total
+
+
+# ============================================================
+# INCREMENTAL REFRESH
+# ============================================================
+def recipe_total():
+    """Recipe count for IDF weights; cached, as one save barely moves it"""
+    return cache.get_or_set(RECIPE_TOTAL_KEY, Recipe.objects.count, RECIPE_TOTAL_TTL)
+
+
+def schedule_refresh(recipe):
+    """
+    Refresh a recipe once its transaction commits. A form or serializer
+    save fires post_save and then m2m_changed for the tags; inside one
+    transaction both callbacks see the final state, and the second finds
+    the features unchanged.
+    """
+    transaction.on_commit(lambda: refresh_recipe(recipe))
+
+
+def candidate_scores(recipe_id, vector, document_frequency):
+    """
+    {recipe id: dot product} for the recipes most similar to `vector`,
+    reading postings rarest first up to MAX_SCANNED_POSTINGS entries like
+    nearest_neighbours(). Features too common for that budget contribute
+    their newest entries to a shortlist that is then scored exactly.
+    """
+    others = RecipeFeature.objects.exclude(recipe_id=recipe_id)
+    budget = MAX_SCANNED_POSTINGS
+    scanned, common = [], []
+    for feature in sorted(vector, key=document_frequency.__getitem__):
+        size = document_frequency[feature] - 1
+        if size > budget:
+            common.append(feature)
+        else:
+            scanned.append(feature)
+            budget -= size
+    scores = defaultdict(float)
+    for other_id, feature, weight in others.filter(feature__in=scanned).values_list('recipe_id', 'feature', 'weight'):
+        scores[other_id] += vector[feature] * weight
+    if not common:
+        return scores
+    share = max(budget // len(common), MIN_COMMON_SLICE)
+    partial = defaultdict(float, scores)
+    for feature in common:
+        newest = others.filter(feature=feature).order_by('-recipe_id').values_list('recipe_id', 'weight')[:share]
+        for other_id, weight in newest:
+            partial[other_id] += vector[feature] * weight
+    shortlist = heapq.nlargest(RESCORED_CANDIDATES, partial, key=partial.__getitem__)
+    dot = Case(*[When(feature=f, then=Value(w)) for f, w in vector.items()], output_field=FloatField())
+    return dict(
+        others.filter(recipe_id__in=shortlist, feature__in=vector).values('recipe_id')
+        .annotate(score=Sum(F('weight') * dot)).values_list('recipe_id', 'score')
+    )
+
+
+def refresh_recipe(recipe, k=None):
+    """
+    Re-vectorize one recipe, recompute its neighbours and insert it into
+    (or drop it from) the neighbour lists of the recipes it scored against.
+    Two queries and no writes when its category, tags and ingredient tokens
+    are unchanged. Returns the new neighbours, None if skipped.
+    """
+    features = extract_features(
+        recipe.category_id, recipe.tags.values_list('pk', flat=True), recipe.ingredients
+    )
+    stored = set(RecipeFeature.objects.filter(recipe_id=recipe.pk).values_list('feature', flat=True))
+    if stored == features:
+        return None
+    return rescore(recipe, features, k or get_related_count())
+
+
+@transaction.atomic
+def rescore(recipe, features, k):
+    """Store a recipe's new vector and neighbours; candidate scoring reads bounded postings"""
+    counts = (
+        RecipeFeature.objects.filter(feature__in=features).exclude(recipe_id=recipe.pk)
+        .values_list('feature').annotate(n=Count('pk'))
+    )
+    document_frequency = Counter(dict(counts))
+    document_frequency.update(features)
+    vector = weigh(features, document_frequency, recipe_total())
+
+    RecipeFeature.objects.filter(recipe_id=recipe.pk).delete()
+    RecipeFeature.objects.bulk_create(
+        [RecipeFeature(recipe_id=recipe.pk, feature=f, weight=w) for f, w in vector.items()]
+    )
+    RelatedRecipe.objects.filter(recipe_id=recipe.pk).delete()
+    RelatedRecipe.objects.filter(related_id=recipe.pk).delete()
+    if not vector:
+        return []
+
+    scores = candidate_scores(recipe.pk, vector, document_frequency)
+    candidates = heapq.nsmallest(
+        max(REFRESH_CANDIDATES, k),
+        ((other_id, score) for other_id, score in scores.items() if score > 0),
+        key=lambda item: (-item[1], item[0]),
+    )
+    RelatedRecipe.objects.bulk_create(
+        [RelatedRecipe(recipe_id=recipe.pk, related_id=other_id, score=score) for other_id, score in candidates[:k]]
+    )
+
+    # Similarity is symmetric: add this recipe where it beats a neighbour's weakest entry
+    lists = {
+        row['recipe_id']: row for row in
+        RelatedRecipe.objects.filter(recipe_id__in=[other_id for other_id, _ in candidates])
+        .values('recipe_id').annotate(n=Count('pk'), low=Min('score'))
+    }
+    inserted, full = [], []
+    for other_id, score in candidates:
+        current = lists.get(other_id)
+        if current is None or current['n'] < k:
+            inserted.append(RelatedRecipe(recipe_id=other_id, related_id=recipe.pk, score=score))
+        elif score > current['low']:
+            inserted.append(RelatedRecipe(recipe_id=other_id, related_id=recipe.pk, score=score))
+            full.append(other_id)
+    RelatedRecipe.objects.bulk_create(inserted)
+    if full:
+        weakest = {}
+        for pk, owner_id, score in (
+            RelatedRecipe.objects.filter(recipe_id__in=full).values_list('pk', 'recipe_id', 'score')
+        ):
+            if owner_id not in weakest or score < weakest[owner_id][1]:
+                weakest[owner_id] = (pk, score)
+        RelatedRecipe.objects.filter(pk__in=[pk for pk, _ in weakest.values()]).delete()
+    return candidates[:k]
+
+
+def get_related_recipes(recipe, queryset=None, limit=None):
+    """
+    Published neighbours of `recipe`, most similar first, with a
+    `similarity` attribute. Recipes that were never indexed fall back to
+    the newest recipes of the same category.
+    """
+    limit = limit or get_related_count()
+    queryset = Recipe.objects.all() if queryset is None else queryset
+    related = list(
+        queryset.filter(related_by_links__recipe=recipe, published=True)
+        .annotate(similarity=F('related_by_links__score'))
+        .order_by('-similarity', 'pk')[:limit]
+    )
+    if related or not recipe.category_id:
+        return related
+    return list(
+        queryset.filter(category_id=recipe.category_id, published=True)
+        .exclude(pk=recipe.pk).order_by('-created_at')[:limit]
+    )
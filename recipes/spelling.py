@@ -0,0 +1,218 @@
+"""
+Spelling correction for searches that find little.
+
+The dictionary (SearchTerm) is the vocabulary of published recipe titles
+and ingredient names. Words are compared by trigram similarity, as
+pg_trgm does: a word is padded to "  word " and cut into three-letter
+pieces, and two words are as similar as the share of pieces they have in
+common ("spagetti" / "spaghetti": 7 of 12, 0.58). PostgreSQL finds the
+candidates for a misspelt word through a pg_trgm GIN index on
+SearchTerm.term, other databases through SearchTermTrigram, a precomputed
+trigram -> term posting table.
+
+Correction only runs when the exact full-text search found fewer than
+SPELLING_MIN_RESULTS recipes, so ordinary searches cost nothing extra.
+Words of saved recipes are added as they come; rebuild_spelling_dictionary
+recounts frequencies and drops words no published recipe uses any more.
+"""
+import math
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import BooleanField, Count, F, FloatField, Func, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Abs, Length
+
+from .ingredients import parse_ingredients
+from .models import Recipe, SearchTerm, SearchTermTrigram
+from .search import search_recipes, tokenize
+
+MIN_WORD_LENGTH = 3
+MAX_WORD_LENGTH = 40
+# Candidates per misspelt word that are scored exactly
+MAX_CANDIDATES = 50
+DEFAULT_MIN_RESULTS = 3
+DEFAULT_MIN_SIMILARITY = 0.3
+
+
+def get_min_results():
+    return getattr(settings, 'SPELLING_MIN_RESULTS', DEFAULT_MIN_RESULTS)
+
+
+def get_min_similarity():
+    return getattr(settings, 'SPELLING_MIN_SIMILARITY', DEFAULT_MIN_SIMILARITY)
+
+
+def trigrams(word):
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(word, other):
+    """Shared trigrams over distinct trigrams of both words, 0 to 1"""
+    ours, theirs = trigrams(word), trigrams(other)
+    shared = len(ours & theirs)
+    return shared / (len(ours) + len(theirs) - shared)
+
+
+def is_word(token):
+    return token.isalpha() and MIN_WORD_LENGTH <= len(token) <= MAX_WORD_LENGTH
+
+
+def recipe_words(title, ingredients):
+    """Dictionary words of a recipe: its title and canonical ingredient names"""
+    words = {token for token in tokenize(title) if is_word(token)}
+    for parsed in parse_ingredients(ingredients):
+        words.update(token for token in tokenize(parsed.name) if is_word(token))
+    return words
+
+
+# ============================================================
+# BACKENDS
+# ============================================================
+class TrigramTableBackend:
+    """Candidates from the SearchTermTrigram posting table"""
+    stores_trigrams = True
+
+    def install(self, connection):
+        """Create the trigram index structures"""
+
+    def uninstall(self, connection):
+        """Drop the trigram index structures"""
+
+    def candidates(self, word):
+        """(term, frequency) of dictionary words sharing enough trigrams with `word`"""
+        grams = trigrams(word)
+        # similarity <= shared / len(grams): terms sharing fewer can never qualify
+        minimum = math.ceil(get_min_similarity() * len(grams))
+        rows = (
+            SearchTermTrigram.objects.filter(trigram__in=grams)
+            .values('term__term', 'term__frequency').annotate(shared=Count('pk')).filter(shared__gte=minimum)
+            .order_by('-shared', Abs(Length('term__term') - len(word)))[:MAX_CANDIDATES]
+        )
+        return [(row['term__term'], row['term__frequency']) for row in rows]
+
+
+class PostgresTrigramBackend:
+    """
+    Candidates from a pg_trgm GIN index on SearchTerm.term. The `%`
+    operator applies pg_trgm.similarity_threshold (0.3 by default), so
+    SPELLING_MIN_SIMILARITY below that has no effect here.
+    """
+    stores_trigrams = False
+
+    def install(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS recipes_searchterm_term_trgm '
+                'ON recipes_searchterm USING GIN (term gin_trgm_ops)'
+            )
+
+    def uninstall(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX IF EXISTS recipes_searchterm_term_trgm')
+
+    def candidates(self, word):
+        matches = RawSQL('"recipes_searchterm"."term" %% %s', [word], output_field=BooleanField())
+        score = Func(F('term'), Value(word), function='similarity', output_field=FloatField())
+        return list(
+            SearchTerm.objects.filter(matches).annotate(score=score)
+            .order_by('-score', '-frequency').values_list('term', 'frequency')[:MAX_CANDIDATES]
+        )
+
+
+BACKENDS = {
+    'postgresql': PostgresTrigramBackend,
+}
+
+
+def get_spelling_backend(db_connection=None):
+    """Return the spelling backend matching the given (or default) database"""
+    vendor = (db_connection or connection).vendor
+    return BACKENDS.get(vendor, TrigramTableBackend)()
+
+
+# ============================================================
+# DICTIONARY
+# ============================================================
+def store_trigrams(terms, batch_size=None):
+    """Posting rows for (pk, term) pairs, if the backend keeps them"""
+    if get_spelling_backend().stores_trigrams:
+        SearchTermTrigram.objects.bulk_create(
+            [SearchTermTrigram(trigram=gram, term_id=pk) for pk, term in terms for gram in trigrams(term)],
+            batch_size=batch_size, ignore_conflicts=True,
+        )
+
+
+def add_words(words):
+    """Add the words not yet in the dictionary; returns how many were new"""
+    words = set(words)
+    if not words:
+        return 0
+    new = words - set(SearchTerm.objects.filter(term__in=words).values_list('term', flat=True))
+    if new:
+        with transaction.atomic():
+            SearchTerm.objects.bulk_create([SearchTerm(term=word) for word in new], ignore_conflicts=True)
+            store_trigrams(SearchTerm.objects.filter(term__in=new).values_list('pk', 'term'))
+    return len(new)
+
+
+def recipe_changed(recipe):
+    if recipe.published:
+        add_words(recipe_words(recipe.title, recipe.ingredients))
+
+
+def rebuild_all(batch_size=5000):
+    """Recount the dictionary from the published recipes; returns the number of words"""
+    frequency = Counter()
+    rows = Recipe.objects.filter(published=True).order_by().values_list('title', 'ingredients')
+    for title, ingredients in rows.iterator(chunk_size=batch_size):
+        frequency.update(recipe_words(title, ingredients))
+    with transaction.atomic():
+        SearchTermTrigram.objects.all().delete()
+        SearchTerm.objects.all().delete()
+        SearchTerm.objects.bulk_create(
+            [SearchTerm(term=word, frequency=count) for word, count in frequency.items()], batch_size=batch_size
+        )
+        store_trigrams(SearchTerm.objects.values_list('pk', 'term').iterator(chunk_size=batch_size), batch_size)
+    return len(frequency)
+
+
+# ============================================================
+# CORRECTION
+# ============================================================
+def closest(word, backend):
+    """The most similar dictionary word, the more frequent on ties; None if none is similar enough"""
+    scored = [(similarity(word, term), frequency, term) for term, frequency in backend.candidates(word)]
+    best = max(scored, default=None)
+    return best[2] if best and best[0] >= get_min_similarity() else None
+
+
+def correct_query(query):
+    """`query` with each word replaced by the closest dictionary word, or None if nothing changed"""
+    tokens = tokenize(query)
+    backend = get_spelling_backend()
+    # A word in the dictionary is its own closest match (similarity 1)
+    corrections = {word: closest(word, backend) for word in set(filter(is_word, tokens))}
+    corrected = [corrections.get(token) or token for token in tokens]
+    return ' '.join(corrected) if corrected != tokens else None
+
+
+def did_you_mean(queryset, query, found):
+    """
+    (suggestion, results) for a search of `queryset` whose exact matches
+    number `found`: the corrected query and its search results when there
+    are fewer than SPELLING_MIN_RESULTS matches and the correction finds
+    more, else (None, None)
+    """
+    if found >= get_min_results():
+        return None, None
+    suggestion = correct_query(query)
+    if suggestion is None:
+        return None, None
+    results = search_recipes(queryset, suggestion)
+    if len(results.values('pk')[:found + 1]) <= found:
+        return None, None
+    return suggestion, results
@@ -0,0 +1,66 @@
+"""
+Cached site statistics and sidebar reference data.
+
+These values change a few times a day but were recomputed on every home
+page hit. They are cached for REFERENCE_DATA_CACHE_TTL seconds in the
+default cache (shared across workers when a Redis cache is configured)
+and invalidated by recipes.signals when recipes, categories, tags or
+users are created, changed or deleted.
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+
+from .models import Category, Tag, Recipe
+
+SITE_STATS_KEY = 'recipes:site_stats'
+CATEGORY_SUMMARIES_KEY = 'recipes:category_summaries'
+TAG_SUMMARIES_KEY = 'recipes:tag_summaries'
+
+DEFAULT_TTL = 300
+
+
+def get_ttl():
+    return getattr(settings, 'REFERENCE_DATA_CACHE_TTL', DEFAULT_TTL)
+
+
+def compute_site_stats():
+    """All four site counters in a single query"""
+    tables = {
+        'recipes_count': Recipe._meta.db_table,
+        'users_count': User._meta.db_table,
+        'categories_count': Category._meta.db_table,
+        'tags_count': Tag._meta.db_table,
+    }
+    columns = ', '.join(
+        f'(SELECT COUNT(*) FROM {connection.ops.quote_name(table)})' for table in tables.values()
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT {columns}')
+        row = cursor.fetchone()
+    return dict(zip(tables, row))
+
+
+def compute_summaries(model):
+    """id/name/recipe_count for every row of Category or Tag in one grouped query"""
+    return list(
+        model.objects.annotate(recipe_count=Count('recipes')).values('pk', 'name', 'recipe_count')
+    )
+
+
+def get_site_stats():
+    return cache.get_or_set(SITE_STATS_KEY, compute_site_stats, get_ttl())
+
+
+def get_category_summaries():
+    return cache.get_or_set(CATEGORY_SUMMARIES_KEY, lambda: compute_summaries(Category), get_ttl())
+
+
+def get_tag_summaries():
+    return cache.get_or_set(TAG_SUMMARIES_KEY, lambda: compute_summaries(Tag), get_ttl())
+
+
+def invalidate_reference_data():
+    cache.delete_many([SITE_STATS_KEY, CATEGORY_SUMMARIES_KEY, TAG_SUMMARIES_KEY])
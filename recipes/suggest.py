@@ -0,0 +1,268 @@
+"""
+Search-box autocomplete from an in-memory prefix index.
+
+Recipe titles, tag and category names and canonical ingredient names are
+kept in one sorted array of lowercase keys per process: every word of a
+label starts a key, so "tikka" finds "Chicken Tikka Masala". A lookup is
+a bisect to the first key with the prefix and a scan of that range;
+prefixes of up to three letters, whose ranges are long, keep their entries
+presorted by weight instead. Nothing is read from the database per
+request.
+
+The index is built on first use in each worker and kept current by the
+model signals of that process. Changes made by other processes and
+popularity drift are picked up by a background rebuild every
+SUGGEST_REBUILD_INTERVAL seconds. Only the SUGGEST_MAX_RECIPES most
+popular published recipes are indexed.
+"""
+import bisect
+import heapq
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Q
+
+from .models import Category, Ingredient, Recipe, Tag
+
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+DEFAULT_MAX_RECIPES = 50000
+DEFAULT_REBUILD_INTERVAL = 600
+# Prefixes up to this long are answered from presorted lists
+HEAD_PREFIX_LENGTH = 3
+# Longer prefixes matching more keys than this are filtered from the head list
+MAX_SCANNED_KEYS = 500
+MAX_KEY_WORDS = 4
+
+
+def get_max_recipes():
+    return getattr(settings, 'SUGGEST_MAX_RECIPES', DEFAULT_MAX_RECIPES)
+
+
+def get_rebuild_interval():
+    return getattr(settings, 'SUGGEST_REBUILD_INTERVAL', DEFAULT_REBUILD_INTERVAL)
+
+
+def normalize(text):
+    return ' '.join((text or '').casefold().split())
+
+
+def label_keys(label):
+    """One key per word start, up to MAX_KEY_WORDS of them"""
+    words = normalize(label).split()
+    return [' '.join(words[i:]) for i in range(min(len(words), MAX_KEY_WORDS))]
+
+
+def label_heads(label):
+    """Distinct short prefixes of a label's keys, served from presorted lists"""
+    return {key[:length] for key in label_keys(label) for length in range(1, HEAD_PREFIX_LENGTH + 1)}
+
+
+def rank(kind, pk, label, weight):
+    """Sort key: heaviest first, then alphabetical"""
+    return (-weight, label.casefold(), kind, pk)
+
+
+def delete_sorted(items, item):
+    position = bisect.bisect_left(items, item)
+    if position < len(items) and items[position] == item:
+        del items[position]
+
+
+def recipe_weight(likes_count, rating_count, views_count):
+    return 1 + likes_count + rating_count + views_count / 100
+
+
+def load_entries():
+    """{(kind, id): (label, weight)} for everything suggestible"""
+    entries = {}
+    recipes = (
+        Recipe.objects.filter(published=True)
+        .annotate(weight=ExpressionWrapper(
+            F('likes_count') + F('rating_count') + F('views_count') / 100.0, output_field=FloatField()
+        ))
+        .order_by('-weight', '-id').values_list('pk', 'title', 'likes_count', 'rating_count', 'views_count')
+    )
+    for pk, title, *counts in recipes[:get_max_recipes()].iterator(chunk_size=5000):
+        entries['recipe', pk] = (title, recipe_weight(*counts))
+    recipe_count = Count('recipes', filter=Q(recipes__published=True))
+    for kind, model in (('category', Category), ('tag', Tag)):
+        for pk, name, count in model.objects.annotate(n=recipe_count).values_list('pk', 'name', 'n'):
+            entries[kind, pk] = (name, 1 + count)
+    for pk, name, count in Ingredient.objects.filter(recipe_count__gt=0).values_list('pk', 'name', 'recipe_count'):
+        entries['ingredient', pk] = (name, count)
+    return entries
+
+
+class PrefixIndex:
+    """
+    Sorted (key, kind, id) array over labelled, weighted entries. Prefixes
+    of up to HEAD_PREFIX_LENGTH characters, whose key ranges are too long
+    to scan per request, keep their entries presorted best first instead.
+    """
+
+    def __init__(self, entries=None):
+        self.entries = dict(entries or {})
+        self.keys = sorted(
+            (key, kind, pk) for (kind, pk), (label, _) in self.entries.items() for key in label_keys(label)
+        )
+        self.heads = defaultdict(list)
+        for (kind, pk), (label, weight) in self.entries.items():
+            for head in label_heads(label):
+                self.heads[head].append(rank(kind, pk, label, weight))
+        for ranked in self.heads.values():
+            ranked.sort()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, kind, pk, label, weight=None):
+        """Insert or relabel an entry; weight None keeps the current one"""
+        with self._lock:
+            if weight is None:
+                weight = self.entries.get((kind, pk), (label, 1))[1]
+            if self.entries.get((kind, pk)) == (label, weight):
+                return
+            self._remove((kind, pk))
+            self.entries[kind, pk] = (label, weight)
+            for key in label_keys(label):
+                bisect.insort(self.keys, (key, kind, pk))
+            for head in label_heads(label):
+                bisect.insort(self.heads[head], rank(kind, pk, label, weight))
+
+    def remove(self, kind, pk):
+        with self._lock:
+            self._remove((kind, pk))
+
+    def _remove(self, entry):
+        current = self.entries.pop(entry, None)
+        if current is None:
+            return
+        label, weight = current
+        for key in label_keys(label):
+            delete_sorted(self.keys, (key, *entry))
+        for head in label_heads(label):
+            delete_sorted(self.heads[head], rank(*entry, label, weight))
+
+    def search(self, prefix, limit=DEFAULT_LIMIT):
+        """Best weighted entries with a word starting with `prefix`"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        head = self.heads.get(prefix[:HEAD_PREFIX_LENGTH], ())
+        if len(prefix) <= HEAD_PREFIX_LENGTH:
+            best = self._walk(head, limit)
+        else:
+            keys = self.keys
+            start = bisect.bisect_left(keys, (prefix,))
+            end = bisect.bisect_left(keys, (prefix + '\U0010ffff',))
+            if end - start > MAX_SCANNED_KEYS:
+                # Many matches: the best of them come early in the presorted head
+                best = self._walk(head, limit, prefix)
+            else:
+                entries = self.entries
+                matches = {(kind, pk) for _, kind, pk in keys[start:end] if (kind, pk) in entries}
+                best = [
+                    (*entry, entries[entry][0])
+                    for entry in heapq.nsmallest(limit, matches, key=lambda entry: rank(*entry, *entries[entry]))
+                ]
+        return [{'kind': kind, 'id': pk, 'label': label} for kind, pk, label in best]
+
+    def _walk(self, ranked, limit, prefix=None):
+        best, seen = [], set()
+        for _, _, kind, pk in ranked:
+            label = self.entries.get((kind, pk), (None,))[0]
+            if label is None or (kind, pk) in seen:
+                continue
+            if prefix and not any(key.startswith(prefix) for key in label_keys(label)):
+                continue
+            seen.add((kind, pk))
+            best.append((kind, pk, label))
+            if len(best) == limit:
+                break
+        return best
+
+
+# ============================================================
+# PER-PROCESS INDEX
+# ============================================================
+class SuggestIndex:
+    """Lazily built PrefixIndex of this process, rebuilt in the background"""
+
+    def __init__(self):
+        self._index = None
+        self._built_at = 0.0
+        self._pid = None
+        self._rebuilding = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._index is not None and self._pid == os.getpid()
+
+    def get(self):
+        if not self.loaded:
+            with self._lock:
+                if not self.loaded:
+                    self._set(PrefixIndex(load_entries()))
+        elif 0 < get_rebuild_interval() < time.monotonic() - self._built_at:
+            self._start_rebuild()
+        return self._index
+
+    def reset(self):
+        with self._lock:
+            self._index = None
+
+    def _set(self, index):
+        self._index, self._built_at, self._pid = index, time.monotonic(), os.getpid()
+
+    def _start_rebuild(self):
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        threading.Thread(target=self._rebuild, name='suggest-rebuild', daemon=True).start()
+
+    def _rebuild(self):
+        try:
+            self._set(PrefixIndex(load_entries()))
+        finally:
+            # A failed rebuild waits out another interval before retrying
+            self._built_at = time.monotonic()
+            self._rebuilding = False
+            close_old_connections()
+
+    # Signal hooks: only an index that is already loaded is kept in step
+    def add(self, kind, pk, label, weight=None):
+        if self.loaded:
+            self._index.add(kind, pk, label, weight)
+
+    def remove(self, kind, pk):
+        if self.loaded:
+            self._index.remove(kind, pk)
+
+
+index = SuggestIndex()
+
+
+def suggest(prefix, limit=DEFAULT_LIMIT):
+    return index.get().search(prefix, min(max(limit, 1), MAX_LIMIT))
+
+
+def recipe_changed(recipe):
+    """Re-index a saved recipe's title and any ingredient names it introduced"""
+    if not index.loaded:
+        return
+    if recipe.published:
+        index.add('recipe', recipe.pk, recipe.title,
+                  recipe_weight(recipe.likes_count, recipe.rating_count, recipe.views_count))
+    else:
+        index.remove('recipe', recipe.pk)
+    names = Ingredient.objects.filter(recipe_lines__recipe_id=recipe.pk).values_list('pk', 'name', 'recipe_count')
+    for pk, name, count in names:
+        index.add('ingredient', pk, name, count)
@@ -0,0 +1,38 @@
+from django import template
+from django.utils.html import format_html
+
+from ..images import build_srcset, pick_variant
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(field_file, variants, alt='', sizes='100vw', width=640, **attrs):
+    """
+    Render a <picture> with WebP and JPEG srcsets for an ImageField.
+    Falls back to the original upload when no variants exist yet.
+
+    {% responsive_image recipe.image recipe.image_variants alt=recipe.title sizes="(min-width: 768px) 33vw, 100vw" class="card-img-top" %}
+    """
+    if not field_file:
+        return ''
+    extra = format_html(''.join(f' {key.replace("_", "-")}="{{}}"' for key in attrs), *attrs.values())
+    url = field_file.storage.url
+    fallback = pick_variant(variants, 'jpeg', int(width))
+    if fallback is None:
+        return format_html('<img src="{}" alt="{}" loading="lazy"{}>', field_file.url, alt, extra)
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" alt="{}" loading="lazy"{}>'
+        '</picture>',
+        build_srcset(variants, 'webp', url),
+        sizes,
+        url(fallback['path']),
+        build_srcset(variants, 'jpeg', url),
+        sizes,
+        fallback['width'],
+        fallback['height'],
+        alt,
+        extra,
+    )
@@ -1,3 +1,1457 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
 
-# Create your tests here.
\ No newline at end of file
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.models import F
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+
+from . import benchmark, comments, counters, feed, ingredients, search, similarity, spelling, stats, suggest, trending
+from .instrumentation import QueryBudgetTestMixin, fingerprint, profile
+from .models import (
+    Category, Tag, Recipe, Comment, Rating, Profile, RecipeLike, CommentLike, RelatedRecipe, Follow, FeedItem,
+    Ingredient, RecipeIngredient, SearchTerm, SearchTermTrigram,
+)
+from .serializers import RecipeListSerializer, projected
+from .templatetags.recipe_images import responsive_image
+
+
+TEST_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+def create_sample_data(recipes=12):
+    """A few categories, tags, users and recipes with comments and ratings"""
+    # Write engagement counters through so no increments stay buffered after setup,
+    # and run the post-commit similarity refreshes
+    with override_settings(COUNTER_FLUSH_INTERVAL=0), TestCase.captureOnCommitCallbacks(execute=True):
+        categories = [Category.objects.create(name=f'Category {i}') for i in range(4)]
+        tags = [Tag.objects.create(name=f'Tag {i}') for i in range(5)]
+        users = [User.objects.create_user(username=f'cook{i}', password='pass') for i in range(3)]
+        for user in users:
+            Profile.objects.create(user=user)
+        for i in range(recipes):
+            author = users[i % len(users)]
+            recipe = Recipe.objects.create(
+                author=author,
+                title=f'Recipe {i}',
+                description='A tasty dish',
+                ingredients='200g pasta\n2 eggs',
+                instructions='Cook it.',
+                category=categories[i % len(categories)],
+                prep_time=10,
+                cook_time=i,
+            )
+            recipe.tags.add(*tags[: i % len(tags) + 1])
+            for user in users:
+                Comment.objects.create(recipe=recipe, user=user, text='Nice!')
+                Rating.objects.create(recipe=recipe, user=user, score=(i % 5) + 1)
+        return users, categories, tags
+
+
+# ============================================================
+# QUERY INSTRUMENTATION
+# ============================================================
+class FingerprintTests(TestCase):
+
+    def test_literals_and_in_lists_are_normalized(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE a = 1 AND b = 'x'  AND id IN (%s, %s, %s)"),
+            'SELECT * FROM t WHERE a = ? AND b = ? AND id IN (...)',
+        )
+
+    def test_profile_reports_duplicates(self):
+        user = User.objects.create_user(username='cook', password='pass')
+        with profile() as stats:
+            for _ in range(3):
+                list(User.objects.filter(pk=user.pk))
+        self.assertEqual(stats.query_count, 3)
+        self.assertEqual(stats.duplicate_count, 2)
+
+    def test_template_render_is_wrapped_only_while_profiling(self):
+        render = Template.render
+        with profile() as outer:
+            self.assertIsNot(Template.render, render)
+            with profile() as inner:
+                Template('{% for i in items %}{{ i }}{% endfor %}').render(Context({'items': range(100)}))
+            self.assertIsNot(Template.render, render)
+        self.assertIs(Template.render, render)
+        self.assertGreater(inner.template_ms, 0)
+        self.assertEqual(outer.template_ms, 0)
+
+
+@override_settings(STORAGES=TEST_STORAGES, COUNTER_FLUSH_INTERVAL=0)
+class QueryInstrumentationMiddlewareTests(TestCase):
+
+    def test_server_timing_header_and_log_line(self):
+        with self.settings(QUERY_INSTRUMENTATION=True), \
+                self.assertLogs('recipes.instrumentation', 'INFO') as logs:
+            response = self.client.get('/api/categories/')
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('tpl;dur=', response['Server-Timing'])
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record['url_name'], 'category-api-list')
+        self.assertEqual(record['queries'], response.query_profile.query_count)
+
+    def test_disabled_by_setting(self):
+        with self.settings(QUERY_INSTRUMENTATION=False):
+            response = self.client.get('/api/categories/')
+        self.assertNotIn('Server-Timing', response)
+
+
+@override_settings(STORAGES=TEST_STORAGES, COUNTER_FLUSH_INTERVAL=0)
+class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    """Every page must stay within settings.QUERY_BUDGETS"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users, cls.categories, cls.tags = create_sample_data()
+        cls.recipe = Recipe.objects.first()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.users[0])
+
+    def test_home(self):
+        self.get_within_budget('/')
+
+    def test_home_search(self):
+        self.get_within_budget('/?q=recipe')
+
+    def test_home_trending(self):
+        self.get_within_budget('/?sort=trending')
+
+    def test_home_quickest(self):
+        self.get_within_budget('/?sort=quickest&max_time=30')
+
+    def test_recipe_detail(self):
+        self.get_within_budget(f'/recipe/{self.recipe.pk}/')
+
+    def test_recipe_comments(self):
+        self.get_within_budget(f'/recipe/{self.recipe.pk}/comments/')
+
+    def test_category_list(self):
+        self.get_within_budget('/categories/')
+
+    def test_category_list_does_not_grow_with_categories(self):
+        for i in range(10):
+            category = Category.objects.create(name=f'Extra {i}')
+            for title in ('Old', 'Mid', 'New', 'Newest'):
+                Recipe.objects.create(author=self.users[0], title=f'{title} {i}', description='d', ingredients='i',
+                                      instructions='s', category=category)
+        response = self.get_within_budget('/categories/')
+        extra = next(c for c in response.context['categories'] if c.name == 'Extra 0')
+        self.assertEqual(extra.recipe_count, 4)
+        self.assertEqual([recipe.title for recipe in extra.recent_recipes], ['Newest 0', 'New 0', 'Mid 0'])
+        self.assertEqual(response.context['total_recipes'], 52)
+
+    def add_recipes(self, count=20, **fields):
+        """More recipes than any page budget, so per-row queries can't hide"""
+        return Recipe.objects.bulk_create([
+            Recipe(author=self.users[0], title=f'Extra {i}', description='d', ingredients='i', instructions='s',
+                   **fields)
+            for i in range(count)
+        ])
+
+    def test_category_detail(self):
+        self.add_recipes(category=self.categories[0])
+        response = self.get_within_budget(f'/category/{self.categories[0].pk}/')
+        self.assertEqual(len(response.context['recipes']), 23)
+
+    def test_tag_detail(self):
+        self.tags[0].recipes.add(*self.add_recipes())
+        response = self.get_within_budget(f'/tag/{self.tags[0].pk}/')
+        self.assertEqual(len(response.context['recipes']), 32)
+
+    def test_profile(self):
+        self.get_within_budget(f'/profile/{self.users[1].username}/')
+
+    def test_recipe_api_list(self):
+        self.get_within_budget('/api/recipes/')
+
+    def test_recipe_api_trending(self):
+        self.get_within_budget('/api/recipes/?ordering=trending')
+
+    def test_recipe_api_detail(self):
+        self.get_within_budget(f'/api/recipes/{self.recipe.pk}/')
+
+    def test_comment_api_list(self):
+        self.get_within_budget('/api/comments/')
+
+    def test_rating_api_list(self):
+        self.get_within_budget('/api/ratings/')
+
+    def test_category_api_list(self):
+        self.get_within_budget('/api/categories/')
+
+    def test_recipe_api_related(self):
+        self.get_within_budget(f'/api/recipes/{self.recipe.pk}/related/')
+
+    def test_recipe_api_comments(self):
+        self.get_within_budget(f'/api/recipes/{self.recipe.pk}/comments/')
+
+    def test_recipe_api_ratings(self):
+        self.get_within_budget(f'/api/recipes/{self.recipe.pk}/ratings/')
+
+    def test_category_api_recipes(self):
+        self.get_within_budget(f'/api/categories/{self.categories[0].pk}/recipes/')
+
+    def test_recipe_api_feed(self):
+        Follow.objects.create(follower=self.users[0], followee=self.users[1])
+        self.get_within_budget('/api/recipes/feed/')
+
+    def test_user_api_list(self):
+        self.get_within_budget('/api/users/')
+
+    def test_recipe_api_by_ingredients(self):
+        self.get_within_budget('/api/recipes/by_ingredients/?include=pasta,egg&exclude=dairy')
+
+    def test_suggest_api(self):
+        suggest.index.get()
+        self.addCleanup(suggest.index.reset)
+        self.get_within_budget('/api/suggest/?q=rec')
+
+
+@override_settings(COUNTER_FLUSH_INTERVAL=0, QUERY_INSTRUMENTATION=False)
+class RecipeSubresourceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='cook', password='pass')
+        self.category = Category.objects.create(name='Mains')
+        self.recipe = Recipe.objects.create(author=self.user, title='Stew', description='d', ingredients='i',
+                                            instructions='s', category=self.category)
+        for i in range(25):
+            commenter = User.objects.create_user(username=f'guest{i}', password='pass')
+            Comment.objects.create(recipe=self.recipe, user=commenter, text=f'Comment {i}')
+            Rating.objects.create(recipe=self.recipe, user=commenter, score=i % 5 + 1)
+
+    def test_comments_are_cursor_paged_without_per_row_queries(self):
+        with self.assertNumQueries(2):
+            first = self.client.get(f'/api/recipes/{self.recipe.pk}/comments/').json()
+        self.assertEqual(len(first['results']), 20)
+        self.assertEqual(first['results'][0]['text'], 'Comment 24')
+        self.assertEqual(first['results'][0]['recipe_title'], 'Stew')
+        second = self.client.get(first['next']).json()
+        self.assertEqual([c['text'] for c in second['results']], [f'Comment {i}' for i in range(4, -1, -1)])
+
+    def test_ratings_and_category_recipes_are_paged(self):
+        ratings = self.client.get(f'/api/recipes/{self.recipe.pk}/ratings/?page_size=5').json()
+        self.assertEqual(len(ratings['results']), 5)
+        self.assertEqual(ratings['results'][0]['user_username'], 'guest24')
+        recipes = self.client.get(f'/api/categories/{self.category.pk}/recipes/').json()
+        self.assertEqual([r['id'] for r in recipes['results']], [self.recipe.pk])
+
+
+@override_settings(STORAGES=TEST_STORAGES, COUNTER_FLUSH_INTERVAL=0, QUERY_INSTRUMENTATION=False,
+                   COMMENT_PAGE_SIZE=5)
+class CommentSectionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='cook', password='pass')
+        self.recipe = Recipe.objects.create(author=self.user, title='Stew', description='d', ingredients='i',
+                                            instructions='s')
+        for i in range(12):
+            Comment.objects.create(recipe=self.recipe, user=self.user, text=f'Comment {i}')
+
+    def texts(self, page):
+        return [comment['text'] for comment in page['comments']]
+
+    def test_detail_shows_first_page_and_loads_more(self):
+        response = self.client.get(f'/recipe/{self.recipe.pk}/')
+        page = response.context['comment_page']
+        self.assertEqual(page['total'], 12)
+        self.assertEqual(self.texts(page), [f'Comment {i}' for i in range(11, 6, -1)])
+        self.assertContains(response, 'Load more comments')
+
+        response = self.client.get(f'/recipe/{self.recipe.pk}/comments/', {'cursor': page['next_cursor']})
+        self.assertEqual(self.texts(response.context['comment_page']), [f'Comment {i}' for i in range(6, 1, -1)])
+        self.assertEqual(self.client.get(f'/recipe/{self.recipe.pk}/comments/?cursor=bad').status_code, 400)
+
+    def test_more_comments_need_a_visible_recipe(self):
+        self.assertEqual(self.client.get('/recipe/0/comments/').status_code, 404)
+        Recipe.objects.filter(pk=self.recipe.pk).update(published=False)
+        url = f'/recipe/{self.recipe.pk}/comments/'
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_first_page_is_cached_until_comments_change(self):
+        comments.first_page(self.recipe.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(comments.first_page(self.recipe.pk)['total'], 12)
+        Comment.objects.create(recipe=self.recipe, user=self.user, text='Newest')
+        self.assertEqual(self.texts(comments.first_page(self.recipe.pk))[0], 'Newest')
+        Comment.objects.filter(text='Newest').get().delete()
+        self.assertEqual(comments.first_page(self.recipe.pk)['total'], 12)
+
+    def test_detail_queries_do_not_grow_with_comments(self):
+        self.client.get(f'/recipe/{self.recipe.pk}/')
+        cache.clear()
+        with profile() as few:
+            self.client.get(f'/recipe/{self.recipe.pk}/')
+        for i in range(30):
+            Comment.objects.create(recipe=self.recipe, user=User.objects.create_user(username=f'guest{i}'),
+                                   text='More')
+        cache.clear()
+        with profile() as many:
+            self.client.get(f'/recipe/{self.recipe.pk}/')
+        self.assertEqual(few.query_count, many.query_count)
+
+
+# ============================================================
+# FULL-TEXT SEARCH
+# ============================================================
+@override_settings(COUNTER_FLUSH_INTERVAL=0, QUERY_INSTRUMENTATION=False)
+class SearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='cook', password='pass')
+        self.in_instructions = self.create('Stew', instructions='Add the basil last.')
+        self.in_title = self.create('Basil pesto')
+        self.in_ingredients = self.create('Green pasta', ingredients='1 bunch basil\n200g pasta')
+
+    def create(self, title, ingredients='salt', instructions='Cook it.'):
+        return Recipe.objects.create(author=self.user, title=title, description='A dish', ingredients=ingredients,
+                                     instructions=instructions)
+
+    def titles(self, query):
+        return [recipe.title for recipe in search.search_recipes(Recipe.objects.all(), query)]
+
+    def test_sqlite_uses_the_fts5_backend(self):
+        backend = search.get_search_backend()
+        self.assertIsInstance(backend, search.SQLiteSearchBackend)
+        self.assertTrue(backend.is_installed(connection))
+
+    def test_matches_rank_by_field_weight(self):
+        self.assertEqual(self.titles('basil'), ['Basil pesto', 'Green pasta', 'Stew'])
+        ranks = [recipe.search_rank for recipe in search.search_recipes(Recipe.objects.all(), 'basil')]
+        self.assertEqual(ranks, sorted(ranks, reverse=True))
+        self.assertEqual(self.titles('basil pasta'), ['Green pasta'])
+        self.assertEqual(self.titles('pes'), ['Basil pesto'])
+        self.assertEqual(self.titles('  '), [])
+
+    def test_query_syntax_is_escaped(self):
+        for query in ('"basil', 'basil*', '(basil', 'basil:', '-basil', '^basil'):
+            self.assertEqual(self.titles(query), ['Basil pesto', 'Green pasta', 'Stew'], query)
+        # Operators are searched for as words (and not found) instead of breaking the MATCH
+        self.assertEqual(self.titles('basil OR NOT'), [])
+
+    def test_index_follows_inserts_updates_and_deletes(self):
+        recipe = self.create('Lemon tart')
+        self.assertEqual(self.titles('lemon'), ['Lemon tart'])
+        recipe.title = 'Lime tart'
+        recipe.save()
+        self.assertEqual(self.titles('lemon'), [])
+        self.assertEqual(self.titles('lime'), ['Lime tart'])
+        Recipe.objects.filter(pk=recipe.pk).update(ingredients='3 lemons')
+        self.assertEqual(self.titles('lemon'), ['Lime tart'])
+        recipe.delete()
+        self.assertEqual(self.titles('lime'), [])
+        self.assertEqual(self.titles('lemon'), [])
+
+    def test_api_search_filter(self):
+        results = self.client.get('/api/recipes/?search=basil').json()['results']
+        self.assertEqual([r['title'] for r in results], ['Basil pesto', 'Green pasta', 'Stew'])
+        self.assertEqual(len(self.client.get('/api/recipes/?search=').json()['results']), 3)
+        self.assertEqual(self.client.get('/api/recipes/?search=nothinglikethis').json()['results'], [])
+
+
+# ============================================================
+# BUFFERED COUNTERS
+# ============================================================
+@override_settings(COUNTER_FLUSH_INTERVAL=60, COUNTER_MAX_PENDING=100, QUERY_INSTRUMENTATION=False)
+class BufferedCounterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='cook', password='pass')
+        self.recipes = [
+            Recipe.objects.create(author=self.user, title=f'Stew {i}', description='d', ingredients='i',
+                                  instructions='s')
+            for i in range(3)
+        ]
+        self.counter = counters.BufferedCounter(Recipe, 'views_count')
+        self.addCleanup(counters.COUNTERS.remove, self.counter)
+
+    def views(self):
+        return list(Recipe.objects.filter(pk__in=[r.pk for r in self.recipes]).order_by('pk')
+                    .values_list('views_count', flat=True))
+
+    def test_increments_are_buffered_until_flushed(self):
+        first, second, third = (recipe.pk for recipe in self.recipes)
+        for pk in (first, second, third, third):
+            self.counter.increment(pk)
+        self.assertEqual(self.counter.pending(third), 2)
+        self.assertEqual(self.views(), [0, 0, 0])
+        # One UPDATE per distinct delta
+        with self.assertNumQueries(2):
+            self.assertEqual(self.counter.flush(), 3)
+        self.assertEqual(self.views(), [1, 1, 2])
+        self.assertEqual(self.counter.pending(third), 0)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.counter.flush(), 0)
+
+    def test_max_pending_rows_trigger_a_flush(self):
+        with self.settings(COUNTER_MAX_PENDING=2):
+            self.counter.increment(self.recipes[0].pk)
+            self.assertEqual(self.views(), [0, 0, 0])
+            self.counter.increment(self.recipes[1].pk)
+        self.assertEqual(self.views(), [1, 1, 0])
+
+    def test_flush_all_covers_every_counter(self):
+        self.counter.increment(self.recipes[0].pk, 5)
+        self.assertIn(self.counter, counters.COUNTERS)
+        self.assertGreaterEqual(counters.flush_all(), 1)
+        self.assertEqual(self.views(), [5, 0, 0])
+
+    def test_failed_write_keeps_the_increments(self):
+        apply = self.counter.apply
+        calls = []
+
+        def fail_second(pks, amount):
+            calls.append(amount)
+            if len(calls) == 2:
+                raise DatabaseError('disk full')
+            apply(pks, amount)
+
+        self.counter.apply = fail_second
+        first, second, _ = (recipe.pk for recipe in self.recipes)
+        self.counter.increment(first)
+        self.counter.increment(second, 2)
+        with self.assertRaises(DatabaseError):
+            self.counter.flush()
+        self.assertEqual(self.views(), [1, 0, 0])
+        self.assertEqual((self.counter.pending(first), self.counter.pending(second)), (0, 2))
+        self.counter.increment(second)
+        self.counter.flush()
+        self.assertEqual(self.views(), [1, 3, 0])
+
+
+# ============================================================
+# LIKES
+# ============================================================
+@override_settings(COUNTER_FLUSH_INTERVAL=0, QUERY_INSTRUMENTATION=False)
+class LikeTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='cook', password='pass')
+        self.fan = User.objects.create_user(username='fan', password='pass')
+        self.recipe = Recipe.objects.create(author=self.user, title='Stew', description='d', ingredients='i',
+                                            instructions='s')
+        self.comment = Comment.objects.create(recipe=self.recipe, user=self.user, text='Lovely')
+        self.client.force_login(self.fan)
+
+    def post(self, url):
+        response = self.client.post(url)
+        return response.status_code, response.json()['liked'], response.json()['likes_count']
+
+    def test_recipe_like_and_unlike_are_idempotent(self):
+        url = f'/api/recipes/{self.recipe.pk}'
+        self.assertEqual(self.post(f'{url}/like/'), (201, True, 1))
+        self.assertEqual(self.post(f'{url}/like/'), (200, True, 1))
+        self.assertEqual(RecipeLike.objects.filter(recipe=self.recipe).count(), 1)
+        self.assertEqual(self.post(f'{url}/unlike/'), (200, False, 0))
+        self.assertEqual(self.post(f'{url}/unlike/'), (200, False, 0))
+        self.assertEqual(Recipe.objects.get(pk=self.recipe.pk).likes_count, 0)
+
+    def test_comment_like_and_unlike_are_idempotent(self):
+        url = f'/api/comments/{self.comment.pk}'
+        self.assertEqual(self.post(f'{url}/like/'), (201, True, 1))
+        self.assertEqual(self.post(f'{url}/like/'), (200, True, 1))
+        self.client.force_login(self.user)
+        self.assertEqual(self.post(f'{url}/like/'), (201, True, 2))
+        self.assertEqual(self.post(f'{url}/unlike/'), (200, False, 1))
+        self.assertEqual(self.post(f'{url}/unlike/'), (200, False, 1))
+        self.assertEqual(Comment.objects.get(pk=self.comment.pk).likes_count, 1)
+        self.assertEqual(self.client.post('/api/comments/0/like/').status_code, 404)
+
+    def test_one_like_per_user(self):
+        RecipeLike.objects.create(recipe=self.recipe, user=self.fan)
+        CommentLike.objects.create(comment=self.comment, user=self.fan)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            RecipeLike.objects.create(recipe=self.recipe, user=self.fan)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            CommentLike.objects.create(comment=self.comment, user=self.fan)
+
+    def test_buffered_likes_count_is_written_on_flush(self):
+        with override_settings(COUNTER_FLUSH_INTERVAL=60):
+            self.assertEqual(self.post(f'/api/recipes/{self.recipe.pk}/like/'), (201, True, 1))
+            self.assertEqual(Recipe.objects.get(pk=self.recipe.pk).likes_count, 0)
+            counters.flush_all()
+        self.assertEqual(Recipe.objects.get(pk=self.recipe.pk).likes_count, 1)
+        self.assertEqual(self.post(f'/api/recipes/{self.recipe.pk}/like/'), (200, True, 1))
+
+    def test_likes_require_login(self):
+        self.client.logout()
+        self.assertEqual(self.client.post(f'/api/recipes/{self.recipe.pk}/like/').status_code, 403)
+        self.assertFalse(RecipeLike.objects.exists())
+
+
+# ============================================================
+# CONDITIONAL GET
+# ============================================================
+@override_settings(STORAGES=TEST_STORAGES, COUNTER_FLUSH_INTERVAL=0, QUERY_INSTRUMENTATION=False)
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='cook', password='pass')
+        self.category = Category.objects.create(name='Soups')
+        self.recipe = Recipe.objects.create(author=self.user, title='Stew', description='d', ingredients='i',
+                                            instructions='s', category=self.category)
+        Comment.objects.create(recipe=self.recipe, user=self.user, text='Lovely')
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_recipe_api_detail_returns_304_until_engagement_changes(self):
+        url = f'/api/recipes/{self.recipe.pk}/'
+        first = self.client.get(url)
+        self.assertTrue(first['ETag'].startswith('W/"'))
+        self.assertIn('Last-Modified', first)
+        cached = self.revalidate(url, first)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached['ETag'], first['ETag'])
+        self.assertEqual(cached.content, b'')
+
+        Rating.objects.create(recipe=self.recipe, user=self.user, score=4)
+        self.assertEqual(self.revalidate(url, first).status_code, 200)
+
+    def test_if_modified_since(self):
+        url = f'/api/recipes/{self.recipe.pk}/'
+        first = self.client.get(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304)
+        Recipe.objects.filter(pk=self.recipe.pk).update(updated_at=timezone.now() + timedelta(minutes=1))
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 200)
+
+    def test_recipe_validators_follow_related_rows(self):
+        tag = Tag.objects.create(name='Hearty')
+        url = f'/api/recipes/{self.recipe.pk}/'
+        changes = [
+            lambda: self.recipe.tags.add(tag),
+            lambda: Tag.objects.filter(pk=tag.pk).get().save(),
+            lambda: tag.recipes.clear(),
+            lambda: Category.objects.get(pk=self.category.pk).save(),
+            lambda: User.objects.get(pk=self.user.pk).save(),
+        ]
+        for change in changes:
+            first = self.client.get(url)
+            change()
+            second = self.revalidate(url, first)
+            self.assertEqual(second.status_code, 200)
+            self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second.json()['tags'], [])
+
+        # Logins do not change what a recipe shows
+        first = self.client.get(url)
+        self.client.force_login(self.user)
+        self.client.logout()
+        self.assertEqual(self.revalidate(url, first).status_code, 304)
+
+    def test_list_pages_change_with_their_rows(self):
+        for url in ('/api/recipes/', '/api/comments/', '/api/categories/'):
+            first = self.client.get(url)
+            self.assertEqual(self.revalidate(url, first).status_code, 304, url)
+        first = self.client.get('/api/categories/')
+        Category.objects.filter(pk=self.category.pk).update(name='Stews')
+        self.assertEqual(self.revalidate('/api/categories/', first).status_code, 200)
+        first = self.client.get('/api/comments/')
+        Comment.objects.create(recipe=self.recipe, user=self.user, text='Again')
+        self.assertEqual(self.revalidate('/api/comments/', first).status_code, 200)
+
+    def test_lists_are_not_revalidated_by_date_after_a_delete(self):
+        extra = Comment.objects.create(recipe=self.recipe, user=self.user, text='Again')
+        since = self.client.get(f'/api/recipes/{self.recipe.pk}/')['Last-Modified']
+        for url in ('/api/comments/', f'/recipe/{self.recipe.pk}/', f'/category/{self.category.pk}/'):
+            self.assertNotIn('Last-Modified', self.client.get(url), url)
+        first = self.client.get('/api/comments/')
+        extra.delete()
+        self.assertEqual(self.client.get('/api/comments/', HTTP_IF_MODIFIED_SINCE=since).status_code, 200)
+        self.assertEqual(self.revalidate('/api/comments/', first).status_code, 200)
+
+    def test_anonymous_html_pages_are_revalidated(self):
+        for url in (f'/recipe/{self.recipe.pk}/', f'/category/{self.category.pk}/'):
+            first = self.client.get(url)
+            self.assertEqual(self.revalidate(url, first).status_code, 304, url)
+        first = self.client.get(f'/recipe/{self.recipe.pk}/')
+        Comment.objects.create(recipe=self.recipe, user=self.user, text='Again')
+        self.assertEqual(self.revalidate(f'/recipe/{self.recipe.pk}/', first).status_code, 200)
+
+        self.client.force_login(self.user)
+        self.assertNotIn('ETag', self.client.get(f'/recipe/{self.recipe.pk}/'))
+
+
+# ============================================================
+# SPARSE FIELDSETS
+# ============================================================
+@override_settings(COUNTER_FLUSH_INTERVAL=0, QUERY_INSTRUMENTATION=False)
+class SparseFieldsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='cook', password='pass')
+        Profile.objects.create(user=self.user)
+        self.category = Category.objects.create(name='Soups')
+        self.tag = Tag.objects.create(name='Quick')
+        self.recipe = Recipe.objects.create(author=self.user, title='Stew', description='d', ingredients='i',
+                                            instructions='s', category=self.category)
+        self.recipe.tags.add(self.tag)
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), ' '.join(query['sql'] for query in queries.captured_queries)
+
+    def test_fields_limit_the_payload_and_the_columns(self):
+        data, sql = self.get('/api/recipes/', fields='id,title')
+        self.assertEqual(data['results'], [{'id': self.recipe.pk, 'title': 'Stew'}])
+        self.assertNotIn('"ingredients"', sql)
+        self.assertNotIn('JOIN', sql)
+
+        data, sql = self.get(f'/api/recipes/{self.recipe.pk}/', fields='id,average_rating')
+        self.assertEqual(set(data), {'id', 'average_rating'})
+        self.assertNotIn('"instructions"', sql)
+        self.assertNotIn('COUNT(', sql)
+
+    def test_expand_nests_related_objects(self):
+        data, sql = self.get('/api/recipes/', fields='id', expand='author,category,tags')
+        result = data['results'][0]
+        self.assertEqual(result['author']['username'], 'cook')
+        self.assertEqual(result['category']['name'], 'Soups')
+        self.assertEqual([tag['name'] for tag in result['tags']], ['Quick'])
+        self.assertIn('"recipes_profile"', sql)
+
+        Comment.objects.create(recipe=self.recipe, user=self.user, text='Nice')
+        data, _ = self.get('/api/comments/', expand='user', fields='text')
+        self.assertEqual(data['results'], [{'text': 'Nice', 'user': {
+            'id': self.user.pk, 'username': 'cook', 'followers_count': 0, 'following_count': 0,
+        }}])
+
+    def test_writes_ignore_fields(self):
+        self.client.force_login(self.user)
+        response = self.client.post('/api/recipes/?fields=id', {
+            'title': 'Soup', 'description': 'd', 'ingredients': 'i', 'instructions': 's',
+            'category': self.category.pk,
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('title', response.json())
+        self.assertEqual(Recipe.objects.get(title='Soup').category, self.category)
+
+
+@override_settings(STORAGES=TEST_STORAGES, COUNTER_FLUSH_INTERVAL=0, QUERY_INSTRUMENTATION=False)
+class ColumnProjectionTests(TestCase):
+    """List pages must not load the large recipe text columns they never show"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users, cls.categories, cls.tags = create_sample_data(recipes=4)
+        Follow.objects.create(follower=cls.users[0], followee=cls.users[1])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.users[0])
+
+    def list_sql(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return [query['sql'] for query in queries.captured_queries if '"recipes_recipe"' in query['sql']]
+
+    def assertColumnsAbsent(self, urls, columns):
+        for url in urls:
+            statements = self.list_sql(url)
+            self.assertTrue(statements, url)
+            for sql in statements:
+                for column in columns:
+                    self.assertNotIn(f'"recipes_recipe"."{column}"', sql, url)
+
+    def test_api_lists(self):
+        self.assertColumnsAbsent([
+            '/api/recipes/', '/api/recipes/?ordering=trending', '/api/recipes/?search=recipe',
+            '/api/recipes/feed/', f'/api/categories/{self.categories[0].pk}/recipes/',
+            '/api/comments/', '/api/ratings/',
+        ], ['description', 'ingredients', 'instructions'])
+
+    def test_html_lists(self):
+        self.assertColumnsAbsent([
+            '/', '/?sort=trending', '/?q=recipe', f'/category/{self.categories[0].pk}/',
+            f'/tag/{self.tags[0].pk}/', f'/profile/{self.users[1].username}/',
+        ], ['ingredients', 'instructions'])
+
+    def test_projected_follows_serializer_fields(self):
+        queryset = projected(Recipe.objects.all(), RecipeListSerializer, ['id', 'title', 'author_username'])
+        self.assertEqual(queryset.query.deferred_loading, ({'id', 'title', 'author__username'}, False))
+        self.assertEqual(queryset.query.select_related, {'author': {}})
+
+
+# ============================================================
+# FACETED FILTERING
+# ============================================================
+@override_settings(STORAGES=TEST_STORAGES, COUNTER_FLUSH_INTERVAL=0, QUERY_INSTRUMENTATION=False)
+class FacetTests(TestCase):
+    # Recipe i: category i % 4, tags 0..i % 5, cook_time i (+10 prep), average rating i % 5 + 1
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users, cls.categories, cls.tags = create_sample_data()
+        Recipe.objects.filter(title__in=['Recipe 0', 'Recipe 1']).update(difficulty='easy')
+
+    def setUp(self):
+        cache.clear()
+
+    def titles(self, query):
+        response = self.client.get(f'/api/recipes/?{query}&page_size=50')
+        self.assertEqual(response.status_code, 200, response.content)
+        return sorted(int(r['title'].split()[1]) for r in response.json()['results'])
+
+    def test_filters(self):
+        tag3, tag4 = self.tags[3].pk, self.tags[4].pk
+        self.assertEqual(self.titles(f'category={self.categories[0].pk}'), [0, 4, 8])
+        self.assertEqual(self.titles(f'tags={tag3},{tag4}'), [4, 9])
+        self.assertEqual(self.titles(f'tags={tag3},{tag4}&tags_mode=any'), [3, 4, 8, 9])
+        self.assertEqual(self.titles('difficulty=easy,hard'), [0, 1])
+        self.assertEqual(self.titles('min_time=12&max_time=15'), [2, 3, 4, 5])
+        self.assertEqual(self.titles('min_rating=4'), [3, 4, 8, 9])
+        self.assertEqual(self.titles('min_rating=4&max_time=15&search=recipe'), [3, 4])
+
+    def test_facet_counts_come_from_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/recipes/?category={self.categories[0].pk}&facets=all')
+        facets = response.json()['facets']
+        self.assertEqual(len(queries), 2)
+        # A facet's own filter is left out of its counts
+        self.assertEqual(facets['category'], {str(category.pk): 3 for category in self.categories})
+        self.assertEqual(facets['difficulty'], {'easy': 1, 'medium': 2})
+        self.assertEqual(facets['tags'], {str(tag.pk): count for tag, count in zip(self.tags, [3, 2, 2, 2, 1])})
+        self.assertEqual(facets['total_time'], {'15': 2, '30': 3, '60': 3, '120': 3})
+        self.assertEqual(facets['rating'], {'4': 2, '3': 2, '2': 2, '1': 3})
+        with self.assertNumQueries(1):
+            self.client.get(f'/api/recipes/?category={self.categories[0].pk}&facets=all&cursor=')
+
+    def test_invalid_parameters_are_rejected(self):
+        for query in ('category=x', 'difficulty=extreme', 'max_time=soon', 'tags_mode=some&tags=1', 'facets=colour'):
+            self.assertEqual(self.client.get(f'/api/recipes/?{query}').status_code, 400, query)
+
+
+@override_settings(STORAGES=TEST_STORAGES, COUNTER_FLUSH_INTERVAL=0, QUERY_INSTRUMENTATION=False)
+class TotalTimeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users, cls.categories, cls.tags = create_sample_data()
+
+    def setUp(self):
+        cache.clear()
+
+    def total_time(self, recipe):
+        return Recipe.objects.values_list('total_time', flat=True).get(pk=recipe.pk)
+
+    def test_kept_in_sync_on_every_write_path(self):
+        recipe = Recipe.objects.get(title='Recipe 5')
+        self.assertEqual(self.total_time(recipe), 15)
+        recipe.cook_time = None
+        recipe.save(update_fields=['cook_time'])
+        self.assertEqual(self.total_time(recipe), 10)
+        Recipe.objects.filter(pk=recipe.pk).update(cook_time=F('prep_time') * 2)
+        self.assertEqual(self.total_time(recipe), 30)
+        Recipe.objects.filter(pk=recipe.pk).update(prep_time=None, cook_time=None)
+        self.assertEqual(self.total_time(recipe), 0)
+        recipe.prep_time, recipe.cook_time = 5, 7
+        Recipe.objects.bulk_update([recipe], ['prep_time', 'cook_time'])
+        self.assertEqual(self.total_time(recipe), 12)
+        [created] = Recipe.objects.bulk_create([
+            Recipe(title='Bulk', description='d', ingredients='i', instructions='i', author=self.users[0],
+                   prep_time=3, cook_time=4)
+        ])
+        self.assertEqual(self.total_time(created), 7)
+
+    def test_api_filters_and_orders_by_total_time(self):
+        Recipe.objects.filter(title='Recipe 0').update(prep_time=None, cook_time=None)
+        response = self.client.get('/api/recipes/?ordering=total_time&max_time=13&page_size=50')
+        self.assertEqual(response.status_code, 200, response.content)
+        results = response.json()['results']
+        self.assertEqual([r['title'] for r in results], ['Recipe 1', 'Recipe 2', 'Recipe 3'])
+        self.assertEqual([r['total_time'] for r in results], [11, 12, 13])
+
+    def test_home_quickest_skips_unknown_times(self):
+        Recipe.objects.filter(title='Recipe 0').update(prep_time=None, cook_time=None)
+        response = self.client.get('/?sort=quickest')
+        titles = [recipe.title for recipe in response.context['recipes']]
+        self.assertEqual(titles, ['Recipe 1', 'Recipe 2', 'Recipe 3', 'Recipe 4', 'Recipe 5', 'Recipe 6'])
+        response = self.client.get('/?max_time=12')
+        self.assertEqual(sorted(recipe.title for recipe in response.context['recipes']), ['Recipe 1', 'Recipe 2'])
+
+
+@override_settings(STORAGES=TEST_STORAGES, COUNTER_FLUSH_INTERVAL=0, QUERY_INSTRUMENTATION=False)
+class RatingAggregateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users, cls.categories, cls.tags = create_sample_data(recipes=2)
+
+    def setUp(self):
+        cache.clear()
+        self.recipe = Recipe.objects.get(title='Recipe 0')
+
+    def aggregates(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        return recipe.rating_sum, recipe.rating_count, recipe.rating_histogram
+
+    def test_rating_create_update_and_delete_keep_the_aggregates(self):
+        self.assertEqual(self.aggregates(), (3, 3, {1: 3, 2: 0, 3: 0, 4: 0, 5: 0}))
+        rating = Rating.objects.get(recipe=self.recipe, user=self.users[0])
+        rating.score = 5
+        rating.save()
+        self.assertEqual(self.aggregates(), (7, 3, {1: 2, 2: 0, 3: 0, 4: 0, 5: 1}))
+        rating.delete()
+        self.assertEqual(self.aggregates(), (2, 2, {1: 2, 2: 0, 3: 0, 4: 0, 5: 0}))
+        Rating.objects.create(recipe=self.recipe, user=self.users[0], score=4)
+        self.assertEqual(self.aggregates(), (6, 3, {1: 2, 2: 0, 3: 0, 4: 1, 5: 0}))
+
+    def test_saving_a_stale_recipe_keeps_the_counters(self):
+        stale = Recipe.objects.get(pk=self.recipe.pk)
+        Rating.objects.filter(recipe=self.recipe).delete()
+        Recipe.objects.filter(pk=self.recipe.pk).update(likes_count=F('likes_count') + 2)
+        stale.title = 'Renamed'
+        stale.save()
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        self.assertEqual(recipe.title, 'Renamed')
+        self.assertEqual((recipe.rating_sum, recipe.rating_count, recipe.rating_count_1), (0, 0, 0))
+        self.assertEqual(recipe.likes_count, 2)
+
+    def test_api_update_keeps_the_counters(self):
+        self.client.force_login(self.recipe.author)
+        Rating.objects.create(recipe=self.recipe, user=User.objects.create_user('late', password='pass'), score=5)
+        response = self.client.patch(
+            f'/api/recipes/{self.recipe.pk}/', {'title': 'Patched'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.aggregates(), (8, 4, {1: 3, 2: 0, 3: 0, 4: 0, 5: 1}))
+
+
+# ============================================================
+# BULK EXPORT
+# ============================================================
+@override_settings(COUNTER_FLUSH_INTERVAL=0, QUERY_INSTRUMENTATION=False)
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users, cls.categories, _ = create_sample_data(recipes=4)
+        cls.staff = User.objects.create_user(username='analyst', password='pass', is_staff=True)
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+
+    def export(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson_with_filters(self):
+        lines = self.export('/api/export/recipes/?format=ndjson&author=cook1').splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([row['title'] for row in rows], ['Recipe 1'])
+        self.assertEqual(rows[0]['author_username'], 'cook1')
+
+        category = self.categories[0]
+        rows = [json.loads(line) for line in self.export(f'/api/export/ratings/?category={category.pk}').splitlines()]
+        self.assertEqual(len(rows), Rating.objects.filter(recipe__category=category).count())
+
+        Comment.objects.update(updated_at=timezone.now() - timedelta(days=3))
+        Comment.objects.filter(pk=Comment.objects.first().pk).update(updated_at=timezone.now())
+        since = (timezone.now() - timedelta(days=1)).date().isoformat()
+        self.assertEqual(len(self.export(f'/api/export/comments/?updated_since={since}').splitlines()), 1)
+
+    def test_csv_has_header_and_one_line_per_row(self):
+        lines = self.export('/api/export/comments/?format=csv').splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'recipe_id', 'user_id'])
+        self.assertEqual(len(lines), Comment.objects.count() + 1)
+
+    def test_errors_and_permissions(self):
+        self.assertEqual(self.client.get('/api/export/comments/?updated_since=soon').status_code, 400)
+        self.assertEqual(self.client.get('/api/export/users/').status_code, 404)
+        self.client.force_login(self.users[0])
+        self.assertEqual(self.client.get('/api/export/recipes/').status_code, 403)
+
+    def test_command_streams_to_a_file(self):
+        path = os.path.join(tempfile.mkdtemp(), 'recipes.ndjson')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        call_command('export_data', 'recipes', '--output', path, '--chunk-size', '2', stderr=io.StringIO())
+        with open(path, encoding='utf-8') as output:
+            self.assertEqual(len(output.readlines()), 4)
+
+
+# ============================================================
+# CACHED REFERENCE DATA
+# ============================================================
+class ReferenceDataCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        create_sample_data(recipes=4)
+
+    def test_summaries_are_cached(self):
+        first = stats.get_category_summaries()
+        counts = stats.get_site_stats()
+        with self.assertNumQueries(0):
+            self.assertEqual(stats.get_category_summaries(), first)
+            self.assertEqual(stats.get_site_stats(), counts)
+        self.assertEqual(sum(c['recipe_count'] for c in first), 4)
+
+    def test_site_stats_single_query(self):
+        with self.assertNumQueries(1):
+            counts = stats.get_site_stats()
+        self.assertEqual(counts, {'recipes_count': 4, 'users_count': 3, 'categories_count': 4, 'tags_count': 5})
+
+    def test_invalidated_on_writes(self):
+        stats.get_site_stats()
+        stats.get_tag_summaries()
+        tag = Tag.objects.create(name='New tag')
+        self.assertEqual(stats.get_site_stats()['tags_count'], 6)
+        Recipe.objects.first().tags.add(tag)
+        summary = {t['name']: t['recipe_count'] for t in stats.get_tag_summaries()}
+        self.assertEqual(summary['New tag'], 1)
+
+
+# ============================================================
+# IMAGE VARIANTS
+# ============================================================
+class ImageVariantTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, STORAGES=TEST_STORAGES)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.user = User.objects.create_user(username='cook', password='pass')
+
+    def upload(self, size=(2000, 1000)):
+        buffer = io.BytesIO()
+        image = Image.new('RGB', size, 'orange')
+        exif = image.getexif()
+        exif[0x010E] = 'private description'
+        image.save(buffer, 'JPEG', exif=exif)
+        return SimpleUploadedFile('soup.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def test_variants_generated_on_upload(self):
+        recipe = Recipe.objects.create(
+            author=self.user, title='Soup', description='d', ingredients='i', instructions='s',
+            image=self.upload(),
+        )
+        recipe.refresh_from_db()
+        variants = recipe.image_variants['variants']
+        self.assertEqual(sorted({v['width'] for v in variants}), [320, 640, 1280])
+        self.assertEqual({v['format'] for v in variants}, {'webp', 'jpeg'})
+        variant = next(v for v in variants if v['width'] == 640 and v['format'] == 'jpeg')
+        with Image.open(os.path.join(self.media_root, variant['path'])) as stored:
+            self.assertEqual(stored.size, (640, 320))
+            self.assertEqual(len(stored.getexif()), 0)
+
+    def test_stored_upload_loses_its_exif(self):
+        recipe = Recipe.objects.create(
+            author=self.user, title='Soup', description='d', ingredients='i', instructions='s',
+            image=self.upload(size=(400, 200)),
+        )
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_variants['source'], recipe.image.name)
+        with Image.open(os.path.join(self.media_root, recipe.image.name)) as stored:
+            self.assertEqual(stored.size, (400, 200))
+            self.assertEqual(len(stored.getexif()), 0)
+
+    def test_template_tag_uses_the_field_storage(self):
+        recipe = Recipe.objects.create(
+            author=self.user, title='Soup', description='d', ingredients='i', instructions='s',
+            image=self.upload(size=(800, 400)),
+        )
+        recipe.refresh_from_db()
+        recipe.image.storage = FileSystemStorage(location=self.media_root, base_url='/cdn/')
+        html = responsive_image(recipe.image, recipe.image_variants)
+        self.assertIn('src="/cdn/recipes/variants/soup-640w.jpeg"', html)
+        self.assertNotIn('/media/', html)
+
+    def test_small_images_are_not_upscaled(self):
+        profile = Profile.objects.create(user=self.user, avatar=self.upload(size=(200, 200)))
+        profile.refresh_from_db()
+        self.assertEqual({v['width'] for v in profile.avatar_variants['variants']}, {200})
+
+
+# ============================================================
+# BENCHMARK
+# ============================================================
+class BenchmarkTests(TestCase):
+    def test_percentile_uses_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 50), 50)
+        self.assertEqual(benchmark.percentile(values, 99), 99)
+        self.assertEqual(benchmark.percentile([7], 95), 7)
+        self.assertIsNone(benchmark.percentile([], 50))
+
+    def test_summarize_groups_by_endpoint(self):
+        samples = [('recipe_detail', 0.010, 200, 5), ('recipe_detail', 0.030, 500, 7), ('home_search', 0.020, 200, 4)]
+        summary = benchmark.summarize(samples, wall_seconds=2)
+        self.assertEqual(summary['recipe_detail']['requests'], 2)
+        self.assertEqual(summary['recipe_detail']['errors'], 1)
+        self.assertEqual(summary['recipe_detail']['queries'], 6)
+        self.assertEqual(summary['ALL']['rps'], 1.5)
+        self.assertEqual(summary['ALL']['max_ms'], 30)
+
+    def test_compare_reports_regressions_as_positive(self):
+        baseline = {'endpoints': {'home_search': {'p95_ms': 100, 'rps': 50, 'queries': 4}}}
+        current = {'endpoints': {'home_search': {'p95_ms': 120, 'rps': 40, 'queries': 4}}}
+        changes = {row['metric']: row['change_pct'] for row in benchmark.compare(current, baseline)}
+        self.assertEqual(changes, {'p95_ms': 20.0, 'rps': 20.0, 'queries': 0.0})
+
+    def test_single_thread_in_process_run(self):
+        create_sample_data(recipes=3)
+        with override_settings(STORAGES=TEST_STORAGES, COUNTER_FLUSH_INTERVAL=0, QUERY_INSTRUMENTATION=False):
+            samples, wall = benchmark.run_benchmark(
+                lambda index: benchmark.InProcessTransport(User.objects.first()),
+                requests=12, concurrency=1, writes=False,
+            )
+        self.assertEqual(len(samples), 12)
+        self.assertTrue(all(status == 200 for _, _, status, _ in samples))
+        self.assertTrue(all(queries > 0 for _, _, _, queries in samples))
+
+
+# ============================================================
+# RELATED RECIPES
+# ============================================================
+class RelatedRecipeTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='cook', password='pass')
+        self.mains, self.desserts = Category.objects.create(name='Mains'), Category.objects.create(name='Desserts')
+        self.spicy, self.sweet = Tag.objects.create(name='Spicy'), Tag.objects.create(name='Sweet')
+
+    def create(self, title, category, tags, ingredients):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = Recipe.objects.create(
+                author=self.user, title=title, description='d', instructions='s',
+                category=category, ingredients=ingredients,
+            )
+            recipe.tags.set(tags)
+        return recipe
+
+    def test_ingredient_tokens_drop_quantities_and_units(self):
+        tokens = similarity.ingredient_tokens('200g chicken breasts\n2 tbsp olive oil, chopped')
+        self.assertEqual(tokens, {'chicken', 'breast', 'olive', 'oil'})
+
+    def test_save_refreshes_both_neighbour_lists(self):
+        curry = self.create('Curry', self.mains, [self.spicy], '500g chicken\n1 can coconut milk\ncumin')
+        self.create('Brownies', self.desserts, [self.sweet], '200g chocolate\nsugar\nbutter')
+        vindaloo = self.create('Vindaloo', self.mains, [self.spicy], '500g chicken\ncumin\nchili')
+
+        related = similarity.get_related_recipes(curry)
+        self.assertEqual(related[0], vindaloo)
+        self.assertGreater(related[0].similarity, 0.5)
+        self.assertEqual(similarity.get_related_recipes(vindaloo)[0], curry)
+        self.assertNotIn('Brownies', [recipe.title for recipe in related])
+
+    def test_rebuild_matches_incremental_ranking(self):
+        curry = self.create('Curry', self.mains, [self.spicy], 'chicken\ncoconut milk\ncumin')
+        vindaloo = self.create('Vindaloo', self.mains, [self.spicy], 'chicken\ncumin\nchili')
+        self.create('Fudge', self.desserts, [self.sweet], 'chocolate\nsugar')
+        RelatedRecipe.objects.all().delete()
+
+        self.assertEqual(similarity.rebuild_all(k=2), 3)
+        self.assertEqual(similarity.get_related_recipes(curry)[0], vindaloo)
+        self.assertLessEqual(RelatedRecipe.objects.filter(recipe=curry).count(), 2)
+
+    def test_refresh_runs_once_per_save_and_skips_unchanged_features(self):
+        curry = self.create('Curry', self.mains, [self.spicy], 'chicken\ncumin')
+        self.create('Vindaloo', self.desserts, [self.sweet], 'chicken\ncumin\nchili')
+        with self.assertNumQueries(2):
+            self.assertIsNone(similarity.refresh_recipe(curry))
+        # A form save: row first, then the tags, each queueing a refresh
+        with self.captureOnCommitCallbacks() as callbacks:
+            curry.category = self.desserts
+            curry.save()
+            curry.tags.set([self.sweet])
+        # post_save, then post_remove and post_add: only the first does any work
+        results = [callback() for callback in callbacks]
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0][0][0], Recipe.objects.get(title='Vindaloo').pk)
+        self.assertEqual(results[1:], [None, None])
+
+    def test_refresh_scans_a_bounded_number_of_postings(self):
+        for name, value in (('MAX_SCANNED_POSTINGS', 1), ('MIN_COMMON_SLICE', 1)):
+            self.addCleanup(setattr, similarity, name, getattr(similarity, name))
+            setattr(similarity, name, value)
+        for i in range(4):
+            self.create(f'Stew {i}', self.mains, [self.spicy], f'beef\ncarrot{i}')
+        vindaloo = self.create('Vindaloo', self.mains, [self.spicy], 'chicken\ncumin\nchili')
+        curry = self.create('Curry', self.mains, [self.spicy], 'chicken\ncumin')
+        self.assertEqual(similarity.get_related_recipes(curry)[0], vindaloo)
+
+    def test_api_related_includes_similarity(self):
+        curry = self.create('Curry', self.mains, [self.spicy], 'chicken\ncumin')
+        vindaloo = self.create('Vindaloo', self.mains, [self.spicy], 'chicken\ncumin\nchili')
+        with self.settings(QUERY_INSTRUMENTATION=False):
+            response = self.client.get(f'/api/recipes/{curry.pk}/related/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['id'], vindaloo.pk)
+        self.assertGreater(response.json()[0]['similarity'], 0)
+
+
+# ============================================================
+# STRUCTURED INGREDIENTS
+# ============================================================
+@override_settings(COUNTER_FLUSH_INTERVAL=0, QUERY_INSTRUMENTATION=False)
+class IngredientIndexTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='cook', password='pass')
+
+    def create(self, title, lines):
+        return Recipe.objects.create(
+            author=self.user, title=title, description='d', instructions='s', ingredients=lines,
+        )
+
+    def names(self, recipe):
+        return list(recipe.ingredient_lines.values_list('ingredient__name', flat=True))
+
+    def test_lines_are_parsed_into_quantity_unit_and_name(self):
+        self.assertEqual(ingredients.parse_line('2 1/2 cups chopped Tomatoes'), (2.5, 'cup', 'tomato'))
+        self.assertEqual(ingredients.parse_line('200g boneless chicken breasts'), (200.0, 'g', 'chicken breast'))
+        self.assertEqual(ingredients.parse_line('½ tsp ground cumin'), (0.5, 'tsp', 'cumin'))
+        self.assertEqual(ingredients.parse_line('2-3 cloves garlic, minced'), (2.0, 'clove', 'garlic'))
+        self.assertEqual(ingredients.parse_line('salt to taste'), (None, '', 'salt'))
+        self.assertIsNone(ingredients.parse_line('2 tbsp'))
+
+    def test_zero_denominators_drop_the_quantity(self):
+        self.assertEqual(ingredients.parse_line('1/0 cup flour'), (None, 'cup', 'flour'))
+        self.assertEqual(ingredients.parse_line('1 0/0 tsp salt'), (None, 'tsp', 'salt'))
+        # Parsed from the post_save handlers, so this used to fail the save
+        recipe = self.create('Bread', '1/0 cup flour\n1 tsp salt')
+        self.assertEqual(self.names(recipe), ['flour', 'salt'])
+
+    def test_save_keeps_rows_and_posting_counts_current(self):
+        recipe = self.create('Stew', '500g beef\n2 carrots\nsalt\nSalt')
+        self.assertEqual(self.names(recipe), ['beef', 'carrot', 'salt'])
+        self.assertEqual(Recipe.objects.get(pk=recipe.pk).ingredient_count, 3)
+        self.create('Soup', '3 carrots\nwater')
+        self.assertEqual(Ingredient.objects.get(name='carrot').recipe_count, 2)
+
+        recipe.ingredients = '500g lamb\n2 carrots'
+        recipe.save()
+        self.assertEqual(self.names(recipe), ['lamb', 'carrot'])
+        counts = dict(Ingredient.objects.values_list('name', 'recipe_count'))
+        self.assertEqual((counts['beef'], counts['lamb'], counts['carrot']), (0, 1, 2))
+        with self.assertNumQueries(2):
+            ingredients.sync_recipe(recipe)
+
+    def test_delete_takes_the_recipe_out_of_posting_counts(self):
+        stew = self.create('Stew', '500g beef\n2 carrots\nsalt\nSalt')
+        soup = self.create('Soup', '3 carrots\nsalt')
+        self.create('Salad', '1 carrot')
+        stew.delete()
+        counts = dict(Ingredient.objects.values_list('name', 'recipe_count'))
+        self.assertEqual(counts, {'beef': 0, 'carrot': 2, 'salt': 1})
+        Recipe.objects.filter(pk=soup.pk).delete()
+        counts = dict(Ingredient.objects.values_list('name', 'recipe_count'))
+        self.assertEqual(counts, {'beef': 0, 'carrot': 1, 'salt': 0})
+
+    def test_rebuild_command_backfills_rows(self):
+        recipe = self.create('Stew', '500g beef\n2 carrots')
+        RecipeIngredient.objects.all().delete()
+        Ingredient.objects.update(recipe_count=0)
+        call_command('rebuild_ingredient_index', stdout=io.StringIO())
+        self.assertEqual(self.names(recipe), ['beef', 'carrot'])
+        self.assertEqual(Ingredient.objects.get(name='beef').recipe_count, 1)
+
+    def test_api_intersects_excludes_and_ranks_by_coverage(self):
+        pasta = self.create('Pasta', '200g chicken breast\n1 can tomatoes')
+        self.create('Creamy', 'chicken\ntomato\n1 cup milk')
+        rice = self.create('Rice', 'chicken\nrice')
+        stew = self.create('Stew', 'tomato\nbasil\ngarlic\nchicken thighs\nonion')
+
+        response = self.client.get('/api/recipes/by_ingredients/?include=Chicken,tomatoes&exclude=dairy')
+        results = response.json()['results']
+        self.assertEqual([r['id'] for r in results], [pasta.pk, stew.pk])
+        self.assertEqual((results[1]['matched'], results[1]['ingredient_count'], results[1]['coverage']), (2, 5, 0.4))
+
+        response = self.client.get('/api/recipes/by_ingredients/?include=chicken,tomato&exclude=milk&match=any')
+        self.assertEqual([r['id'] for r in response.json()['results']], [pasta.pk, rice.pk, stew.pk])
+        self.assertEqual(self.client.get('/api/recipes/by_ingredients/').status_code, 400)
+
+
+# ============================================================
+# SEARCH SUGGESTIONS
+# ============================================================
+@override_settings(COUNTER_FLUSH_INTERVAL=0, QUERY_INSTRUMENTATION=False)
+class SuggestTests(TestCase):
+    def setUp(self):
+        suggest.index.reset()
+        self.addCleanup(suggest.index.reset)
+        self.user = User.objects.create_user(username='cook', password='pass')
+        self.category = Category.objects.create(name='Chinese')
+        self.tag = Tag.objects.create(name='Chili')
+        self.curry = self.create('Chicken Tikka Masala', '500g chicken\n1 can chickpeas', likes_count=10)
+        self.create('Chicken Soup', 'chicken\nwater')
+        self.create('Chocolate Chip Cookies', 'flour', published=False)
+
+    def create(self, title, lines, **fields):
+        return Recipe.objects.create(
+            author=self.user, title=title, description='d', instructions='s', ingredients=lines,
+            category=self.category, **fields
+        )
+
+    def labels(self, prefix):
+        return [(s['kind'], s['label']) for s in suggest.suggest(prefix)]
+
+    def test_matches_word_prefixes_most_popular_first(self):
+        self.assertEqual(self.labels('chi'), [
+            ('recipe', 'Chicken Tikka Masala'), ('category', 'Chinese'), ('ingredient', 'chicken'),
+            ('recipe', 'Chicken Soup'), ('ingredient', 'chickpea'), ('tag', 'Chili'),
+        ])
+        self.assertEqual(self.labels('  TIKKA m'), [('recipe', 'Chicken Tikka Masala')])
+        self.assertEqual(self.labels('choc'), [])
+
+    def test_signals_update_a_loaded_index(self):
+        suggest.index.get()
+        zucchini = self.create('Zucchini Bread', '2 zucchini')
+        self.tag.name = 'Zesty'
+        self.tag.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.labels('z'), [
+                ('tag', 'Zesty'), ('ingredient', 'zucchini'), ('recipe', 'Zucchini Bread'),
+            ])
+        zucchini.delete()
+        self.assertEqual(self.labels('zucchini b'), [])
+
+    def test_api_does_not_query_the_database(self):
+        self.client.force_login(self.user)
+        suggest.index.get()
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/suggest/?q=chicken%20s&limit=1')
+        self.assertEqual(response.json()['suggestions'], [
+            {'kind': 'recipe', 'id': Recipe.objects.get(title='Chicken Soup').pk, 'label': 'Chicken Soup'},
+        ])
+
+
+# ============================================================
+# SPELLING CORRECTION
+# ============================================================
+@override_settings(STORAGES=TEST_STORAGES, COUNTER_FLUSH_INTERVAL=0, QUERY_INSTRUMENTATION=False)
+class SpellingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='cook', password='pass')
+        cls.create('Spaghetti Carbonara', '200g spaghetti\n100g guanciale\n2 eggs')
+        cls.create('Spaghetti Bolognese', '300g spaghetti\n500g beef mince')
+        cls.create('Quick Lunch', '1 bread roll', description='Leftover spagetti, reheated')
+        cls.create('Secret Stew', '1 truffle', published=False)
+
+    @classmethod
+    def create(cls, title, lines, **fields):
+        fields.setdefault('description', 'd')
+        return Recipe.objects.create(author=cls.user, title=title, instructions='s', ingredients=lines, **fields)
+
+    def terms(self):
+        return dict(SearchTerm.objects.values_list('term', 'frequency'))
+
+    def test_dictionary_holds_published_titles_and_ingredient_names(self):
+        self.assertEqual(set(self.terms()), {
+            'spaghetti', 'carbonara', 'guanciale', 'egg', 'bolognese', 'beef', 'mince', 'quick', 'lunch', 'bread',
+            'roll',
+        })
+        self.assertEqual(
+            set(SearchTermTrigram.objects.filter(term__term='egg').values_list('trigram', flat=True)),
+            {'  e', ' eg', 'egg', 'gg '},
+        )
+
+    def test_corrects_unknown_words_to_the_most_similar(self):
+        self.assertAlmostEqual(spelling.similarity('spagetti', 'spaghetti'), 7 / 12)
+        self.assertEqual(spelling.correct_query('Spagetti carbonera'), 'spaghetti carbonara')
+        self.assertIsNone(spelling.correct_query('spaghetti carbonara'))
+        self.assertIsNone(spelling.correct_query('xyzzy'))
+
+    def test_home_falls_back_only_when_results_are_sparse(self):
+        response = self.client.get('/?q=carbonera')
+        self.assertTrue(response.context['showing_suggestion'])
+        self.assertEqual(response.context['suggestion'], 'carbonara')
+        self.assertEqual([recipe.title for recipe in response.context['recipes']], ['Spaghetti Carbonara'])
+        # One recipe has the misspelling itself: it stays listed, with a "did you mean"
+        response = self.client.get('/?q=spagetti')
+        self.assertFalse(response.context['showing_suggestion'])
+        self.assertEqual([recipe.title for recipe in response.context['recipes']], ['Quick Lunch'])
+        self.assertContains(response, 'Did you mean')
+        with self.settings(SPELLING_MIN_RESULTS=1):
+            self.assertIsNone(self.client.get('/?q=spagetti').context['suggestion'])
+
+    def test_searches_with_enough_results_skip_the_dictionary(self):
+        with self.settings(SPELLING_MIN_RESULTS=2):
+            for url in ('/?q=spaghetti', '/api/recipes/?search=spaghetti'):
+                with CaptureQueriesContext(connection) as queries:
+                    self.assertEqual(self.client.get(url).status_code, 200)
+                self.assertFalse([q for q in queries.captured_queries if 'recipes_searchterm' in q['sql']], url)
+
+    def test_api_adds_did_you_mean(self):
+        self.assertEqual(self.client.get('/api/recipes/?search=spagetti').json()['did_you_mean'], 'spaghetti')
+        self.assertNotIn('did_you_mean', self.client.get('/api/recipes/?search=spaghetti').json())
+
+    def test_rebuild_recounts_and_drops_unused_words(self):
+        Recipe.objects.filter(title='Spaghetti Carbonara').update(published=False)
+        self.assertEqual(spelling.rebuild_all(), 8)
+        terms = self.terms()
+        self.assertEqual(terms['spaghetti'], 1)
+        self.assertNotIn('carbonara', terms)
+        self.assertEqual(
+            SearchTermTrigram.objects.count(), sum(len(spelling.trigrams(term)) for term in terms)
+        )
+
+# ============================================================
+# TRENDING
+# ============================================================
+@override_settings(COUNTER_FLUSH_INTERVAL=0, QUERY_INSTRUMENTATION=False, TRENDING_HALF_LIFE_HOURS=24)
+class TrendingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='cook', password='pass')
+        self.old, self.new = [
+            Recipe.objects.create(author=self.user, title=title, description='d', ingredients='i', instructions='s')
+            for title in ('Old favourite', 'New hit')
+        ]
+
+    def test_events_log_add_into_the_score(self):
+        before = timezone.now()
+        trending.record(self.new.pk, 'comment')
+        trending.record(self.new.pk, 'like')
+        self.new.refresh_from_db()
+        expected = trending.log_add(trending.log_add(0.0, trending.log_weight(6, before)),
+                                    trending.log_weight(5, before))
+        self.assertAlmostEqual(self.new.trending_score, expected, places=3)
+        self.assertAlmostEqual(trending.current_value(self.new.trending_score), 11, places=2)
+
+    def test_old_engagement_decays(self):
+        now = timezone.now()
+        for _ in range(4):
+            Comment.objects.create(recipe=self.old, user=self.user, text='Great')
+        Comment.objects.filter(recipe=self.old).update(created_at=now - timedelta(days=3))
+        Comment.objects.create(recipe=self.new, user=self.user, text='Wow')
+        Comment.objects.filter(recipe=self.new).update(created_at=now)
+        scores = trending.compute_scores(Recipe, [
+            ('comment', Comment.objects.values_list('recipe_id', 'created_at')),
+        ], weights={'comment': 1})
+        # Four comments three half-lives ago weigh 4 / 2**3 = 0.5, one comment now weighs 1
+        self.assertGreater(scores[self.new.pk], scores[self.old.pk])
+        self.assertAlmostEqual(trending.current_value(scores[self.old.pk], now), 0.5, places=3)
+
+    def test_rebuild_matches_incremental_updates(self):
+        Comment.objects.create(recipe=self.old, user=self.user, text='Yum')
+        Rating.objects.create(recipe=self.old, user=self.user, score=5)
+        incremental = Recipe.objects.get(pk=self.old.pk).trending_score
+        trending.rebuild_scores()
+        self.assertAlmostEqual(Recipe.objects.get(pk=self.old.pk).trending_score, incremental, places=3)
+
+    def test_api_and_home_order_by_trending(self):
+        trending.record(self.old.pk, 'like')
+        results = self.client.get('/api/recipes/?ordering=trending').json()['results']
+        self.assertEqual([r['id'] for r in results], [self.old.pk, self.new.pk])
+        self.assertEqual([r['id'] for r in self.client.get('/api/recipes/').json()['results']],
+                         [self.new.pk, self.old.pk])
+        with self.settings(STORAGES=TEST_STORAGES):
+            response = self.client.get('/?sort=trending')
+        self.assertEqual(list(response.context['recipes']), [self.old, self.new])
+
+
+# ============================================================
+# FOLLOW FEED
+# ============================================================
+@override_settings(QUERY_INSTRUMENTATION=False, FEED_FANOUT_MAX_FOLLOWERS=1, FEED_FOLLOW_BACKFILL=20)
+class FeedTests(TestCase):
+    def setUp(self):
+        self.reader, self.cook, self.star, self.fan = [
+            User.objects.create_user(username=name, password='pass') for name in ('reader', 'cook', 'star', 'fan')
+        ]
+        for user in (self.reader, self.cook, self.star, self.fan):
+            Profile.objects.create(user=user)
+        self.client.force_login(self.reader)
+
+    def create(self, author, title, published=True):
+        return Recipe.objects.create(author=author, title=title, description='d', ingredients='i',
+                                     instructions='s', published=published)
+
+    def profile(self, user):
+        return Profile.objects.get(user=user)
+
+    def test_follow_counters_and_idempotent_endpoints(self):
+        first = self.client.post('/api/users/cook/follow/')
+        again = self.client.post('/api/users/cook/follow/')
+        self.assertEqual((first.status_code, again.status_code), (201, 200))
+        self.assertEqual(again.json()['followers_count'], 1)
+        self.assertEqual(self.profile(self.reader).following_count, 1)
+        self.client.post('/api/users/cook/unfollow/')
+        response = self.client.post('/api/users/cook/unfollow/')
+        self.assertEqual(response.json(), {'id': self.cook.pk, 'username': 'cook', 'following': False,
+                                           'followers_count': 0})
+        self.assertEqual(self.profile(self.reader).following_count, 0)
+        self.assertEqual(self.client.post('/api/users/reader/follow/').status_code, 400)
+
+    def test_new_recipes_fan_out_and_follow_backfills(self):
+        older = self.create(self.cook, 'Older')
+        self.create(self.cook, 'Draft', published=False)
+        Follow.objects.create(follower=self.reader, followee=self.cook)
+        self.assertEqual(list(FeedItem.objects.filter(user=self.reader).values_list('recipe_id', flat=True)),
+                         [older.pk])
+        newer = self.create(self.cook, 'Newer')
+        recipes, next_position = feed.feed_page(self.reader)
+        self.assertEqual(recipes, [newer, older])
+        self.assertIsNone(next_position)
+
+        Follow.objects.get(follower=self.reader, followee=self.cook).delete()
+        self.assertFalse(FeedItem.objects.filter(user=self.reader).exists())
+
+    def test_fan_out_happens_when_a_recipe_gets_published(self):
+        Follow.objects.create(follower=self.reader, followee=self.cook)
+        Follow.objects.create(follower=self.reader, followee=self.star)
+        Follow.objects.create(follower=self.fan, followee=self.star)
+        draft = Recipe.objects.get(pk=self.create(self.cook, 'Draft', published=False).pk)
+        draft.save()
+        self.assertFalse(FeedItem.objects.exists())
+        draft.published = True
+        draft.save()
+        self.assertEqual(list(FeedItem.objects.values_list('recipe_id', flat=True)), [draft.pk])
+
+        # Later saves of a published recipe never look at the feed, even when nothing was fanned out
+        famous = Recipe.objects.get(pk=self.create(self.star, 'Famous').pk)
+        for recipe in (draft, famous):
+            with CaptureQueriesContext(connection) as queries:
+                recipe.save()
+            feed_queries = [q['sql'] for q in queries if 'recipes_feeditem' in q['sql'] or 'recipes_follow' in q['sql']]
+            self.assertEqual(feed_queries, [], recipe.title)
+
+    def test_follow_counters_for_users_without_a_profile(self):
+        Profile.objects.filter(user__in=[self.cook, self.fan]).delete()
+        Follow.objects.create(follower=self.reader, followee=self.cook)
+        Follow.objects.create(follower=self.fan, followee=self.cook)
+        self.assertEqual(self.profile(self.cook).followers_count, 2)
+        self.assertEqual(self.profile(self.fan).following_count, 1)
+        Follow.objects.get(follower=self.fan, followee=self.cook).delete()
+        self.assertEqual(self.profile(self.cook).followers_count, 1)
+        self.assertEqual(self.profile(self.fan).following_count, 0)
+
+    def test_popular_authors_are_pulled_at_read_time(self):
+        Follow.objects.create(follower=self.reader, followee=self.star)
+        Follow.objects.create(follower=self.fan, followee=self.star)
+        Follow.objects.create(follower=self.reader, followee=self.cook)
+        star_recipe = self.create(self.star, 'Famous')
+        cook_recipe = self.create(self.cook, 'Homemade')
+        # Two followers is over FEED_FANOUT_MAX_FOLLOWERS, so nothing was written for the star
+        self.assertFalse(FeedItem.objects.filter(recipe=star_recipe).exists())
+        self.assertEqual(feed.feed_page(self.reader)[0], [cook_recipe, star_recipe])
+
+    def test_api_feed_cursor_pages(self):
+        Follow.objects.create(follower=self.reader, followee=self.cook)
+        recipes = [self.create(self.cook, f'Recipe {i}') for i in range(3)]
+        first = self.client.get('/api/recipes/feed/?page_size=2').json()
+        self.assertEqual([r['id'] for r in first['results']], [recipes[2].pk, recipes[1].pk])
+        second = self.client.get(first['next']).json()
+        self.assertEqual([r['id'] for r in second['results']], [recipes[0].pk])
+        self.assertIsNone(second['next'])
+        self.assertEqual(self.client.get('/api/recipes/feed/?cursor=nope').status_code, 400)
@@ -0,0 +1,129 @@
+"""
+Time-decayed trending score.
+
+A recipe's trending value is the sum of its engagement events, each
+weighted by TRENDING_WEIGHTS and halved every TRENDING_HALF_LIFE_HOURS:
+
+    value(now) = sum(weight * 2 ** -((now - t) / half_life))
+
+Decay scales every recipe by the same factor, so the ranking only needs
+sum(weight * 2 ** ((t - EPOCH) / half_life)). That number outgrows a
+float within a few years, so Recipe.trending_score stores its log2
+instead. An event then raises the score with a log-add:
+
+    score = max(score, d) + log2(1 + 2 ** -abs(score - d))
+    d = log2(weight) + (t - EPOCH) / half_life
+
+So a new event updates one row in place, no old row ever needs
+rewriting, and `ORDER BY trending_score DESC` over the index is the
+trending feed. Views, likes, ratings and comments go through a buffered
+counter, so a flush writes one UPDATE per distinct weight.
+"""
+import math
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Abs, Greatest, Log, Power
+from django.utils import timezone
+
+from .counters import BufferedCounter
+from .models import Recipe, Comment, Rating, RecipeLike
+
+EPOCH = datetime(2020, 1, 1, tzinfo=dt_timezone.utc)
+DEFAULT_HALF_LIFE_HOURS = 24
+DEFAULT_WEIGHTS = {'view': 1, 'like': 5, 'rating': 4, 'comment': 6}
+
+
+def get_half_life_hours():
+    return getattr(settings, 'TRENDING_HALF_LIFE_HOURS', DEFAULT_HALF_LIFE_HOURS)
+
+
+def get_weights():
+    return getattr(settings, 'TRENDING_WEIGHTS', DEFAULT_WEIGHTS)
+
+
+def log_weight(weight, when):
+    """log2 of `weight` scaled to the epoch: d in the module docstring"""
+    half_lives = (when - EPOCH).total_seconds() / 3600 / get_half_life_hours()
+    return math.log2(weight) + half_lives
+
+
+def log_add(a, b):
+    """log2(2**a + 2**b) without overflow"""
+    high, low = max(a, b), min(a, b)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def current_value(score, now=None):
+    """Decayed engagement right now, in event-weight units"""
+    return 2 ** (score - log_weight(1, now or timezone.now()))
+
+
+class TrendingCounter(BufferedCounter):
+    """Buffers event weights and log-adds them into Recipe.trending_score"""
+
+    def __init__(self):
+        super().__init__(Recipe, 'trending_score')
+
+    def apply(self, pks, amount):
+        # Pending events are stamped with the flush time; at most
+        # COUNTER_FLUSH_INTERVAL seconds off, which a half-life of hours ignores
+        delta = Value(log_weight(amount, timezone.now()), output_field=FloatField())
+        score = F(self.field)
+        self.model.objects.filter(pk__in=pks).update(**{
+            self.field: Greatest(score, delta) + Log(
+                Value(2.0), Value(1.0) + Power(Value(2.0), -Abs(score - delta))
+            )
+        })
+
+
+recipe_trending = TrendingCounter()
+
+
+def record(recipe_id, event):
+    """Count one 'view', 'like', 'rating' or 'comment' towards trending"""
+    weight = get_weights().get(event)
+    if weight:
+        recipe_trending.increment(recipe_id, weight)
+
+
+# ============================================================
+# FULL RECOMPUTE
+# ============================================================
+def compute_scores(recipe_model, event_sources, weights=None):
+    """
+    Trending score per recipe id from stored events. `event_sources` are
+    (event name, queryset of (recipe_id, created_at) rows). Views have no
+    timestamps, so views_count counts at the recipe's creation time.
+    """
+    weights = weights or get_weights()
+    scores = defaultdict(float)
+
+    def add(recipe_id, weight, when):
+        if weight and when:
+            scores[recipe_id] = log_add(scores[recipe_id], log_weight(weight, when))
+
+    recipes = recipe_model.objects.values_list('pk', 'views_count', 'created_at')
+    for pk, views, created_at in recipes.iterator(chunk_size=5000):
+        scores[pk] = 0.0
+        add(pk, views * weights.get('view', 0), created_at)
+    for event, rows in event_sources:
+        for recipe_id, created_at in rows.iterator(chunk_size=5000):
+            add(recipe_id, weights.get(event, 0), created_at)
+    return scores
+
+
+def rebuild_scores(batch_size=2000):
+    """Recompute Recipe.trending_score for every recipe from its events"""
+    scores = compute_scores(Recipe, [
+        ('comment', Comment.objects.values_list('recipe_id', 'created_at')),
+        ('rating', Rating.objects.values_list('recipe_id', 'created_at')),
+        ('like', RecipeLike.objects.values_list('recipe_id', 'created_at')),
+    ])
+    Recipe.objects.bulk_update(
+        [Recipe(pk=pk, trending_score=score) for pk, score in scores.items()],
+        ['trending_score'], batch_size=batch_size,
+    )
+    return len(scores)
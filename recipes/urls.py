@@ -9,11 +9,13 @@ router.register(r'recipes', api_views.RecipeViewSet, basename='recipe-api')
 router.register(r'categories', api_views.CategoryViewSet, basename='category-api')
 router.register(r'comments', api_views.CommentViewSet, basename='comment-api')
 router.register(r'ratings', api_views.RatingViewSet, basename='rating-api')
+router.register(r'users', api_views.UserViewSet, basename='user-api')
 
 urlpatterns = [
     # Web routes (must come first)
     path('', views.home, name='home'),
     path('recipe/<int:pk>/', views.recipe_detail, name='recipe_detail'),
+    path('recipe/<int:pk>/comments/', views.recipe_comments, name='recipe_comments'),
     path('recipe/create/', views.create_recipe, name='create_recipe'),
     path('recipe/<int:pk>/edit/', views.edit_recipe, name='edit_recipe'),
     path('categories/', views.category_list, name='category_list'),
@@ -24,5 +26,7 @@ urlpatterns = [
     path('register/', views.register, name='register'),
     
     # API routes (under /api/ prefix)
+    path('api/export/<str:dataset>/', api_views.ExportView.as_view(), name='export-api'),
+    path('api/suggest/', api_views.SuggestView.as_view(), name='suggest-api'),
     path('api/', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,54 +1,91 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.http import Http404, HttpResponseBadRequest
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.contrib.auth.models import User
 from django.contrib.auth import logout as auth_logout
-from .models import Recipe, Category, Tag, Comment, Rating, Profile
+from .models import Recipe, Category, Tag, Rating, Profile
 from .forms import RecipeForm, CommentForm, RatingForm, ProfileForm
-from django.db.models import Avg, Count, Q
+from .search import search_recipes
+from .counters import recipe_views
+from . import conditional, spelling, trending
+from .stats import get_site_stats, get_category_summaries, get_tag_summaries
+from .similarity import get_related_recipes
+from .pagination import decode_cursor
+from .serializers import RecipeListSerializer, projected
+from . import comments as comment_section
+from django.db import transaction
+from django.db.models import Count, Max, Prefetch
 from django.core.paginator import Paginator
 
+# Recipe cards: the list serializer's data plus the description teaser
+CARD_COLUMNS = ['description']
+# Plain title/description/author cards on the category, tag and profile pages
+SIMPLE_CARD_FIELDS = ['id', 'title', 'author_username']
+
+HOME_ORDERINGS = {
+    'latest': ('-created_at', '-id'),
+    'trending': ('-trending_score', '-id'),
+    'quickest': ('total_time', '-created_at', '-id'),
+}
+# "Ready in" choices of the home page, minutes
+HOME_TIME_LIMITS = (15, 30, 60)
+
+
 def home(request):
-    recipes = Recipe.objects.all().order_by('-created_at')
+    sort = request.GET.get('sort', 'latest')
+    if sort not in HOME_ORDERINGS:
+        sort = 'latest'
+    max_time = request.GET.get('max_time', '')
+    max_time = int(max_time) if max_time.isdigit() else None
+    recipes = (
+        projected(Recipe.objects.all(), RecipeListSerializer, extra=CARD_COLUMNS)
+        .prefetch_related('tags').order_by(*HOME_ORDERINGS[sort])
+    )
+    # Recipes without times (total_time 0) are left out of time-based browsing
+    if max_time:
+        recipes = recipes.filter(total_time__gt=0, total_time__lte=max_time)
+    elif sort == 'quickest':
+        recipes = recipes.filter(total_time__gt=0)
     search_query = request.GET.get('q', '').strip()
+    listing = recipes
     if search_query:
-        recipes = recipes.filter(
-            Q(title__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(ingredients__icontains=search_query) |
-            Q(instructions__icontains=search_query)
-        )
-    categories = Category.objects.all()
-    tags = Tag.objects.all()
+        recipes = search_recipes(listing, search_query)
     
     # Pagination
     paginator = Paginator(recipes, 6)  # 6 recipes per page
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+
+    # Few exact matches: offer a spelling correction (see recipes.spelling)
+    suggestion, showing_suggestion = None, False
+    if search_query:
+        suggestion, corrected = spelling.did_you_mean(listing, search_query, paginator.count)
+        if suggestion and not paginator.count:
+            paginator = Paginator(corrected, 6)
+            page_obj = paginator.get_page(page_number)
+            showing_suggestion = True
     
-    # Statistics
-    recipes_count = Recipe.objects.count()
-    users_count = User.objects.count()
-    categories_count = Category.objects.count()
-    tags_count = Tag.objects.count()
-    
+    # Statistics and sidebar data (cached, see recipes.stats)
     return render(request, 'recipes/home.html', {
         'recipes': page_obj,
         'page_obj': page_obj,
-        'categories': categories,
-        'tags': tags,
-        'recipes_count': recipes_count,
-        'users_count': users_count,
-        'categories_count': categories_count,
-        'tags_count': tags_count,
+        'categories': get_category_summaries(),
+        'tags': get_tag_summaries(),
         'search_query': search_query,
+        'suggestion': suggestion,
+        'showing_suggestion': showing_suggestion,
+        'sort': sort,
+        'max_time': max_time,
+        'time_limits': HOME_TIME_LIMITS,
+        **get_site_stats(),
     })
 
 def recipe_detail(request, pk):
     recipe = get_object_or_404(Recipe, pk=pk)
-    comments = recipe.comments.all()
-    ratings = recipe.ratings.all()
-    average_rating = ratings.aggregate(Avg('score'))['score__avg'] or 0
+    average_rating = recipe.get_average_rating()
+    comment_page = comment_section.first_page(recipe.pk)
+    page_validators = None
 
     if request.method == 'POST':
         if request.user.is_authenticated:
@@ -86,14 +123,42 @@ def recipe_detail(request, pk):
     else:
         comment_form = CommentForm()
         rating_form = RatingForm()
+        recipe_views.increment(recipe.pk)
+        trending.record(recipe.pk, 'view')
+        if not request.user.is_authenticated:
+            # Anonymous pages carry no per-user content, so they can be revalidated
+            page_validators = conditional.list_validators(
+                [recipe, *comment_page['comments']], conditional.RECIPE_VALIDATOR_FIELDS, comment_page['total']
+            )
+            response = conditional.not_modified(request, *page_validators)
+            if response:
+                return response
 
-    return render(request, 'recipes/recipe_detail.html', {
+    response = render(request, 'recipes/recipe_detail.html', {
         'recipe': recipe,
-        'comments': comments,
+        'comment_page': comment_page,
         'average_rating': average_rating,
+        'related_recipes': get_related_recipes(recipe, Recipe.objects.select_related('author'), limit=3),
         'comment_form': comment_form,
         'rating_form': rating_form,
     })
+    return conditional.set_validators(response, *page_validators) if page_validators else response
+
+def recipe_comments(request, pk):
+    """"Load more" fragment: the next page of a recipe's comments"""
+    recipe = get_object_or_404(Recipe.objects.only('author_id', 'published'), pk=pk)
+    # Drafts only for their author (published recipes never load the session user)
+    if not recipe.published and recipe.author_id != request.user.pk:
+        raise Http404('No Recipe matches the given query.')
+    cursor = request.GET.get('cursor')
+    try:
+        position = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        return HttpResponseBadRequest('Invalid cursor')
+    return render(request, 'recipes/comment_list.html', {
+        'recipe_id': recipe.pk,
+        'comment_page': comment_section.comment_page(recipe.pk, position),
+    })
 
 @login_required
 def create_recipe(request):
@@ -102,8 +167,9 @@ def create_recipe(request):
         if form.is_valid():
             recipe = form.save(commit=False)
             recipe.author = request.user
-            recipe.save()
-            form.save_m2m()  # Save many-to-many relationships
+            with transaction.atomic():
+                recipe.save()
+                form.save_m2m()  # Save many-to-many relationships
             messages.success(request, 'Recipe created!')
             return redirect('recipe_detail', pk=recipe.pk)
     else:
@@ -116,7 +182,8 @@ def edit_recipe(request, pk):
     if request.method == 'POST':
         form = RecipeForm(request.POST, request.FILES, instance=recipe)
         if form.is_valid():
-            form.save()
+            with transaction.atomic():
+                form.save()
             messages.success(request, 'Recipe updated!')
             return redirect('recipe_detail', pk=pk)
     else:
@@ -124,24 +191,46 @@ def edit_recipe(request, pk):
     return render(request, 'recipes/edit_recipe.html', {'form': form, 'recipe': recipe})
 
 def category_list(request):
-    categories = Category.objects.all()
-    return render(request, 'recipes/category_list.html', {'categories': categories})
+    # Counts in one grouped query, the three newest recipes of every category in one windowed query
+    recent = (
+        Recipe.objects.select_related('author').only('id', 'title', 'category_id', 'author__username')
+        .order_by('-created_at', '-id')
+    )
+    categories = list(
+        Category.objects.annotate(recipe_count=Count('recipes'))
+        .prefetch_related(Prefetch('recipes', queryset=recent[:3], to_attr='recent_recipes'))
+    )
+    return render(request, 'recipes/category_list.html', {
+        'categories': categories,
+        'total_recipes': sum(category.recipe_count for category in categories),
+    })
 
 def category_detail(request, pk):
     category = get_object_or_404(Category, pk=pk)
-    recipes = category.recipes.all()
-    return render(request, 'recipes/category_detail.html', {'category': category, 'recipes': recipes})
+    # Not category.recipes: the related manager sets each row's category from
+    # category_id, which the projection defers, costing a query per recipe
+    recipes = projected(Recipe.objects.filter(category=category), RecipeListSerializer, SIMPLE_CARD_FIELDS, CARD_COLUMNS)
+    page_validators = None
+    if not request.user.is_authenticated:
+        # The page lists every recipe in the category; their count and latest edit version it
+        version = recipes.aggregate(count=Count('pk'), latest=Max('updated_at'), last_id=Max('pk'))
+        page_validators = conditional.list_validators([category], ('name', 'description'), *version.values())
+        response = conditional.not_modified(request, *page_validators)
+        if response:
+            return response
+    response = render(request, 'recipes/category_detail.html', {'category': category, 'recipes': recipes})
+    return conditional.set_validators(response, *page_validators) if page_validators else response
 
 def tag_detail(request, pk):
     tag = get_object_or_404(Tag, pk=pk)
-    recipes = tag.recipes.all()
+    recipes = projected(tag.recipes.all(), RecipeListSerializer, SIMPLE_CARD_FIELDS, CARD_COLUMNS)
     return render(request, 'recipes/tag_detail.html', {'tag': tag, 'recipes': recipes})
 
 @login_required
 def profile(request, username):
     user = get_object_or_404(User, username=username)
     profile, created = Profile.objects.get_or_create(user=user)
-    recipes = Recipe.objects.filter(author=user)
+    recipes = projected(Recipe.objects.filter(author=user), RecipeListSerializer, ['id', 'title'], CARD_COLUMNS)
     return render(request, 'recipes/profile.html', {'profile': profile, 'recipes': recipes})
 
 @login_required
@@ -23,7 +23,7 @@ def test_api():
         response = urllib.request.urlopen(f"{BASE_URL}/api/recipes/")
         data = json.loads(response.read().decode())
         print(f"  ✓ Status: {response.status}")
-        print(f"  ✓ Total recipes: {data.get('count', 0)}")
+        print(f"  ✓ Recipes on first page: {len(data.get('results', []))}")
         if data.get('results'):
             print(f"  ✓ First recipe: {data['results'][0]['title']}")
     except urllib.error.URLError as e:
@@ -94,7 +94,7 @@ def test_api():
         data = json.loads(response.read().decode())
         print(f"  ✓ Status: {response.status}")
         if 'results' in data:
-            print(f"  ✓ Total comments: {data.get('count', 0)}")
+            print(f"  ✓ Comments on first page: {len(data['results'])}")
     except urllib.error.URLError as e:
         print(f"  ✗ Error: {e}")
     
@@ -105,7 +105,7 @@ def test_api():
         data = json.loads(response.read().decode())
         print(f"  ✓ Status: {response.status}")
         if 'results' in data:
-            print(f"  ✓ Total ratings: {data.get('count', 0)}")
+            print(f"  ✓ Ratings on first page: {len(data['results'])}")
     except urllib.error.URLError as e:
         print(f"  ✗ Error: {e}")
     